@@ -0,0 +1,195 @@
+# Standard library imports
+import os
+import json
+import time
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Dict, Iterator, List, Set, Tuple
+
+# Third-party imports
+import torch
+
+# Local imports
+from check_sentiment import (
+    DEFAULT_BACKEND,
+    DEFAULT_MODEL_NAME,
+    SENTIMENT_BACKENDS,
+    format_sentiment_scores,
+    get_sentiment_model,
+    load_sentiment_backend,
+    read_news_article,
+)
+
+ARTICLE_ARCHIVE_FOLDER = r"txt_files/article_archive"
+SENTIMENT_SCORES_LOCATION = r"txt_files/sentiment_scores.jsonl"
+
+# Articles read ahead per batch so that batches contain articles of similar length
+SORTING_WINDOW_BATCHES = 8
+
+Article = Tuple[str, str]
+
+_worker_model_name = DEFAULT_MODEL_NAME
+_worker_backend = DEFAULT_BACKEND
+
+
+def load_scored_ids(location: str = SENTIMENT_SCORES_LOCATION) -> Set[str]:
+    """Return the IDs of the articles that were already scored"""
+    scored_ids = set()
+    if not os.path.exists(location):
+        return scored_ids
+    with open(location, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                scored_ids.add(json.loads(line)["article_id"])
+            except (json.JSONDecodeError, KeyError):
+                continue  # A line cut off by a crash is scored again
+    return scored_ids
+
+
+def iter_archived_articles(
+    folder: str = ARTICLE_ARCHIVE_FOLDER, skip_ids: Set[str] = frozenset()
+) -> Iterator[Article]:
+    """Stream (article ID, article text) pairs from the archive folder"""
+    for filename in sorted(os.listdir(folder)):
+        article_id, extension = os.path.splitext(filename)
+        if extension != ".txt" or article_id in skip_ids:
+            continue
+        yield article_id, read_news_article(os.path.join(folder, filename))
+
+
+def iter_length_sorted_batches(
+    articles: Iterator[Article], batch_size: int
+) -> Iterator[List[Article]]:
+    """Group articles of similar length into batches to keep padding small"""
+    while True:
+        window = list(islice(articles, batch_size * SORTING_WINDOW_BATCHES))
+        if not window:
+            return
+        window.sort(key=lambda article: len(article[1]))
+        for start in range(0, len(window), batch_size):
+            yield window[start : start + batch_size]
+
+
+def init_worker(model_name: str, backend: str, threads: int) -> None:
+    """Load the model once per worker process"""
+    global _worker_model_name, _worker_backend
+    torch.set_num_threads(threads)
+    _worker_model_name, _worker_backend = model_name, backend
+    get_sentiment_model(model_name, backend).load()
+
+
+def score_batch(batch: List[Article]) -> List[Dict[str, object]]:
+    """Score a batch of articles in a worker process"""
+    texts = [text for _, text in batch]
+    scores_list = get_sentiment_model(
+        _worker_model_name, _worker_backend
+    ).predict_batch(texts)
+    return [
+        {"article_id": article_id, "scores": format_sentiment_scores(scores)}
+        for (article_id, _), scores in zip(batch, scores_list)
+    ]
+
+
+def score_archive(
+    batch_size: int = 8,
+    workers: int = 1,
+    model_name: str = DEFAULT_MODEL_NAME,
+    backend: str = DEFAULT_BACKEND,
+    folder: str = ARTICLE_ARCHIVE_FOLDER,
+    location: str = SENTIMENT_SCORES_LOCATION,
+) -> float:
+    """Score every archived article that has no score yet and return articles per second"""
+    scored_ids = load_scored_ids(location)
+    batches = iter_length_sorted_batches(
+        iter_archived_articles(folder, scored_ids), batch_size
+    )
+    threads = max((os.cpu_count() or 1) // workers, 1)
+
+    start = time.perf_counter()
+    scored_count = 0
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(model_name, backend, threads),
+    ) as executor, open(location, "a", encoding="utf-8") as output:
+        # Start on a new line if the previous run crashed in the middle of one
+        if output.tell() and not ends_with_newline(location):
+            output.write("\n")
+
+        pending = set()
+        for batch in batches:
+            pending.add(executor.submit(score_batch, batch))
+
+            # Keep only a few batches in flight so the archive is streamed
+            if len(pending) < workers * 2:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            scored_count += write_results(done, output)
+            print_throughput(scored_count, start)
+
+        done, _ = wait(pending)
+        scored_count += write_results(done, output)
+
+    return print_throughput(scored_count, start)
+
+
+def ends_with_newline(location: str) -> bool:
+    """Check if a file ends with a newline"""
+    with open(location, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def write_results(done, output) -> int:
+    """Append finished results to disk right away so that a crash can resume"""
+    count = 0
+    for future in done:
+        for result in future.result():
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            count += 1
+    output.flush()
+    os.fsync(output.fileno())
+    return count
+
+
+def print_throughput(scored_count: int, start: float) -> float:
+    """Print and return the number of articles scored per second"""
+    elapsed = time.perf_counter() - start
+    throughput = scored_count / elapsed if elapsed else 0.0
+    print(f"{scored_count} articles, {elapsed:.1f}s, {throughput:.2f} articles/s")
+    return throughput
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Score the sentiment of every archived news article"
+    )
+    parser.add_argument("-b", "--batch-size", type=int, default=8)
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=max((os.cpu_count() or 1) // 2, 1),
+        help="number of worker processes",
+    )
+    parser.add_argument("-m", "--model", type=str, default=DEFAULT_MODEL_NAME)
+    parser.add_argument(
+        "-k",
+        "--backend",
+        choices=SENTIMENT_BACKENDS,
+        default=None,
+        help="inference backend (default: sentiment_backend in settings.json)",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(ARTICLE_ARCHIVE_FOLDER):
+        print(f"{ARTICLE_ARCHIVE_FOLDER} not found. Generate some quizzes first.")
+        return
+    backend = args.backend or load_sentiment_backend()
+    score_archive(args.batch_size, args.workers, args.model, backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,62 @@
 # Standard library imports
 import sys
 import os
+import time
+import argparse
 from datetime import datetime
+from typing import Dict
 
 # Third-party imports
+import numpy as np
 import pandas as pd
 import gspread
 import tkinter as tk
 from tkinter import scrolledtext
 from tabulate import tabulate
 
+# Local imports
+from grade_book_mirror import GRADE_BOOK_MIRROR_LOCATION, GradeBookMirror
+from message_cache import load_messages, sync_messages
+from quiz_history import SENT_QUIZ_LOCATION, load_sent_quizzes
+from reading_grader import (
+    build_reading_lookup,
+    grade_reading_answers,
+    parse_reading_answers,
+    total_reading_points,
+)
+
+# A message is "student ID\nanswer"; anything else is not an answer
+MESSAGE_PATTERN = r"\A(?P<student_id>[^\n]*)\n(?P<given_answer>[^\n]*)\Z"
+# Pronunciation quiz answers have "A. よみ" lines after the student ID
+READING_MESSAGE_PATTERN = r"\n\s*[A-Za-z]\s*[.:、。]"
+BENCHMARK_SIZES = (10_000, 100_000)
+
+# Answers sent later than this after a quiz are not graded
+QUIZ_WINDOW = pd.Timedelta(days=1)
+# Grade book columns are named after the day the quiz closes
+GRADE_BOOK_DATE_FORMAT = "%Y/%m/%d"
+
 # File names and paths
 LINE_INCOMING_MESSAGE_FILENAME = "quiz_response"
 LOG_LOCATION = r"txt_files/push_log.txt"
 GRADE_BOOK_FILENAME = "quiz_grade_book"
 SERVICE_ACCOUNT_PATH = r"./json_files/savvy-temple-381905-6e78e62d4ee5.json"
 
-try:
-    SERVICE_ACCOUNT = gspread.service_account(
-        SERVICE_ACCOUNT_PATH)  # type: ignore
-except FileNotFoundError:
-    sys.exit(
-        "Service account file not found. Please download the file from Google Cloud Platform."
-    )
+_service_account = None
+
+
+def get_service_account() -> gspread.Client:
+    """Log in to Google Sheets with the service account on first use"""
+    global _service_account
+    if _service_account is None:
+        try:
+            _service_account = gspread.service_account(
+                SERVICE_ACCOUNT_PATH)  # type: ignore
+        except FileNotFoundError:
+            sys.exit(
+                "Service account file not found. Please download the file from Google Cloud Platform."
+            )
+    return _service_account
 
 
 def format_quiz_times(
@@ -63,7 +97,7 @@ def calculate_point(correct: str, given: str) -> int:
 
 
 def process_data(raw_data: str, correct_answer: str) -> pd.Series:
-    """Process the raw data from the LINE message file"""
+    """Process one LINE message row by row (reference for the --benchmark comparison)"""
     try:
         student_id, given_answer = raw_data.split("\n")
     except ValueError:
@@ -77,6 +111,69 @@ def process_data(raw_data: str, correct_answer: str) -> pd.Series:
     )
 
 
+def score_answers(correct_answer: str, given_answers: pd.Series) -> np.ndarray:
+    """Vectorized calculate_point: compare the answers as NumPy character arrays"""
+    correct = correct_answer.strip().upper()
+    given = given_answers.str.strip().str.upper()
+    points = np.zeros(len(given), dtype=np.int64)
+    same_length = (given.str.len() == len(correct)).to_numpy()
+    if not correct or not same_length.any():
+        return points
+
+    # Fixed-width unicode strings viewed as one code point per column
+    width = len(correct)
+    given_chars = (
+        np.array(given[same_length].tolist(), dtype=f"<U{width}")
+        .view(np.uint32)
+        .reshape(-1, width)
+    )
+    correct_chars = np.array([correct], dtype=f"<U{width}").view(np.uint32)
+    points[same_length] = (given_chars == correct_chars).sum(axis=1)
+    return points
+
+
+def process_messages(df_message: pd.DataFrame, correct_answer: str) -> pd.DataFrame:
+    """Parse and score every message at once; messages that are not answers are dropped"""
+    parsed = df_message["Message"].astype(str).str.extract(MESSAGE_PATTERN)
+    parsed = parsed[parsed["student_id"].notna()]
+    parsed["points"] = score_answers(correct_answer, parsed["given_answer"])
+    return pd.concat([df_message.loc[parsed.index, ["Sent Time"]], parsed], axis=1)
+
+
+def benchmark_processing(sizes=BENCHMARK_SIZES, correct_answer: str = "ABCDA") -> None:
+    """Time the row-by-row and vectorized processing on generated messages"""
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        answers = ["".join(row) for row in rng.choice(list("ABCDabcd"), (size, 5))]
+        messages = [
+            f"S{index % 40:03d}\n{answer}" if index % 10 else answer
+            for index, answer in enumerate(answers)
+        ]
+        df_message = pd.DataFrame(
+            {
+                "Sent Time": pd.date_range("2023-04-07", periods=size, freq="s"),
+                "Message": messages,
+            }
+        )
+
+        start = time.perf_counter()
+        df_rows = df_message["Message"].apply(
+            lambda x: process_data(x, correct_answer))
+        df_rows = df_rows[df_rows["student_id"] != "0"]
+        row_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df_vectorized = process_messages(df_message, correct_answer)
+        vectorized_time = time.perf_counter() - start
+
+        same = df_rows["points"].astype(int).tolist() == df_vectorized["points"].tolist()
+        print(
+            f"{size:>7} messages: row by row {row_time:.3f}s, "
+            f"vectorized {vectorized_time:.3f}s ({row_time / vectorized_time:.0f}x), "
+            f"same points: {same}"
+        )
+
+
 def parse_quiz_end_time(end_time: str) -> datetime:
     """Parse a quiz end time string to a datetime object."""
     return datetime.strptime(end_time, "%Y-%m-%d %H:%M")
@@ -92,49 +189,162 @@ def get_quiz_start_time() -> tuple[datetime, datetime]:
     return now, quiz_start_time
 
 
-def update_grade_book(df_result: pd.DataFrame, quiz_end_time: datetime) -> None:
-    """Update the grade book with the quiz results"""
-    grade_book = SERVICE_ACCOUNT.open(GRADE_BOOK_FILENAME)
-    grade_sheet = grade_book.worksheet("シート1")
-    quiz_end_time_str = quiz_end_time.date().strftime("%Y/%m/%d")
+def update_grade_book(
+    df_result: pd.DataFrame,
+    quiz_end_time: datetime,
+    grade_sheet=None,
+    mirror_location: str = GRADE_BOOK_MIRROR_LOCATION,
+) -> None:
+    """Record the quiz results in the grade book mirror and push the changes to the sheet
 
-    header_row = grade_sheet.row_values(1)
-    if quiz_end_time_str not in header_row:
-        col_num = len(header_row) + 1
-        grade_sheet.update_cell(1, col_num, quiz_end_time_str)
-        header_row.append(quiz_end_time_str)
+    grade_sheet defaults to the real sheet; pass a fake_worksheet.FakeWorksheet to try it offline.
+    """
+    quiz_end_time_str = quiz_end_time.date().strftime(GRADE_BOOK_DATE_FORMAT)
+    record_in_grade_book({quiz_end_time_str: df_result}, grade_sheet, mirror_location)
 
-    # Find the index of the date column
-    date_col_idx = header_row.index(quiz_end_time_str) + 1
 
-    for _, row in df_result.iterrows():
-        student_id = row["student_id"]
-        points = row["points"]
+def record_in_grade_book(
+    results_by_date: Dict[str, pd.DataFrame],
+    grade_sheet=None,
+    mirror_location: str = GRADE_BOOK_MIRROR_LOCATION,
+) -> None:
+    """Record the results of one or more quiz dates with a single pull and push"""
+    if grade_sheet is None:
+        grade_book = get_service_account().open(GRADE_BOOK_FILENAME)
+        grade_sheet = grade_book.worksheet("シート1")
 
-        # Try to find the student ID in the sheet
-        try:
-            student_id_cell = grade_sheet.find(student_id)
-            if student_id_cell:
-                # If the student ID exists, update the points in the date column only if the cell is empty
-                existing_points = grade_sheet.cell(
-                    student_id_cell.row, date_col_idx
-                ).value
-                if not existing_points:  # If the cell is empty
-                    grade_sheet.update_cell(
-                        student_id_cell.row, date_col_idx, points)
-            else:
-                # If the student ID doesn't exist, append a new row with the student ID and points
-                new_row = [student_id] + [""] * (date_col_idx - 2) + [points]
-                grade_sheet.append_row(new_row)
-        except gspread.exceptions.APIError as e:
-            print(f"Error: {e}")
+    mirror = GradeBookMirror(grade_sheet, mirror_location)
+    try:
+        # Pull first so that points entered in the sheet are never overwritten
+        report = mirror.pull()
+        for date, df_result in results_by_date.items():
+            mirror.record_results(df_result, date)
+        pushed = mirror.push()
+        print(
+            f"成績表：{len(pushed)}件更新、シートでの変更{len(report.pulled)}件、"
+            f"競合{len(report.conflicts)}件"
+        )
+    except gspread.exceptions.APIError as e:
+        print(f"Error: {e}")
+    finally:
+        mirror.close()
+
+
+def load_quiz_windows(location: str = SENT_QUIZ_LOCATION) -> pd.DataFrame:
+    """Return every sent quiz and its answer key (main.log_push_status) sorted by sent time"""
+    quizzes = pd.DataFrame(
+        load_sent_quizzes(location),
+        columns=["id", "sent_time", "quiz_type", "answer", "words", "url"],
+    )
+    quizzes["sent_time"] = pd.to_datetime(quizzes["sent_time"])
+    return quizzes.rename(columns={"id": "quiz_id"}).sort_values(
+        "sent_time", ignore_index=True
+    )
+
+
+def assign_quizzes(
+    df_message: pd.DataFrame, quizzes: pd.DataFrame, window=QUIZ_WINDOW
+) -> pd.DataFrame:
+    """Attach each message to the last quiz of its type sent before it, within the window"""
+    messages = df_message.reset_index().sort_values("Sent Time")
+    # Quizzes of both types are open at the same time, so an answer only goes to
+    # a quiz of the type it answers
+    is_reading = messages["Message"].astype(str).str.contains(READING_MESSAGE_PATTERN)
+    messages["quiz_type"] = np.where(is_reading, "読み方クイズ", "単語意味クイズ")
+    assigned = pd.merge_asof(
+        messages,
+        quizzes,
+        left_on="Sent Time",
+        right_on="sent_time",
+        by="quiz_type",
+        direction="backward",
+        tolerance=window,
+    )
+    assigned = assigned[assigned["quiz_id"].notna()]
+    return assigned.set_index(df_message.index.name or "index")
+
+
+def grade_all_quizzes(
+    df_message: pd.DataFrame, quizzes: pd.DataFrame, window=QUIZ_WINDOW
+) -> pd.DataFrame:
+    """Grade the answers to every sent quiz in one pass over the messages"""
+    assigned = assign_quizzes(df_message, quizzes, window)
+    definition = assigned[assigned["quiz_type"] == "単語意味クイズ"]
+    parsed = definition["Message"].astype(str).str.extract(MESSAGE_PATTERN)
+    parsed = parsed[parsed["student_id"].notna()]
+    quiz_columns = ["Sent Time", "quiz_id", "sent_time", "answer"]
+    graded = pd.concat([definition.loc[parsed.index, quiz_columns], parsed], axis=1)
+
+    # One vectorized scoring per answer key, not per message
+    graded["points"] = 0
+    for answer, index in graded.groupby("answer").groups.items():
+        graded.loc[index, "points"] = score_answers(
+            answer, graded.loc[index, "given_answer"])
+    graded["manual"] = 0
+    # Same column as main() with quiz_end_time = sent_time + window
+    graded["date"] = (graded["sent_time"] + window).dt.strftime(GRADE_BOOK_DATE_FORMAT)
+
+    graded = graded.drop(columns=["answer"])
+    reading = grade_reading_quizzes(
+        assigned[assigned["quiz_type"] == "読み方クイズ"], quizzes, window)
+    if reading.empty:
+        return graded
+    return pd.concat([graded, reading]).sort_index()
+
+
+def grade_reading_quizzes(
+    assigned: pd.DataFrame, quizzes: pd.DataFrame, window=QUIZ_WINDOW
+) -> pd.DataFrame:
+    """Grade the pronunciation quiz answers; the grade book gets a separate 読み方 column"""
+    columns = ["Sent Time", "quiz_id", "sent_time", "student_id", "given_answer",
+               "points", "manual", "date"]
+    if assigned.empty:
+        return pd.DataFrame(columns=columns)
+
+    # The furigana of every question is looked up once, not once per answer
+    lookup = build_reading_lookup(quizzes[quizzes["quiz_type"] == "読み方クイズ"])
+    answers = parse_reading_answers(assigned["Message"])
+    graded = grade_reading_answers(answers, assigned["quiz_id"], lookup)
+    totals = total_reading_points(graded)
+    totals = totals.join(assigned[["Sent Time", "quiz_id", "sent_time"]])
+    # A malformed reply is capped and reported instead of stopping the whole run
+    question_counts = totals["quiz_id"].map(lookup.groupby("quiz_id").size())
+    over = totals["points"] > question_counts
+    for index, student_id in totals.loc[over, "student_id"].items():
+        print(f"WARNING: 行{index}（{student_id}）の読み方クイズの得点を問題数までにしました。")
+    totals["points"] = totals["points"].clip(upper=question_counts)
+    quiz_end_times = totals["sent_time"] + window
+    totals["date"] = quiz_end_times.dt.strftime(GRADE_BOOK_DATE_FORMAT) + "(読み方)"
+    return totals[columns]
+
+
+def grade_history(window=QUIZ_WINDOW) -> None:
+    """Grade every quiz in sent_quizzes.jsonl whose window has closed and update the grade book"""
+    line_message = get_service_account().open(LINE_INCOMING_MESSAGE_FILENAME)
+    new_message_count = sync_messages(line_message.worksheet("Messages"))
+    print(f"新しいメッセージ：{new_message_count}件\n")
+
+    quizzes = load_quiz_windows()
+    if quizzes.empty:
+        sys.exit("Error: No sent quizzes found in the quiz history.")
+    df_message = load_messages(quizzes["sent_time"].min())
+    graded = grade_all_quizzes(df_message, quizzes, window)
+    pretty_print_dataframe(graded.drop(columns=["quiz_id", "sent_time"]))
+    manual_count = int(graded["manual"].sum())
+    if manual_count:
+        print(f"カタカナ語の解答{manual_count}件は手動で採点してください。")
+
+    # Only quizzes whose answering window has closed go to the grade book
+    closed = graded["sent_time"] + window <= datetime.now()
+    record_in_grade_book(
+        {date: df_result for date, df_result in graded[closed].groupby("date")}
+    )
 
 
 def pretty_print_dataframe(df: pd.DataFrame) -> None:
     """Print a dataframe in a pretty format"""
+    # The index is the row number in the Messages sheet
     data = df.reset_index().values.tolist()
-    for row in data:
-        row[0] += 2  # Add 2 to the 'Index' column
     header = ["Index"] + df.columns.tolist()
     print(tabulate(data, headers=header, tablefmt="grid"))
 
@@ -146,8 +356,6 @@ def display_table_in_popup(df, quiz_info) -> None:
         """Format a dataframe as a table"""
         header = ["Index"] + df_.columns.tolist()
         data = df_.reset_index().values.tolist()
-        for row in data:
-            row[0] += 2
         formatted_table = tabulate(data, headers=header, tablefmt="grid")
         return formatted_table
 
@@ -186,37 +394,25 @@ def main(end_time: str) -> None:
     correct_answer = get_quiz_answer()
     print(f"単語意味クイズ正解：{correct_answer}\n")
 
-    # Get the quiz answers from student messages
-    line_message = SERVICE_ACCOUNT.open(LINE_INCOMING_MESSAGE_FILENAME)
+    # Get the quiz answers from student messages; only the rows added since the last
+    # run are downloaded to the local message cache
+    line_message = get_service_account().open(LINE_INCOMING_MESSAGE_FILENAME)
     message_sheet = line_message.worksheet("Messages")
-    message_records = message_sheet.get_all_records()
-    df_message = pd.DataFrame(message_records)
-    df_message["Sent Time"] = pd.to_datetime(df_message["Sent Time"])
+    new_message_count = sync_messages(message_sheet)
+    print(f"新しいメッセージ：{new_message_count}件\n")
+    df_message = load_messages(quiz_start_time, quiz_end_time)
 
     # Process the data
     correct_answer = get_quiz_answer()
-    df_message = df_message.query(
-        "@quiz_start_time <= `Sent Time` <= @quiz_end_time")
-    df_processed = df_message["Message"].apply(
-        lambda x: process_data(x, correct_answer)
-    )
-
-    # Concatenate the processed data with the original data
-    df_result = pd.concat([df_message["Sent Time"], df_processed], axis=1)
-    try:
-        df_result = df_result.query(
-            'student_id != "0" or given_answer != "0" or points != "0"'
-        )
-        pretty_print_dataframe(df_result)
-
-        quiz_info = format_quiz_times(quiz_start_time, now, quiz_end_time)
-        correct_answer = get_quiz_answer()
-        quiz_info += f"単語意味クイズ正解：{correct_answer}\n"
-        display_table_in_popup(df_result, quiz_info)
-
-    except pd.errors.UndefinedVariableError:
+    df_result = process_messages(df_message, correct_answer)
+    if df_result.empty:
         sys.exit("Error: No data found. Check the quiz start and end times.")
 
+    pretty_print_dataframe(df_result)
+    quiz_info = format_quiz_times(quiz_start_time, now, quiz_end_time)
+    quiz_info += f"単語意味クイズ正解：{correct_answer}\n"
+    display_table_in_popup(df_result, quiz_info)
+
     if quiz_end_time > now:
         sys.exit(
             "Warning: quiz_end_time has not been reached. Data will not be updated."
@@ -226,6 +422,25 @@ def main(end_time: str) -> None:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grade the quiz answers")
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="time the answer processing on 10k and 100k generated messages and exit",
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="grade every sent quiz in the quiz history instead of the last one",
+    )
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_processing()
+        sys.exit()
+    if args.all:
+        grade_history()
+        sys.exit()
+
     # Clearing the terminal
     os.system("cls") if sys.platform.startswith(
         "win32") else os.system("clear")
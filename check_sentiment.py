@@ -1,36 +1,354 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from scipy.special import softmax
+# Standard library imports
+import os
+import sys
+import json
+import inspect
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Third-party imports
+import numpy as np
+
+# torch, transformers and scipy take seconds to import, so they are imported when
+# the model is first loaded instead of when this module is imported
+
+# Local imports
+from sentiment_cache import (
+    get_sentiment_cache_key,
+    load_cached_scores,
+    save_cached_scores,
+)
 
 NEWS_ARTICLE_LOCATION = r"txt_files/news_article.txt"
 LOG_LOCATION = r"./txt_files/push_log.txt"
+DEFAULT_MODEL_NAME = "koheiduck/bert-japanese-finetuned-sentiment"
+MAX_MODEL_TOKENS = 512
+SETTINGS_FILE_LOCATION = r"./json_files/settings.json"
+ONNX_MODEL_FOLDER = r"./onnx_models"
+
+# torch: float32 model, int8: dynamically quantized linear layers, onnx: ONNX Runtime
+SENTIMENT_BACKENDS = ("torch", "int8", "onnx")
+DEFAULT_BACKEND = "torch"
+
+
+def load_sentiment_backend(location: str = SETTINGS_FILE_LOCATION) -> str:
+    """Load the sentiment backend from the settings file"""
+    try:
+        with open(location, "r", encoding="utf-8") as f:
+            backend = json.load(f).get("sentiment_backend", DEFAULT_BACKEND)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return DEFAULT_BACKEND
+    if backend not in SENTIMENT_BACKENDS:
+        print(f"Unknown sentiment backend {backend}. Using {DEFAULT_BACKEND}.")
+        return DEFAULT_BACKEND
+    return backend
+
+
+def get_onnx_model_path(model_name: str) -> str:
+    """Return the path of the exported ONNX model"""
+    return os.path.join(ONNX_MODEL_FOLDER, model_name.replace("/", "--"), "model.onnx")
+
+
+def export_onnx_model(model, tokenizer, location: str) -> None:
+    """Export a sequence classification model to ONNX once"""
+    import torch
+
+    directory = os.path.dirname(location)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    # Inputs are passed positionally, so follow the order of forward()
+    dummy = tokenizer("テスト", return_tensors="pt")
+    input_names = [
+        name for name in inspect.signature(model.forward).parameters if name in dummy
+    ]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    # Export to a temporary file so an interrupted export is not loaded later
+    temp_location = location + ".tmp"
+    torch.onnx.export(
+        model,
+        tuple(dummy[name] for name in input_names),
+        temp_location,
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=17,
+        dynamo=False,
+    )
+    os.replace(temp_location, location)
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Split a text into non-empty paragraphs"""
+    paragraphs = [line.strip() for line in text.splitlines() if line.strip()]
+    return paragraphs or [text]
+
+
+def average_chunk_scores(
+    chunk_scores: np.ndarray,
+    chunks: List[Tuple[int, List[int]]],
+    groups: int,
+) -> List[np.ndarray]:
+    """Average chunk scores per group (paragraph or text), weighted by the number of tokens"""
+    weights = np.array([max(len(token_ids), 1) for _, token_ids in chunks])
+    indices = np.array([index for index, _ in chunks])
+    return [
+        np.average(
+            chunk_scores[indices == index], axis=0, weights=weights[indices == index]
+        )
+        for index in range(groups)
+    ]
+
+
+class SentimentModel:
+    """Sentiment model that is loaded once on first use and kept warm"""
+
+    def __init__(
+        self, model_name: str = DEFAULT_MODEL_NAME, backend: str = DEFAULT_BACKEND
+    ) -> None:
+        if backend not in SENTIMENT_BACKENDS:
+            raise ValueError(f"Unknown sentiment backend: {backend}")
+        self.model_name = model_name
+        self.backend = backend
+        self.tokenizer = None
+        self.model = None
+        self.load_time: Optional[float] = None
+        self.inference_count = 0
+        self.total_inference_time = 0.0
+        self.last_inference_time: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def load(self) -> None:
+        """Load the tokenizer and model if they are not loaded yet"""
+        with self._lock:
+            if self.is_loaded:
+                return
+            start = time.perf_counter()
+            import torch
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            if self.backend == "onnx":
+                self.model = self.load_onnx_session()
+            else:
+                model = AutoModelForSequenceClassification.from_pretrained(
+                    self.model_name
+                )
+                model.eval()
+                if self.backend == "int8":
+                    model = torch.quantization.quantize_dynamic(
+                        model, {torch.nn.Linear}, dtype=torch.qint8
+                    )
+                self.model = model
+            self.load_time = time.perf_counter() - start
+
+    def load_onnx_session(self):
+        """Export the model to ONNX on first use and open an ONNX Runtime session"""
+        try:
+            import onnxruntime  # Optional dependency, only needed for the onnx backend
+        except ImportError as e:
+            raise ImportError(
+                "The onnx backend requires onnxruntime: pip install onnxruntime onnx"
+            ) from e
+
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        location = get_onnx_model_path(self.model_name)
+        if not os.path.exists(location):
+            model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+            model.eval()
+            export_onnx_model(model, self.tokenizer, location)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        options.intra_op_num_threads = torch.get_num_threads()
+        return onnxruntime.InferenceSession(
+            location, options, providers=["CPUExecutionProvider"]
+        )
+
+    def run_model(self, features: List[Dict[str, List[int]]]) -> np.ndarray:
+        """Pad the features to the longest one and return the logits"""
+        if self.backend == "onnx":
+            batch = self.tokenizer.pad(features, padding=True, return_tensors="np")  # type: ignore
+            input_names = [model_input.name for model_input in self.model.get_inputs()]  # type: ignore
+            # Inputs that pad() does not create, e.g. token_type_ids, are all zeros
+            inputs = {
+                name: batch.get(name, np.zeros_like(batch["input_ids"])).astype(
+                    np.int64
+                )
+                for name in input_names
+            }
+            return self.model.run(["logits"], inputs)[0]  # type: ignore
+
+        import torch
 
+        with torch.inference_mode():
+            batch = self.tokenizer.pad(features, padding=True, return_tensors="pt")  # type: ignore
+            return self.model(**batch).logits.numpy()  # type: ignore
 
-def predict_sentiment_jp(
-    text: str, model_name: str = "koheiduck/bert-japanese-finetuned-sentiment"
-) -> dict[str, str]:
-    """Predict sentiment of input text using a pre-trained model."""
-    # Load tokenizer and model
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    def get_max_chunk_tokens(self) -> int:
+        """Return the number of text tokens that fit in one model input"""
+        max_length = min(self.tokenizer.model_max_length, MAX_MODEL_TOKENS)  # type: ignore
+        return max_length - 2  # [CLS] and [SEP]
 
-    # Encode input text and return pytorch tensors
-    encoded_review = tokenizer(text, return_tensors="pt")
+    def split_into_chunks(self, paragraphs: List[str]) -> List[Tuple[int, List[int]]]:
+        """Split paragraphs into (paragraph index, token ids) windows that fit the model"""
+        max_chunk_tokens = self.get_max_chunk_tokens()
+        chunks = []
+        for index, paragraph in enumerate(paragraphs):
+            encoded = self.tokenizer(  # type: ignore
+                paragraph, add_special_tokens=False, verbose=False
+            )
+            token_ids = encoded["input_ids"]
+            for start in range(0, max(len(token_ids), 1), max_chunk_tokens):
+                chunks.append((index, token_ids[start : start + max_chunk_tokens]))
+        return chunks
 
-    # Get model output
-    output = model(**encoded_review)
+    def predict_chunks(self, chunks: List[List[int]]) -> np.ndarray:
+        """Return the softmax scores of every chunk, run as one padded batch"""
+        from scipy.special import softmax
 
-    # Get sentiment scores in numpy array and apply softmax function
-    scores = output.logits[0].detach().numpy()
-    scores = softmax(scores)
+        self.load()
+        start = time.perf_counter()
 
-    # Format scores as percentages
+        # Add [CLS]/[SEP] to every chunk and pad them to the longest one
+        cls_id, sep_id = self.tokenizer.cls_token_id, self.tokenizer.sep_token_id  # type: ignore
+        features = [{"input_ids": [cls_id, *token_ids, sep_id]} for token_ids in chunks]
+        logits = self.run_model(features)
+
+        self.last_inference_time = time.perf_counter() - start
+        self.total_inference_time += self.last_inference_time
+        self.inference_count += 1
+        return softmax(logits, axis=1)
+
+    def predict_paragraphs(
+        self, paragraphs: List[str]
+    ) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """Return the overall scores and the scores of each paragraph (neutral, negative, positive)"""
+        self.load()
+        chunks = self.split_into_chunks(paragraphs)
+        chunk_scores = self.predict_chunks([token_ids for _, token_ids in chunks])
+
+        whole_text = [(0, token_ids) for _, token_ids in chunks]
+        overall_scores = average_chunk_scores(chunk_scores, whole_text, 1)[0]
+        paragraph_scores = average_chunk_scores(chunk_scores, chunks, len(paragraphs))
+        return overall_scores, paragraph_scores
+
+    def predict_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """Return the scores of several texts, running all their chunks as one padded batch"""
+        self.load()
+        chunks = []
+        for index, text in enumerate(texts):
+            for _, token_ids in self.split_into_chunks(split_paragraphs(text)):
+                chunks.append((index, token_ids))
+        chunk_scores = self.predict_chunks([token_ids for _, token_ids in chunks])
+        return average_chunk_scores(chunk_scores, chunks, len(texts))
+
+    def predict(self, text: str) -> np.ndarray:
+        """Return the softmax scores (neutral, negative, positive) of a text of any length"""
+        return self.predict_paragraphs(split_paragraphs(text))[0]
+
+    def get_metrics(self) -> Dict[str, Optional[float]]:
+        """Return the load time and inference time metrics in seconds"""
+        mean_inference_time = (
+            self.total_inference_time / self.inference_count
+            if self.inference_count
+            else None
+        )
+        return {
+            "load_time": self.load_time,
+            "inference_count": self.inference_count,
+            "last_inference_time": self.last_inference_time,
+            "mean_inference_time": mean_inference_time,
+        }
+
+
+# One model per model name and backend for the whole process
+_sentiment_models: Dict[Tuple[str, str], SentimentModel] = {}
+_sentiment_models_lock = threading.Lock()
+
+
+def get_sentiment_model(
+    model_name: str = DEFAULT_MODEL_NAME, backend: str = DEFAULT_BACKEND
+) -> SentimentModel:
+    """Return the process-wide sentiment model (not loaded until first used)"""
+    with _sentiment_models_lock:
+        if (model_name, backend) not in _sentiment_models:
+            _sentiment_models[(model_name, backend)] = SentimentModel(
+                model_name, backend
+            )
+        return _sentiment_models[(model_name, backend)]
+
+
+def format_sentiment_scores(scores) -> dict[str, str]:
+    """Format softmax scores as a dictionary of percentages"""
     scores_str = [str(round(num * 100, 1)) + "%" for num in scores]
 
     # Create a dictionary of sentiment labels and their respective scores
-    scores_dict = {"否定的": scores_str[1],
-                   "中立的": scores_str[0], "肯定的": scores_str[2]}
+    return {"否定的": scores_str[1], "中立的": scores_str[0], "肯定的": scores_str[2]}
+
+
+def predict_paragraph_scores(
+    text: str,
+    model_name: str = DEFAULT_MODEL_NAME,
+    backend: str = DEFAULT_BACKEND,
+    use_cache: bool = True,
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Return the overall and paragraph scores, reusing cached scores of the same text"""
+    key = get_sentiment_cache_key(text, model_name, backend)
+    cached = load_cached_scores(key) if use_cache else None
+    if cached is not None:
+        scores, paragraph_scores = cached
+        return np.array(scores), [np.array(scores_) for scores_ in paragraph_scores]
+
+    scores, paragraph_scores = get_sentiment_model(
+        model_name, backend
+    ).predict_paragraphs(split_paragraphs(text))
+    if use_cache:
+        save_cached_scores(
+            key, scores.tolist(), [scores_.tolist() for scores_ in paragraph_scores]
+        )
+    return scores, paragraph_scores
 
-    return scores_dict
+
+def predict_paragraph_sentiment_jp(
+    text: str,
+    model_name: str = DEFAULT_MODEL_NAME,
+    backend: str = DEFAULT_BACKEND,
+    use_cache: bool = True,
+) -> Tuple[dict[str, str], List[Tuple[str, dict[str, str]]]]:
+    """Predict the sentiment of a whole text and of each of its paragraphs."""
+    paragraphs = split_paragraphs(text)
+    scores, paragraph_scores = predict_paragraph_scores(
+        text, model_name, backend, use_cache
+    )
+    return format_sentiment_scores(scores), [
+        (paragraph, format_sentiment_scores(scores_))
+        for paragraph, scores_ in zip(paragraphs, paragraph_scores)
+    ]
+
+
+def print_sentiment_metrics(
+    model_name: str = DEFAULT_MODEL_NAME, backend: str = DEFAULT_BACKEND
+) -> None:
+    """Print the model load time and inference time."""
+    metrics = get_sentiment_model(model_name, backend).get_metrics()
+    for name, value in metrics.items():
+        if isinstance(value, float):
+            value = f"{value:.3f}s"
+        print(f"{name}: {value}")
 
 
 def print_input_text(text: str) -> None:
@@ -57,9 +375,9 @@ def print_sentiment_scores(scores_dict: dict[str, str]) -> None:
     print()
 
 
-def read_news_article() -> str:
+def read_news_article(location: str = NEWS_ARTICLE_LOCATION) -> str:
     """Read the news article from the txt file"""
-    with open(NEWS_ARTICLE_LOCATION, "r", encoding="utf-8") as f:
+    with open(location, "r", encoding="utf-8") as f:
         lines = f.readlines()
         # Filter out empty lines
         non_empty_lines = [line for line in lines if line.strip()]
@@ -69,9 +387,117 @@ def read_news_article() -> str:
     return article
 
 
+def get_peak_memory_mb() -> float:
+    """Return the peak resident memory of the current process in MB"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return float("nan")
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, "peak_wset", memory_info.rss) / 1024**2
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def benchmark_backend(
+    text: str, model_name: str, backend: str, repeat: int
+) -> Dict[str, object]:
+    """Measure one backend; run in a fresh process so that peak memory is its own"""
+    model = get_sentiment_model(model_name, backend)
+    model.load()
+    paragraphs = split_paragraphs(text)
+    model.predict_paragraphs(paragraphs)  # Warm up
+
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scores, paragraph_scores = model.predict_paragraphs(paragraphs)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "load_time": model.load_time,
+        "median_latency": float(np.median(latencies)),
+        "peak_memory_mb": get_peak_memory_mb(),
+        "scores": scores,
+        "paragraph_scores": np.array(paragraph_scores),
+    }
+
+
+def compare_backends(
+    text: str,
+    model_name: str = DEFAULT_MODEL_NAME,
+    backends: Tuple[str, ...] = SENTIMENT_BACKENDS,
+    repeat: int = 10,
+) -> None:
+    """Compare latency, memory and score agreement of the backends against torch"""
+    results = {}
+    for backend in (DEFAULT_BACKEND, *[b for b in backends if b != DEFAULT_BACKEND]):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            try:
+                results[backend] = executor.submit(
+                    benchmark_backend, text, model_name, backend, repeat
+                ).result()
+            except ImportError as e:
+                print(f"{backend}: skipped ({e})")
+
+    reference = results[DEFAULT_BACKEND]
+    print(
+        f"{'backend':<8}{'load':>9}{'latency':>10}{'memory':>11}"
+        f"{'max diff':>10}{'agreement':>11}"
+    )
+    for backend, result in results.items():
+        max_diff = np.abs(result["scores"] - reference["scores"]).max()
+        agreement = np.mean(
+            result["paragraph_scores"].argmax(axis=1)
+            == reference["paragraph_scores"].argmax(axis=1)
+        )
+        print(
+            f"{backend:<8}{result['load_time']:>8.2f}s"
+            f"{result['median_latency'] * 1000:>8.1f}ms"
+            f"{result['peak_memory_mb']:>9.0f}MB"
+            f"{max_diff * 100:>9.2f}%{agreement * 100:>10.0f}%"
+        )
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Predict the sentiment of the saved news article"
+    )
+    parser.add_argument(
+        "-k",
+        "--backend",
+        choices=SENTIMENT_BACKENDS,
+        default=None,
+        help="inference backend (default: sentiment_backend in settings.json)",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="compare the latency, memory and scores of every backend",
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=10)
+    parser.add_argument(
+        "--no-cache", action="store_true", help="ignore cached sentiment scores"
+    )
+    args = parser.parse_args()
+
     input_text = read_news_article()
+    if args.benchmark:
+        compare_backends(input_text, repeat=args.repeat)
+        sys.exit()
+
+    sentiment_backend = args.backend or load_sentiment_backend()
     print_input_text(input_text)
 
-    sentiment_scores_dict = predict_sentiment_jp(input_text)
+    sentiment_scores_dict, paragraph_scores_list = predict_paragraph_sentiment_jp(
+        input_text, backend=sentiment_backend, use_cache=not args.no_cache
+    )
     print_sentiment_scores(sentiment_scores_dict)
+    for paragraph, paragraph_scores_dict in paragraph_scores_list:
+        print_input_text(paragraph)
+        print_sentiment_scores(paragraph_scores_dict)
+    print_sentiment_metrics(backend=sentiment_backend)
@@ -1,4 +1,8 @@
 # Standard library imports
+import time
+
+STARTUP_TIME = time.perf_counter()
+
 import sys
 import os
 import subprocess
@@ -11,13 +15,16 @@ from tkinter import TclError
 # Third-party imports
 import customtkinter as ctk
 import threading
-from requests.exceptions import ConnectionError
 
 # TODO: Fix import error when using sentiment analysis
 
 
-# Local imports
-from main import main, push_quiz, save_quiz_vocab
+# Local imports (main imports selenium, requests and torch only when they are used)
+from main import main, push_quiz, get_push_outbox, regenerate_quizzes
+from outbox import FAILED, SENT
+from scheduler import get_scheduler
+
+IMPORT_TIME = time.perf_counter() - STARTUP_TIME
 
 # Version number
 VERSION = "v2.4.2"
@@ -38,6 +45,36 @@ SETTINGS_FILE_LOCATION = r"./json_files/settings.json"
 JSON_FOLDER_PATH = r"./json_files"
 TXT_FOLDER_PATH = r"./txt_files"
 
+# Modules that should not be imported before the window appears
+HEAVY_MODULES = [
+    "selenium",
+    "webdriver_manager",
+    "bs4",
+    "chardet",
+    "requests",
+    "linebot",
+    "torch",
+    "transformers",
+    "scipy",
+    "pandas",
+    "gspread",
+]
+
+
+def connection_errors() -> Tuple:
+    """Return the connection error types; requests is already imported when they are raised"""
+    from requests.exceptions import ConnectionError as RequestsConnectionError
+
+    return ConnectionError, RequestsConnectionError
+
+
+def report_startup_profile() -> None:
+    """Print the time to the first window and the heavy modules imported so far"""
+    print(f"Time to first window: {time.perf_counter() - STARTUP_TIME:.3f}s")
+    print(f"  Imports: {IMPORT_TIME:.3f}s")
+    loaded_modules = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"  Heavy modules loaded: {', '.join(loaded_modules) or 'none'}")
+
 
 def create_default_settings_file() -> None:
     """Create a default settings file if it doesn't exist."""
@@ -52,6 +89,7 @@ def create_default_settings_file() -> None:
         "scaling": "110%",
         "maximize_screen_check_box": 0,
         "emotion_analysis_switch": 0,
+        "sentiment_backend": "torch",
         "grade_book_url": "https://www.google.com",
     }
     if not os.path.exists(JSON_FOLDER_PATH):
@@ -325,11 +363,29 @@ class MainTab(ctk.CTkTabview):
             master=self.settings,
             text="ログファイルの感情分析",
             font=self.font,
+            command=self.toggle_emotion_analysis,
         )
         self.emotion_analysis_switch.grid(
             row=5, column=0, padx=(0, 0), pady=0, sticky="n"
         )
 
+        # *感情分析バックエンド OptionMenu
+        self.sentiment_backend_label = ctk.CTkLabel(
+            master=self.settings, text="感情分析バックエンド:", font=self.font
+        )
+        self.sentiment_backend_label.grid(
+            row=6, column=0, padx=(0, 125), pady=20, sticky="n"
+        )
+        self.sentiment_backend_option_menu = ctk.CTkOptionMenu(
+            self.settings,
+            values=["torch", "int8", "onnx"],
+            font=self.font,
+            width=100,
+        )
+        self.sentiment_backend_option_menu.grid(
+            row=6, column=0, padx=(90, 0), pady=20, sticky="n"
+        )
+
         # *テキストファイルフォルダー開く Button
         self.txt_file_folder_button = ctk.CTkButton(
             master=self.settings,
@@ -587,6 +643,7 @@ class MainTab(ctk.CTkTabview):
                 "emotion_analysis_switch": 1
                 if self.emotion_analysis_switch.get() == 1
                 else 0,
+                "sentiment_backend": self.sentiment_backend_option_menu.get(),
             }
         )
 
@@ -626,10 +683,17 @@ class MainTab(ctk.CTkTabview):
             self.broadcast_switch.deselect()
             self.toggle_send_to_all_label()
 
+        # Update the sentiment backend before the model is preloaded
+        self.sentiment_backend_option_menu.set(
+            str(settings_file.get("sentiment_backend", "torch"))
+        )
+
         # Update the emotion_analysis_switch
         emotion_analysis = settings_file.get("emotion_analysis_switch")
         if emotion_analysis == 1:
             self.emotion_analysis_switch.select()
+            # Preload the model once the window is shown, not during startup
+            self.after_idle(self.toggle_emotion_analysis)
         else:
             self.emotion_analysis_switch.deselect()
 
@@ -669,6 +733,19 @@ class MainTab(ctk.CTkTabview):
         else:
             self.broadcast_on_label.grid()
 
+    def toggle_emotion_analysis(self) -> None:
+        """Start the model worker process when emotion analysis is on."""
+        try:
+            from model_worker import get_model_worker
+        except ImportError:
+            print("Sentiment analysis module failed. Skipping sentiment analysis.")
+            return
+        worker = get_model_worker(backend=self.sentiment_backend_option_menu.get())
+        if self.emotion_analysis_switch.get() == 0:
+            worker.stop()  # Free the memory of the model
+        else:
+            worker.start()
+
     def toggle_datetime_display(self) -> None:
         """Toggle the date and time label visibility."""
         if self.display_datetime_switch.get() == 0:
@@ -1009,6 +1086,11 @@ class AppFrame(ctk.CTk):
             self.after_idle(lambda: self.geometry("1220x754"))
             self.focus_force()
 
+        # Resume quizzes left in the outbox by a previous run and send scheduled
+        # messages (scheduler.py) once the window is shown
+        self.after_idle(self.start_outbox)
+        self.after_idle(get_scheduler)
+
         # Create feedback message label
         self.feedback_label = ctk.CTkLabel(
             master=self, text="", font=self.font)
@@ -1083,6 +1165,18 @@ class AppFrame(ctk.CTk):
             row=3, column=0, padx=440, pady=10, sticky="nw")
         self.open_news_url_button.configure(state="disabled")
 
+        # Regenerate quiz button
+        self.regenerate_quiz_button = ctk.CTkButton(
+            master=self,
+            text="クイズ再作成",
+            command=self.start_quiz_regeneration_thread,
+            font=self.font,
+            width=120,
+        )
+        self.regenerate_quiz_button.grid(
+            row=3, column=0, padx=580, pady=10, sticky="nw")
+        self.regenerate_quiz_button.configure(state="disabled")
+
         # Configure the grid
         self.grid_rowconfigure(4, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -1128,6 +1222,7 @@ class AppFrame(ctk.CTk):
             self.decrement_button.configure(state="disabled")
             self.generate_quiz_button.configure(state="disabled")
             self.open_news_url_button.configure(state="disabled")
+            self.regenerate_quiz_button.configure(state="disabled")
             self.tab_view.broadcast_switch.configure(state="disabled")
             self.tab_view.emotion_analysis_switch.configure(state="disabled")
             self.feedback_label.configure(text="")
@@ -1174,7 +1269,7 @@ class AppFrame(ctk.CTk):
         # Handle errors
         except ValueError:
             self.error_handler("最大問題数を指定してください。")
-        except ConnectionError:
+        except connection_errors():
             self.error_handler("インターネット接続を確認してください。")
         except PermissionError:
             self.error_handler("LINEのTOKENを確認してください。")
@@ -1198,9 +1293,34 @@ class AppFrame(ctk.CTk):
             self.decrement_button.configure(state="normal")
             self.progress_text_label.configure(text="")
             self.open_news_url_button.configure(state="normal")
+            self.regenerate_quiz_button.configure(state="normal")
             self.tab_view.broadcast_switch.configure(state="normal")
             self.tab_view.emotion_analysis_switch.configure(state="normal")
 
+    def start_quiz_regeneration_thread(self) -> None:
+        """Start a thread to regenerate the quizzes of the current article."""
+        regeneration_thread = threading.Thread(target=self.run_quiz_regeneration)
+        regeneration_thread.daemon = True
+        regeneration_thread.start()
+
+    def run_quiz_regeneration(self) -> None:
+        """Regenerate the quizzes from the saved article with a new seed."""
+        self.regenerate_quiz_button.configure(state="disabled")
+        self.generate_quiz_button.configure(state="disabled")
+        try:
+            regenerate_quizzes(questions=int(self.quiz_number_entry.get()))
+        except ValueError:
+            self.error_handler("最大問題数を指定してください。")
+        except (FileNotFoundError, IndexError):
+            self.error_handler("ニュース文章が見つかりません。クイズを作成してください。")
+        else:
+            self.show_feedback_label("再作成完了(発信前にクイズの編集は可能)！")
+            self.send_quiz_button.configure(state="normal")
+            self.update_textboxes()
+        finally:
+            self.regenerate_quiz_button.configure(state="normal")
+            self.generate_quiz_button.configure(state="normal")
+
     def increment_questions(self) -> None:
         """Increase the value of the questions Entry."""
         current_value_str = self.quiz_number_entry.get().strip()
@@ -1246,26 +1366,47 @@ class AppFrame(ctk.CTk):
         self.tab_view.sub_txt_tabs.set("ログファイル")
 
         try:
+            with open(LOG_LOCATION, "r", encoding="utf-8") as f:
+                url = f.readlines()[1]
+            # The quiz is queued and sent in the background; see show_push_status
             if self.quiz_type_dropdown.get() == "読み方クイズ":
-                push_quiz(PRONOUN_QUIZ_LOCATION)
+                push_quiz(PRONOUN_QUIZ_LOCATION, news_url=url)
             else:
-                push_quiz(DEF_QUIZ_LOCATION)
-        except PermissionError:
-            self.error_handler("LINEのTOKENを確認してください。")
+                push_quiz(DEF_QUIZ_LOCATION, news_url=url)
         except IndexError:
             self.error_handler('クイズ中の"---"は削除しないでください。')
-        except ConnectionError:
-            self.error_handler("インターネット接続を確認してください。")
         else:
-            self.feedback_label.configure(text="LINEに送信しました！")
-            with open(LOG_LOCATION, "a+", encoding="utf-8") as f:
-                f.write("送信済み\n")
-                f.seek(0)
-                url = f.readlines()[1]
-            save_quiz_vocab(url)
-            self.update_textboxes()
+            self.feedback_label.configure(text="LINEに送信中...")
             self.send_quiz_button.configure(state="disabled")
 
+    def start_outbox(self) -> None:
+        """Start sending queued quizzes and report their status in the window."""
+        get_push_outbox().add_listener(self.on_push_status)
+
+    def on_push_status(self, entry: dict, status: str, message: str) -> None:
+        """Forward an outbox status change from the outbox thread to the Tk thread."""
+        self.after(0, self.show_push_status, status, entry["status_code"], message)
+
+    def show_push_status(self, status: str, status_code, message: str) -> None:
+        """Show the status of a queued quiz and reload the log file."""
+        if status == SENT:
+            self.feedback_label.configure(text="LINEに送信しました！")
+        elif status_code in (401, 403):
+            self.error_handler("LINEのTOKENを確認してください。")
+        elif status == FAILED:
+            self.error_handler(f"LINEに送信できませんでした。{message}")
+        else:
+            self.feedback_label.configure(text="送信エラー。自動で再送信します...")
+
+        # Only the log and past quizzes; the quiz textboxes may have unsaved edits
+        for tab_name, file_location in (
+            ("ログファイル", LOG_LOCATION),
+            ("過去のクイズ", PAST_QUIZ_LOCATION),
+        ):
+            textbox = self.tab_view.textboxes[tab_name]
+            textbox.delete("1.0", ctk.END)
+            textbox.insert(ctk.END, self.read_text_file(file_location))
+
     def update_textboxes(self, initial_load: bool = False) -> None:
         """Clear and update the textboxes after quiz generation."""
         file_tab_mapping = {
@@ -1283,9 +1424,15 @@ class AppFrame(ctk.CTk):
             if not initial_load or (tab_name != "ログファイル" and tab_name != "過去のクイズ"):
                 textbox.delete("1.0", ctk.END)
 
-            with open(file_location, "r", encoding="utf-8") as file:
-                content = file.read()
-                textbox.insert(ctk.END, content)
+            textbox.insert(ctk.END, self.read_text_file(file_location))
+
+    @staticmethod
+    def read_text_file(file_location: str) -> str:
+        """Read a text file for a textbox; files that were not written yet are empty."""
+        if not os.path.exists(file_location):
+            return ""
+        with open(file_location, "r", encoding="utf-8") as file:
+            return file.read()
 
     def start_over(self) -> None:
         """Reset the app to its initial state."""
@@ -1397,4 +1544,6 @@ class AppFrame(ctk.CTk):
 
 if __name__ == "__main__":
     app = AppFrame()
+    if "--profile-startup" in sys.argv:
+        app.after_idle(report_startup_profile)
     app.mainloop()
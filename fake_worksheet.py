@@ -0,0 +1,171 @@
+# Standard library imports
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+"""
+In-memory stand-in for a gspread Worksheet, for trying check_grade_book without
+Google Sheets. It counts the API calls so that batch and per-cell code can be compared:
+
+    sheet = FakeWorksheet([["学籍番号", "2023/04/07"], ["S001", "3"]])
+    update_grade_book(df_result, quiz_end_time, sheet)
+    print(sheet.values, sheet.calls)
+"""
+
+A1_PATTERN = re.compile(r"^([A-Z]+)(\d*)$")
+NUMBER_PATTERN = re.compile(r"^-?\d+(\.\d+)?$")
+
+
+def a1_to_rowcol(label: str) -> Tuple[Optional[int], int]:
+    """Convert an A1 cell label to 1-based (row, column); the row is None for "C" """
+    match = A1_PATTERN.match(label.upper())
+    if not match:
+        raise ValueError(f"Invalid A1 label: {label}")
+    letters, row = match.groups()
+    col = 0
+    for letter in letters:
+        col = col * 26 + ord(letter) - ord("A") + 1
+    return (int(row) if row else None), col
+
+
+def parse_entered_value(value: str, value_input_option: str):
+    """Store a value like Sheets: USER_ENTERED turns "1.5" into a number, RAW keeps text"""
+    if value_input_option == "USER_ENTERED" and NUMBER_PATTERN.match(value):
+        return float(value) if "." in value else int(value)
+    return value
+
+
+class FakeCell(NamedTuple):
+    """The parts of gspread.Cell used by this repo"""
+
+    row: int
+    col: int
+    value: Optional[str]
+
+
+class FakeWorksheet:
+    """A worksheet held in a list of rows; values are stored as strings like Sheets returns
+
+    The typed values (numbers for USER_ENTERED input, text for RAW) are kept next to
+    them and returned by get_values(value_render_option="UNFORMATTED_VALUE").
+    """
+
+    def __init__(self, values: Optional[List[List]] = None, title: str = "シート1"):
+        self.title = title
+        self.values: List[List[str]] = []
+        self.unformatted: Dict[Tuple[int, int], object] = {}
+        for row_number, row in enumerate(values or [], start=1):
+            for col_number, value in enumerate(row, start=1):
+                self._set(row_number, col_number, value)
+                self.unformatted[(row_number, col_number)] = value
+        self.calls: Counter = Counter()
+
+    def _set(self, row: int, col: int, value, value_input_option: str = "RAW") -> None:
+        while len(self.values) < row:
+            self.values.append([])
+        cells = self.values[row - 1]
+        while len(cells) < col:
+            cells.append("")
+        cells[col - 1] = "" if value is None else str(value)
+        self.unformatted[(row, col)] = parse_entered_value(
+            cells[col - 1], value_input_option
+        )
+
+    def get_all_values(self) -> List[List[str]]:
+        self.calls["get_all_values"] += 1
+        width = max((len(row) for row in self.values), default=0)
+        return [row + [""] * (width - len(row)) for row in self.values]
+
+    def get_values(
+        self,
+        range_name: Optional[str] = None,
+        value_render_option: Optional[str] = None,
+    ) -> List[List]:
+        """Return the values of "A5:C" (open-ended rows), "A1:C3" or the whole sheet"""
+        self.calls["get_values"] += 1
+        rows = self.get_all_values()
+        self.calls["get_all_values"] -= 1
+        if value_render_option == "UNFORMATTED_VALUE":
+            rows = [
+                [
+                    self.unformatted.get((row_number, col_number), value)
+                    for col_number, value in enumerate(row, start=1)
+                ]
+                for row_number, row in enumerate(rows, start=1)
+            ]
+        if range_name is None:
+            return rows
+        start, end = range_name.split(":")
+        first_row, first_col = a1_to_rowcol(start)
+        last_row, last_col = a1_to_rowcol(end)
+        rows = rows[(first_row or 1) - 1 : last_row]
+        return [row[first_col - 1 : last_col] for row in rows]
+
+    def get_all_records(self) -> List[Dict[str, str]]:
+        self.calls["get_all_records"] += 1
+        if not self.values:
+            return []
+        header = self.values[0]
+        return [
+            {key: (row[i] if i < len(row) else "") for i, key in enumerate(header)}
+            for row in self.values[1:]
+        ]
+
+    def row_values(self, row: int) -> List[str]:
+        self.calls["row_values"] += 1
+        values = self.values[row - 1] if row <= len(self.values) else []
+        while values and values[-1] == "":
+            values = values[:-1]
+        return list(values)
+
+    def cell(self, row: int, col: int) -> FakeCell:
+        self.calls["cell"] += 1
+        cells = self.values[row - 1] if row <= len(self.values) else []
+        value = cells[col - 1] if col <= len(cells) else ""
+        return FakeCell(row, col, value or None)
+
+    def find(self, query: str) -> Optional[FakeCell]:
+        self.calls["find"] += 1
+        for row_index, row in enumerate(self.values, start=1):
+            for col_index, value in enumerate(row, start=1):
+                if value == query:
+                    return FakeCell(row_index, col_index, value)
+        return None
+
+    def update_cell(self, row: int, col: int, value) -> None:
+        self.calls["update_cell"] += 1
+        # gspread enters update_cell values as if typed in the sheet
+        self._set(row, col, value, "USER_ENTERED")
+
+    def append_row(self, values: List, value_input_option: str = "RAW") -> None:
+        self.calls["append_row"] += 1
+        self._append(values, value_input_option)
+
+    def append_rows(self, values: List[List], value_input_option: str = "RAW") -> None:
+        self.calls["append_rows"] += 1
+        for row in values:
+            self._append(row, value_input_option)
+
+    def _append(self, row: List, value_input_option: str) -> None:
+        row_number = len(self.values) + 1
+        self.values.append([])
+        for col_number, value in enumerate(row, start=1):
+            self._set(row_number, col_number, value, value_input_option)
+
+    def batch_update(
+        self, data: List[Dict], value_input_option: str = "RAW", **kwargs
+    ) -> None:
+        """Apply [{"range": "B2" or "B2:C3", "values": [[...], ...]}, ...]"""
+        self.calls["batch_update"] += 1
+        for update in data:
+            start = update["range"].split(":")[0]
+            first_row, first_col = a1_to_rowcol(start)
+            assert first_row is not None
+            for row_offset, row in enumerate(update["values"]):
+                for col_offset, value in enumerate(row):
+                    self._set(
+                        first_row + row_offset,
+                        first_col + col_offset,
+                        value,
+                        value_input_option,
+                    )
@@ -0,0 +1,128 @@
+# Standard library imports
+import re
+import sys
+import html
+import time
+import argparse
+from typing import List, Tuple
+
+# Local imports
+from jp_script import KANJI_CLASS
+
+"""
+NHK NEWS WEB EASY marks up every vocabulary as ruby text, e.g.
+<a class="dicWin" id="id-0000"><ruby>話<rt>はな</rt></ruby>し<ruby>合<rt>あ</rt></ruby>う</a>
+The markup is split into aligned (base, reading) tokens; plain text tokens have an empty reading.
+"""
+
+RUBY_TOKEN_PATTERN = re.compile(
+    r"<ruby[^>]*>(?P<ruby>.*?)</ruby>|<[^>]*>|(?P<text>[^<]+)", re.S
+)
+RT_PATTERN = re.compile(r"<rt[^>]*>(.*?)(?:</rt>|$)", re.S)
+RP_PATTERN = re.compile(r"<rp[^>]*>.*?</rp>", re.S)
+TAG_PATTERN = re.compile(r"<[^>]*>")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+DIC_WIN_PATTERN = re.compile(r"<a[^>]*class=\"dicWin\"[^>]*>.*?</a>", re.S)
+# The ruby base of a formatted word is the kanji (or number) run before the reading
+FORMATTED_RUBY_PATTERN = re.compile(f"[{KANJI_CLASS}ヶ0-9０-９]+\\((.*?)\\)")
+
+RubyToken = Tuple[str, str]
+
+
+def clean_text(text: str) -> str:
+    """Unescape HTML entities and remove whitespace"""
+    return WHITESPACE_PATTERN.sub("", html.unescape(text))
+
+
+def parse_ruby_tokens(markup: str) -> List[RubyToken]:
+    """Parse ruby markup into (base, reading) tokens; adjacent tokens of the same kind are merged"""
+    tokens: List[RubyToken] = []
+    for match in RUBY_TOKEN_PATTERN.finditer(markup):
+        ruby, text = match.group("ruby"), match.group("text")
+        if ruby is not None:
+            ruby = RP_PATTERN.sub("", ruby)
+            reading = clean_text("".join(RT_PATTERN.findall(ruby)))
+            base = clean_text(TAG_PATTERN.sub("", RT_PATTERN.sub("", ruby)))
+        elif text is not None:
+            base, reading = clean_text(text), ""
+        else:
+            continue  # Any other tag, e.g. <a class="dicWin">
+
+        if not base:
+            continue
+
+        # 東<rt>とう</rt>京<rt>きょう</rt> -> 東京(とうきょう)
+        if tokens and bool(tokens[-1][1]) == bool(reading):
+            previous_base, previous_reading = tokens.pop()
+            base, reading = previous_base + base, previous_reading + reading
+        tokens.append((base, reading))
+    return tokens
+
+
+def get_base_text(tokens: List[RubyToken]) -> str:
+    """Return the word without furigana: 話し合う"""
+    return "".join(base for base, _ in tokens)
+
+
+def get_furigana(tokens: List[RubyToken]) -> str:
+    """Return the furigana of each ruby separated by spaces: はな あ"""
+    return " ".join(reading for _, reading in tokens if reading)
+
+
+def format_ruby_tokens(tokens: List[RubyToken]) -> str:
+    """Return the word with furigana in parentheses: 話(はな)し合(あ)う"""
+    return "".join(
+        f"{base}({reading})" if reading else base for base, reading in tokens
+    )
+
+
+def get_formatted_word_reading(formatted_word: str) -> str:
+    """Return the whole reading of a formatted word: 話(はな)し合(あ)う -> はなしあう"""
+    return FORMATTED_RUBY_PATTERN.sub(r"\1", formatted_word)
+
+
+def find_dic_win_entries(page: str) -> List[str]:
+    """Find every dicWin vocabulary markup of a news page"""
+    return DIC_WIN_PATTERN.findall(page)
+
+
+def benchmark(entries: List[str], repeat: int = 5) -> float:
+    """Return the number of dicWin entries formatted per second"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in entries:
+            format_ruby_tokens(parse_ruby_tokens(entry))
+    return len(entries) * repeat / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the furigana formatting throughput over saved news pages"
+    )
+    parser.add_argument("pages", nargs="*", help="saved NHK NEWS WEB EASY html files")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.pages:
+        dic_win_entries = []
+        for page_path in args.pages:
+            with open(page_path, "r", encoding="utf-8") as f:
+                dic_win_entries += find_dic_win_entries(f.read())
+    else:
+        # Fall back to a synthetic archive when no pages are given
+        dic_win_entries = [
+            '<a class="dicWin"><ruby>話<rt>はな</rt></ruby>し<ruby>合<rt>あ</rt></ruby>う</a>',
+            '<a class="dicWin"><ruby>政府<rt>せいふ</rt></ruby></a>',
+            '<a class="dicWin">ワクチン<ruby>接種<rt>せっしゅ</rt></ruby></a>',
+            '<a class="dicWin">コロナウイルス</a>',
+        ] * 25000
+
+    if not dic_win_entries:
+        sys.exit("No dicWin entries found.")
+
+    for entry in dic_win_entries[:4]:
+        print(format_ruby_tokens(parse_ruby_tokens(entry)))
+    print(
+        f"{len(dic_win_entries)} entries: "
+        f"{benchmark(dic_win_entries, args.repeat):,.0f} entries/s"
+    )
@@ -2,22 +2,22 @@
 import sys
 import re
 from time import sleep
-from typing import List, Tuple, Optional, Callable
+from typing import TYPE_CHECKING, List, Tuple, Optional, Callable
 
-# Third-party imports
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
+# Third-party imports are deferred to the functions that use them (fast GUI startup)
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+    from selenium import webdriver
 
 PATTERN = re.compile(r"^RSHOK")
 
 
-def setup_selenium_webdriver() -> webdriver.Chrome:
+def setup_selenium_webdriver() -> "webdriver.Chrome":
     """Setup selenium webdriver"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from webdriver_manager.chrome import ChromeDriverManager
+
     options = webdriver.ChromeOptions()
     options.add_argument("--headless")
     options.add_argument("--window-size=1920,1080")
@@ -33,8 +33,11 @@ def setup_selenium_webdriver() -> webdriver.Chrome:
     return driver_
 
 
-def get_number_of_word(url) -> Tuple[int, List, BeautifulSoup]:
+def get_number_of_word(url) -> Tuple[int, List, "BeautifulSoup"]:
     """Get number of words from the given url."""
+    import requests
+    from bs4 import BeautifulSoup
+
     try:
         response = requests.get(url)
     except requests.exceptions.ConnectionError:
@@ -49,9 +52,12 @@ def get_number_of_word(url) -> Tuple[int, List, BeautifulSoup]:
 
 
 def get_definition_list(
-    driver_: webdriver.Chrome, url: str, progress_callback: Optional[Callable] = None
+    driver_: "webdriver.Chrome", url: str, progress_callback: Optional[Callable] = None
 ) -> List[str]:
     """Get definition list from the given url."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.action_chains import ActionChains
+
     matching_ids = get_number_of_word(url)[1]
     driver_.get(url)
     button = driver_.find_element(By.CLASS_NAME, "easy-wrapper")
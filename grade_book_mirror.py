@@ -0,0 +1,253 @@
+# Standard library imports
+import os
+import sqlite3
+from typing import Dict, List, NamedTuple, Tuple
+
+# Third-party imports
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+
+"""
+Local SQLite mirror of the grade book sheet (one row per student, one column per quiz
+date). Queries run on the mirror; the sheet is read once per sync and only the cells
+that changed are written back, in one batch update and one append.
+
+Drift is detected in both directions against the values of the last sync: a cell edited
+by hand in the sheet is pulled into the mirror, a cell changed in the mirror is pushed,
+and a cell changed on both sides is a conflict that keeps the mirror's value.
+
+    mirror = GradeBookMirror(grade_sheet)  # or fake_worksheet.FakeWorksheet(...)
+    mirror.record_results(df_result, "2023/04/08")
+    mirror.sync()
+    print(mirror.student_averages(), mirror.missing_submissions())
+"""
+
+GRADE_BOOK_MIRROR_LOCATION = r"txt_files/grade_book.sqlite3"
+
+Cell = Tuple[str, str]  # (student_id, date)
+
+
+class DriftReport(NamedTuple):
+    """Cells that changed since the last sync"""
+
+    pulled: List[Cell]  # Edited in the sheet and copied to the mirror
+    pushed: List[Cell]  # Changed in the mirror and written to the sheet
+    conflicts: List[Cell]  # Changed on both sides; the mirror's value was kept
+
+
+def trim_row(row: List[str]) -> List[str]:
+    """Drop trailing empty cells"""
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def format_points(points) -> str:
+    """Format points as the sheet shows them: 4.0 is "4", half points stay "1.5" """
+    points = points.item() if hasattr(points, "item") else points
+    if isinstance(points, float) and points.is_integer():
+        points = int(points)
+    return str(points)
+
+
+class GradeBookMirror:
+    """SQLite copy of the grade book that syncs deltas with a worksheet"""
+
+    def __init__(self, grade_sheet, location: str = GRADE_BOOK_MIRROR_LOCATION):
+        self.grade_sheet = grade_sheet
+        directory = os.path.dirname(location)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.connection = sqlite3.connect(location)
+        with self.connection:
+            # grades: the mirror; synced: the sheet as of the last sync
+            for table in ("grades", "synced"):
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (student_id TEXT, "
+                    "date TEXT, points TEXT, PRIMARY KEY (student_id, date))"
+                )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS students "
+                "(student_id TEXT PRIMARY KEY, row_number INTEGER)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS dates "
+                "(date TEXT PRIMARY KEY, column_number INTEGER)"
+            )
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _read_cells(self, table: str) -> Dict[Cell, str]:
+        rows = self.connection.execute(f"SELECT student_id, date, points FROM {table}")
+        return {(student_id, date): points for student_id, date, points in rows}
+
+    def _write_cells(self, table: str, cells: Dict[Cell, str]) -> None:
+        self.connection.execute(f"DELETE FROM {table}")
+        self.connection.executemany(
+            f"INSERT INTO {table} VALUES (?, ?, ?)",
+            [
+                (student_id, date, points)
+                for (student_id, date), points in cells.items()
+            ],
+        )
+
+    def read_sheet(self) -> Dict[Cell, str]:
+        """Read the whole sheet in one call, record where each student and date is"""
+        values = self.grade_sheet.get_all_values()
+        header = trim_row(values[0]) if values else []
+        dates = {
+            date: column for column, date in enumerate(header[1:], start=2) if date
+        }
+
+        rows: Dict[str, int] = {}
+        cells: Dict[Cell, str] = {}
+        for row_number, row in enumerate(values[1:], start=2):
+            student_id = row[0] if row else ""
+            if not student_id or student_id in rows:
+                continue
+            rows[student_id] = row_number
+            for date, column in dates.items():
+                points = row[column - 1] if column <= len(row) else ""
+                if points:
+                    cells[(student_id, date)] = points
+
+        with self.connection:
+            self.connection.execute("DELETE FROM students")
+            self.connection.executemany(
+                "INSERT INTO students VALUES (?, ?)", rows.items()
+            )
+            self.connection.execute("DELETE FROM dates")
+            self.connection.executemany(
+                "INSERT INTO dates VALUES (?, ?)", dates.items()
+            )
+        return cells
+
+    def pull(self) -> DriftReport:
+        """Copy the cells edited in the sheet since the last sync into the mirror"""
+        sheet = self.read_sheet()
+        synced = self._read_cells("synced")
+        grades = self._read_cells("grades")
+
+        pulled, conflicts = [], []
+        for cell in set(sheet) | set(synced):
+            remote, base, local = sheet.get(cell), synced.get(cell), grades.get(cell)
+            if remote == base or remote == local:
+                continue
+            if local == base:
+                pulled.append(cell)
+                if cell in sheet:
+                    grades[cell] = sheet[cell]
+                else:
+                    grades.pop(cell, None)
+            else:
+                conflicts.append(cell)
+        for cell in conflicts:
+            print(f"WARNING: {cell[0]} {cell[1]} was changed in the sheet and locally")
+
+        with self.connection:
+            self._write_cells("grades", grades)
+            self._write_cells("synced", sheet)
+        return DriftReport(sorted(pulled), [], sorted(conflicts))
+
+    def push(self) -> List[Cell]:
+        """Write the cells that differ from the last pull in one batch update and one append"""
+        synced = self._read_cells("synced")
+        grades = self._read_cells("grades")
+        changed = sorted(
+            cell
+            for cell in set(grades) | set(synced)
+            if grades.get(cell) != synced.get(cell)
+        )
+        if not changed:
+            return []
+
+        rows = dict(self.connection.execute("SELECT * FROM students"))
+        columns = dict(self.connection.execute("SELECT * FROM dates"))
+        header_width = max(columns.values(), default=1)
+        updates: List[Dict] = []
+        for date in sorted({date for _, date in changed} - set(columns)):
+            header_width += 1
+            columns[date] = header_width
+            updates.append({"range": rowcol_to_a1(1, header_width), "values": [[date]]})
+
+        new_rows: Dict[str, List[str]] = {}
+        for student_id, date in changed:
+            points = grades.get((student_id, date), "")
+            column = columns[date]
+            if student_id in rows:
+                updates.append(
+                    {
+                        "range": rowcol_to_a1(rows[student_id], column),
+                        "values": [[points]],
+                    }
+                )
+            else:
+                row = new_rows.setdefault(student_id, [student_id])
+                row.extend([""] * (column - len(row)))
+                row[column - 1] = points
+
+        if updates:
+            # Parsed like update_cell() did, so the date header stays a date
+            self.grade_sheet.batch_update(updates, value_input_option="USER_ENTERED")
+        if new_rows:
+            self.grade_sheet.append_rows(
+                list(new_rows.values()), value_input_option="USER_ENTERED"
+            )
+
+        with self.connection:
+            self._write_cells("synced", grades)
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO dates VALUES (?, ?)", columns.items()
+            )
+        return changed
+
+    def sync(self) -> DriftReport:
+        """Pull the sheet's edits, then push the mirror's changes (one read, up to two writes)"""
+        report = self.pull()
+        return report._replace(pushed=self.push())
+
+    def record_results(self, df_result: pd.DataFrame, date: str) -> int:
+        """Add quiz points to the mirror, keeping a student's first recorded answer"""
+        rows = [
+            (student_id, date, format_points(points))
+            for student_id, points in zip(df_result["student_id"], df_result["points"])
+        ]
+        with self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO grades VALUES (?, ?, ?)", rows
+            )
+            return self.connection.total_changes - before
+
+    def get_grades(self) -> pd.DataFrame:
+        """Return the mirror as a student x date table of numeric points"""
+        df_grades = pd.read_sql_query(
+            "SELECT student_id, date, points FROM grades", self.connection
+        )
+        df_grades["points"] = pd.to_numeric(df_grades["points"], errors="coerce")
+        return df_grades.pivot(index="student_id", columns="date", values="points")
+
+    def student_averages(self) -> pd.DataFrame:
+        """Return the number of submissions and the average points of every student"""
+        return pd.read_sql_query(
+            "SELECT student_id, COUNT(*) AS submissions, "
+            "AVG(CAST(points AS REAL)) AS average FROM grades "
+            "GROUP BY student_id ORDER BY student_id",
+            self.connection,
+            index_col="student_id",
+        )
+
+    def missing_submissions(self) -> pd.DataFrame:
+        """Return the (student_id, date) pairs of every student without points on a quiz date"""
+        return pd.read_sql_query(
+            "WITH all_students AS (SELECT student_id FROM students "
+            "UNION SELECT student_id FROM grades), "
+            "all_dates AS (SELECT date FROM dates UNION SELECT date FROM grades) "
+            "SELECT student_id, date FROM all_students CROSS JOIN all_dates "
+            "WHERE NOT EXISTS (SELECT 1 FROM grades WHERE "
+            "grades.student_id = all_students.student_id "
+            "AND grades.date = all_dates.date) ORDER BY date, student_id",
+            self.connection,
+        )
@@ -0,0 +1,124 @@
+# Standard library imports
+import re
+import timeit
+from typing import Set
+
+HIRAGANA_RANGES = [(0x3041, 0x309F)]
+KATAKANA_RANGES = [(0x30A0, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9F)]
+KANJI_RANGES = [
+    (0x3400, 0x4DBF),
+    (0x4E00, 0x9FFF),
+    (0xF900, 0xFAFF),
+    (0x3005, 0x3007),  # 々〆〇
+]
+
+HIRAGANA = "hiragana"
+KATAKANA = "katakana"
+KANJI = "kanji"
+OTHER = "other"
+MIXED = "mixed"
+
+
+def build_character_class(ranges) -> str:
+    """Build a regex character class from code point ranges"""
+    return "".join(f"{chr(start)}-{chr(end)}" for start, end in ranges)
+
+
+HIRAGANA_CLASS = build_character_class(HIRAGANA_RANGES)
+KATAKANA_CLASS = build_character_class(KATAKANA_RANGES)
+KANJI_CLASS = build_character_class(KANJI_RANGES)
+
+HIRAGANA_PATTERN = re.compile(f"[{HIRAGANA_CLASS}]+")
+KATAKANA_PATTERN = re.compile(f"[{KATAKANA_CLASS}]+")
+KANJI_PATTERN = re.compile(f"[{KANJI_CLASS}]+")
+NON_JAPANESE_PATTERN = re.compile(f"[^{HIRAGANA_CLASS}{KATAKANA_CLASS}{KANJI_CLASS}]")
+
+SCRIPT_PATTERNS = (
+    (HIRAGANA, HIRAGANA_PATTERN),
+    (KATAKANA, KATAKANA_PATTERN),
+    (KANJI, KANJI_PATTERN),
+    (OTHER, NON_JAPANESE_PATTERN),
+)
+
+# ァ-ヶ -> ぁ-ゖ, ヽヾ -> ゝゞ
+KATAKANA_TO_HIRAGANA_TABLE = {
+    code_point: code_point - 0x60 for code_point in range(0x30A1, 0x30F7)
+}
+KATAKANA_TO_HIRAGANA_TABLE.update({0x30FD: 0x309D, 0x30FE: 0x309E})
+
+
+def is_hiragana(text: str) -> bool:
+    """Check if a string only contains hiragana"""
+    return HIRAGANA_PATTERN.fullmatch(text) is not None
+
+
+def is_katakana(text: str) -> bool:
+    """Check if a string only contains katakana (including ー)"""
+    return KATAKANA_PATTERN.fullmatch(text) is not None
+
+
+def is_kanji(text: str) -> bool:
+    """Check if a string only contains kanji"""
+    return KANJI_PATTERN.fullmatch(text) is not None
+
+
+def contains_hiragana(text: str) -> bool:
+    """Check if a string contains at least one hiragana"""
+    return HIRAGANA_PATTERN.search(text) is not None
+
+
+def contains_katakana(text: str) -> bool:
+    """Check if a string contains at least one katakana"""
+    return KATAKANA_PATTERN.search(text) is not None
+
+
+def contains_kanji(text: str) -> bool:
+    """Check if a string contains at least one kanji"""
+    return KANJI_PATTERN.search(text) is not None
+
+
+def get_scripts(text: str) -> Set[str]:
+    """Return every script used in a string, e.g. {'kanji', 'hiragana'} for 話し合う"""
+    return {script for script, pattern in SCRIPT_PATTERNS if pattern.search(text)}
+
+
+def classify_script(text: str) -> str:
+    """Classify a string as hiragana, katakana, kanji, other or mixed"""
+    scripts = get_scripts(text)
+    if not scripts:
+        return ""
+    if len(scripts) > 1:
+        return MIXED
+    return scripts.pop()
+
+
+def katakana_to_hiragana(text: str) -> str:
+    """Convert katakana in a string to hiragana: ニュース -> にゅーす"""
+    return text.translate(KATAKANA_TO_HIRAGANA_TABLE)
+
+
+if __name__ == "__main__":
+    words = [
+        "話し合う",
+        "政府",
+        "ワクチン接種",
+        "コロナウイルス",
+        "おはよう",
+        "ＮＨＫ",
+    ] * 10000
+
+    def is_hiragana_per_char(text: str) -> bool:
+        return all("\u3040" <= character <= "\u309f" for character in text)
+
+    for word in words[:6]:
+        print(f"{word}: {classify_script(word)} {sorted(get_scripts(word))}")
+
+    print()
+    for name, function in (
+        ("per-char is_hiragana", lambda: [is_hiragana_per_char(w) for w in words]),
+        ("regex is_hiragana", lambda: [is_hiragana(w) for w in words]),
+        ("regex contains_hiragana", lambda: [contains_hiragana(w) for w in words]),
+        ("regex classify_script", lambda: [classify_script(w) for w in words]),
+    ):
+        seconds = min(timeit.repeat(function, number=1, repeat=5))
+        print(f"{name:<24} {len(words) / seconds:>12,.0f} words/s")
@@ -0,0 +1,155 @@
+# Standard library imports
+import os
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Third-party imports
+import requests
+from linebot import LineBotApi
+from linebot.http_client import HttpClient, RequestsHttpClient, RequestsHttpResponse
+
+"""
+Imported lazily by send_line_message so that the GUI starts without linebot.
+"""
+
+POOL_SIZE = 16
+
+
+class SessionHttpClient(RequestsHttpClient):
+    """RequestsHttpClient that keeps connections to the LINE API alive"""
+
+    def __init__(self, timeout=HttpClient.DEFAULT_TIMEOUT) -> None:
+        super().__init__(timeout)
+        self.session = requests.Session()
+
+        # Enough pooled connections for concurrent multicast batches
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, headers=None, params=None, stream=False, timeout=None):
+        response = self.session.get(
+            url,
+            headers=headers,
+            params=params,
+            stream=stream,
+            timeout=self.timeout if timeout is None else timeout,
+        )
+        return RequestsHttpResponse(response)
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        response = self.session.post(
+            url,
+            headers=headers,
+            data=data,
+            timeout=self.timeout if timeout is None else timeout,
+        )
+        return RequestsHttpResponse(response)
+
+    def delete(self, url, headers=None, data=None, timeout=None):
+        response = self.session.delete(
+            url,
+            headers=headers,
+            data=data,
+            timeout=self.timeout if timeout is None else timeout,
+        )
+        return RequestsHttpResponse(response)
+
+    def put(self, url, headers=None, data=None, timeout=None):
+        response = self.session.put(
+            url,
+            headers=headers,
+            data=data,
+            timeout=self.timeout if timeout is None else timeout,
+        )
+        return RequestsHttpResponse(response)
+
+
+def select_channel_secrets(secrets: Dict, channel: Optional[str]) -> Dict:
+    """Return the secrets of a channel listed in "channels", or the top-level ones"""
+    if channel is None:
+        return secrets
+    for channel_secrets in secrets.get("channels", []):
+        if channel_secrets.get("name") == channel:
+            return channel_secrets
+    raise KeyError(f"secrets.jsonにないチャネルです：{channel}")
+
+
+class LineClient:
+    """A single LINE API client whose secrets are reloaded only when the file changes"""
+
+    def __init__(
+        self,
+        token_file: str,
+        endpoint: Optional[str] = None,
+        channel: Optional[str] = None,
+    ) -> None:
+        self.token_file = token_file
+        self.channel = channel
+        self.api = LineBotApi(
+            "",
+            endpoint=endpoint or LineBotApi.DEFAULT_API_ENDPOINT,
+            http_client=SessionHttpClient,
+        )
+        self.channel_access_token = ""
+        self.user_id: Optional[str] = None
+        self._secrets_signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def read_secrets(self) -> Tuple[str, Optional[str]]:
+        """Return the secrets, reading the file only if it changed since the last read"""
+        stat = os.stat(self.token_file)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature != self._secrets_signature:
+                with open(self.token_file, "r", encoding="utf-8") as file:
+                    secrets = select_channel_secrets(json.load(file), self.channel)
+                self.channel_access_token = secrets.get("channel_access_token") or ""
+                self.user_id = secrets.get("user_id")
+                self._secrets_signature = signature
+
+                # Same client and connection pool, new credentials
+                self.api.headers["Authorization"] = (
+                    "Bearer " + self.channel_access_token
+                )
+            return self.channel_access_token, self.user_id
+
+    def get_api(self) -> Tuple[LineBotApi, Optional[str]]:
+        """Return the API with up-to-date credentials and the user ID to push to"""
+        _, user_id = self.read_secrets()
+        return self.api, user_id
+
+    def send(
+        self,
+        messages: List,
+        broadcasting: bool = False,
+        retry_key: Optional[str] = None,
+        to: Optional[List[str]] = None,
+    ) -> None:
+        """Push messages to the user, multicast them to `to` or broadcast them in one request"""
+        _, user_id = self.read_secrets()
+        # Messages rendered in advance (scheduler.py) are already JSON dicts
+        data = {
+            "messages": [
+                message if isinstance(message, dict) else message.as_json_dict()
+                for message in messages
+            ]
+        }
+        if to:
+            data["to"] = to
+            path = "/v2/bot/message/multicast"
+        elif broadcasting:
+            path = "/v2/bot/message/broadcast"
+        else:
+            data["to"] = user_id
+            path = "/v2/bot/message/push"
+
+        # LineBotApi(retry_key=...) leaves the key in the shared headers, so it is
+        # passed per request instead
+        headers = {"Content-Type": "application/json"}
+        if retry_key:
+            headers["X-Line-Retry-Key"] = retry_key
+        self.api._post(path, data=json.dumps(data), headers=headers)
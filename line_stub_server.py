@@ -0,0 +1,190 @@
+# Standard library imports
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+"""
+A local stand-in for the LINE Messaging API send endpoints, for load tests:
+
+    python line_stub_server.py --port 8080
+    LINE_API_ENDPOINT=http://localhost:8080 python customtkinter_GUI.py
+
+It checks the same limits as LINE (5 messages, 500 multicast recipients) and can
+add latency and random failures.
+"""
+
+MESSAGE_PATHS = {
+    "/v2/bot/message/push",
+    "/v2/bot/message/multicast",
+    "/v2/bot/message/broadcast",
+}
+MAX_MESSAGES = 5
+MAX_RECIPIENTS = 500
+# The load test never uses the credentials in json_files/secrets.json
+LOAD_TEST_SECRETS = {"channel_access_token": "load-test-token", "user_id": None}
+
+
+class LineStubHandler(BaseHTTPRequestHandler):
+    """Accept LINE send requests and record statistics on the server"""
+
+    server: "LineStubServer"
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, response = self.server.handle_message(
+            self.path,
+            self.headers.get("Authorization", ""),
+            body,
+            self.headers.get("X-Line-Retry-Key"),
+        )
+        payload = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args) -> None:
+        pass  # Keep the load test output readable
+
+
+class LineStubServer(ThreadingHTTPServer):
+    """Threaded HTTP server that mimics the LINE send endpoints"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 8080,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        super().__init__(("127.0.0.1", port), LineStubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stats: Counter = Counter()
+        self.retry_keys: set = set()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def handle_message(
+        self,
+        path: str,
+        authorization: str,
+        body: bytes,
+        retry_key: Optional[str] = None,
+    ):
+        """Return the status code and JSON response of a send request"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.stats["requests"] += 1
+            fail = self._random.random() < self.error_rate
+        if path not in MESSAGE_PATHS:
+            return 404, {"message": "Not found"}
+        if not authorization.startswith("Bearer ") or authorization == "Bearer ":
+            return 401, {"message": "Authentication failed"}
+        if fail:
+            return 500, {"message": "Injected failure"}
+
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError:
+            return 400, {"message": "The request body has 1 error(s)"}
+        messages = data.get("messages", [])
+        recipients = data.get("to", [])
+        if not 1 <= len(messages) <= MAX_MESSAGES:
+            return 400, {"message": "Size must be between 1 and 5"}
+        if path.endswith("multicast") and not 1 <= len(recipients) <= MAX_RECIPIENTS:
+            return 400, {"message": "Size must be between 1 and 500"}
+
+        with self._lock:
+            # Like LINE, a retried request that was already accepted is not sent again
+            if retry_key in self.retry_keys:
+                self.stats["conflicts"] += 1
+                return 409, {"message": "The retry key is already accepted"}
+            if retry_key:
+                self.retry_keys.add(retry_key)
+            self.stats[path.rsplit("/", 1)[1]] += 1
+            self.stats["messages"] += len(messages) * max(
+                len(recipients) if isinstance(recipients, list) else 1, 1
+            )
+        return 200, {}
+
+
+def start_stub_server(port: int = 0, **options) -> LineStubServer:
+    """Start the stub server in a background thread (port 0 picks a free port)"""
+    server = LineStubServer(port, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def run_load_test(users: int, latency: float, error_rate: float) -> None:
+    """Multicast a quiz to fake users through the stub server and print the results"""
+    import send_line_message
+
+    server = start_stub_server(latency=latency, error_rate=error_rate)
+    secrets_folder = tempfile.TemporaryDirectory()
+    token_file = os.path.join(secrets_folder.name, "secrets.json")
+    with open(token_file, "w", encoding="utf-8") as f:
+        json.dump(LOAD_TEST_SECRETS, f)
+    send_line_message.LINE_API_ENDPOINT = server.endpoint
+    send_line_message.TOKEN_ID_FILE = token_file
+    send_line_message._line_clients.clear()
+    user_ids = [f"U{index:032x}" for index in range(users)]
+
+    start = time.perf_counter()
+    results = send_line_message.multicast_messages(
+        ["語彙力クイズ", "1. 話し合う\n2. 政府"], user_ids, sticker=("6359", "11069859")
+    )
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        status = "OK" if result.success else f"NG {result.error}"
+        print(
+            f"batch {result.batch_index}: {result.recipients} users, "
+            f"{result.requests} requests, {result.elapsed:.2f}s {status}"
+        )
+    succeeded = sum(result.recipients for result in results if result.success)
+    print(
+        f"{succeeded}/{users} users in {elapsed:.2f}s, server stats: {dict(server.stats)}"
+    )
+    server.shutdown()
+    secrets_folder.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local LINE Messaging API stub")
+    parser.add_argument("-p", "--port", type=int, default=8080)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per request"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="0.0 - 1.0")
+    parser.add_argument(
+        "--load-test",
+        type=int,
+        metavar="USERS",
+        help="multicast to USERS fake users through a stub server and exit",
+    )
+    args = parser.parse_args()
+
+    if args.load_test:
+        run_load_test(args.load_test, args.latency, args.error_rate)
+    else:
+        stub_server = LineStubServer(args.port, args.latency, args.error_rate)
+        print(f"LINE stub server listening on {stub_server.endpoint}")
+        stub_server.serve_forever()
@@ -1,32 +1,52 @@
 # Standard library imports
 import os
+import re
 import sys
 import time
 import random
+import shutil
 import string
-from collections import deque
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional, Callable
+from typing import TYPE_CHECKING, Dict, List, Set, Tuple, Optional, Callable
 
 # Third-party imports
-import chardet
 import locale
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.common.exceptions import WebDriverException
-from selenium.webdriver.common.by import By
+
+# Heavy third-party modules (selenium, bs4, requests, torch...) are imported by the
+# stage that needs them so that importing main (e.g. from the GUI) stays fast
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+    from selenium import webdriver
 
 # Local imports
-from send_line_message import send_message
+from outbox import FAILED, PENDING, SENT, Outbox, get_outbox
+from quiz_cache import (
+    get_article_id,
+    get_quiz_cache_key,
+    load_cached_quiz,
+    save_cached_quiz,
+)
+from jp_script import is_katakana
+from furigana import (
+    format_ruby_tokens,
+    get_base_text,
+    get_furigana,
+    parse_ruby_tokens,
+)
+from quiz_history import (
+    RECENT_WORD_DAYS,
+    append_record,
+    append_sent_quiz,
+    load_recent_words,
+    split_formatted_word,
+)
 from get_definition import (
     get_definition_list,
     get_number_of_word,
     setup_selenium_webdriver,
 )
 
-from check_sentiment import predict_sentiment_jp, read_news_article
-
 
 """
 NEWS WEB EASY
@@ -50,6 +70,10 @@ PRONOUN_QUIZ_LOCATION = r"txt_files/pronunciation_quiz.txt"
 DEF_QUIZ_LOCATION = r"txt_files/definition_quiz.txt"
 PAST_QUIZ_DATA_LOCATION = r"txt_files/past_quiz_data.txt"
 LOG_LOCATION = r"txt_files/push_log.txt"
+ARTICLE_ARCHIVE_FOLDER = r"txt_files/article_archive"
+
+# Seconds main(push=True) waits for the outbox; an unsent quiz stays queued
+PUSH_TIMEOUT = 600
 
 # Selenium checking settings constants
 MAX_URL_CHECKING_ATTEMPTS = 30
@@ -62,37 +86,61 @@ else:
     locale.setlocale(locale.LC_TIME, "ja_JP.UTF-8")
 
 
-def generate_pronunciation_quiz(
-    url: str, word_dict: Dict[str, str], questions=4
-) -> None:
-    """Generate a pronunciation test for students"""
-    today = get_today_date_jp()[1]
-
-    # randomly remove questions until the number of questions reach a desired value
-    while len(word_dict) > questions:
-        word_dict.pop(random.choice(list(word_dict.keys())))
+def select_quiz_words(
+    word_dict: Dict[str, str],
+    questions: int,
+    seed: int,
+    recent_words: Optional[Set[str]] = None,
+) -> Dict[str, str]:
+    """Randomly select the quiz words without modifying the given dictionary"""
+    if len(word_dict) <= questions:
+        return dict(word_dict)
+
+    # Prefer words that were not quizzed recently, then fill up with recent ones
+    recent_words = recent_words or set()
+    fresh = [word for word in word_dict if word not in recent_words]
+    recent = [word for word in word_dict if word in recent_words]
+    rng = random.Random(seed)
+    if len(fresh) >= questions:
+        selected = set(rng.sample(fresh, questions))
+    else:
+        selected = set(fresh) | set(rng.sample(recent, questions - len(fresh)))
 
-    # write the test to a file
-    with open(PRONOUN_QUIZ_LOCATION, "w", encoding="utf-8") as f:
-        f.write(f"【語彙力クイズ】{today}\n\n")
-        f.write(
-            f"今日読んだNHK EASYニュース📰を復習して、辞書を見ずにスマホで単語・漢字の読み方を書いてください。\n"
-            + f"カタカナの場合は日本語もしくは英語で意味を書いてください。({len(word_dict)}ポイント)\n\n"
-        )
-        f.write(f"{url}\n\n")
-        f.write("---\n\n")
-        f.write("学生番号: \n\n")
-        for i, word in enumerate(word_dict.keys(), start=1):
-            letter = string.ascii_uppercase[i - 1]
-            f.write(f"{letter}. {word}: \n")
+    # Keep the original article order of the selected words
+    return {word: furigana for word, furigana in word_dict.items() if word in selected}
 
 
-def generate_definition_quiz(
-    article, word_dict: Dict[str, str], word_list: List
+def render_pronunciation_quiz(
+    url: str,
+    word_dict: Dict[str, str],
+    today: str,
+    title: str = "語彙力クイズ",
+    intro: str = "今日読んだNHK EASYニュース📰",
 ) -> str:
-    """Generate a definition test for students and return the answer key"""
-    today = get_today_date_jp()[1]
-
+    """Render a pronunciation test for students"""
+    instruction = f"{intro}を復習して、辞書を見ずにスマホで単語・漢字の読み方を書いてください。"
+    if any(is_katakana(word) for word in word_dict):
+        instruction += "\nカタカナの場合は日本語もしくは英語で意味を書いてください。"
+    lines = [f"【{title}】{today}\n\n", f"{instruction}({len(word_dict)}ポイント)\n\n"]
+    if url:
+        lines.append(f"{url}\n\n")
+    lines += ["---\n\n", "学生番号: \n\n"]
+    for i, word in enumerate(word_dict.keys(), start=1):
+        letter = string.ascii_uppercase[i - 1]
+        lines.append(f"{letter}. {word}: \n")
+    return "".join(lines)
+
+
+def render_definition_quiz(
+    paragraphs: List[str],
+    word_dict: Dict[str, str],
+    word_list: List,
+    seed: int,
+    today: str,
+    title: str = "単語意味クイズ",
+    intro: str = "今日のNHK EASYニュース📰です。",
+) -> Tuple[str, str]:
+    """Render a definition test for students and return it with the answer key"""
     # Extract and process questions from the word dictionary
     new_word_list_header = []
     new_word_list = []
@@ -102,53 +150,197 @@ def generate_definition_quiz(
                 new_word_list_header.append(definition.split("：", 1)[0])
                 new_word_list.append(definition.split("：", 1)[1])
 
-    # Shuffle the order of the questions and print the answer key
+    # Shuffle the order of the questions and get the answer key
     new_word_list_header = [
         f"{item}{string.ascii_uppercase[i]}"
         for i, item in enumerate(new_word_list_header)
     ]
-    random.shuffle(new_word_list_header)
+    random.Random(seed).shuffle(new_word_list_header)
     answer = "".join([item[-1] for item in new_word_list_header])
-    print(f"\n単語意味クイズ解答：{answer}")
     new_word_list_header = [
         f"{item[:-1]} {string.ascii_uppercase[i]}"
         for i, item in enumerate(new_word_list_header)
     ]
 
+    lines = [
+        f"【{title}】{today}\n\n",
+        f"{intro}(1) から正しい単語の意味を順番に並べてください。"
+        f"({len(new_word_list)}ポイント)\n\n",
+    ]
+
+    # Add the article to the quiz
+    for paragraph in paragraphs:
+        lines.append(paragraph + "\n\n")
+
+    lines.append("---\n\n")
+
+    for i, word in enumerate(new_word_list_header, start=1):
+        lines.append(f'({i}) {word.split(" ")[0]} ')
+
+    lines.append("\n\n")
+
+    for i, word in enumerate(new_word_list, start=1):
+        letter = string.ascii_uppercase[i - 1]
+        lines.append(f"{letter}. {word}\n\n")
+
+    # Add sample answer format
+    lines.append("【返信フォーマット】(英語アルファベットと数字のみ):\n")
+    lines.append("学生番号: A10001\n")
+    lines.append("解答: ABCDE")
+
+    return "".join(lines), answer
+
+
+def restamp_quiz_header(content: str, header: str) -> str:
+    """Replace the first (dated) line of a cached quiz with a new header"""
+    return header + "\n" + content.split("\n", 1)[1]
+
+
+def generate_pronunciation_quiz(
+    url: str,
+    word_dict: Dict[str, str],
+    questions=4,
+    seed: int = 0,
+    recent_words: Optional[Set[str]] = None,
+) -> None:
+    """Generate a pronunciation test for students"""
+    today = get_today_date_jp()[1]
+    key = get_quiz_cache_key(
+        get_article_id(url),
+        seed,
+        "読み方クイズ",
+        questions,
+        (recent_words or set()) & word_dict.keys(),
+    )
+
+    cached = load_cached_quiz(key)
+    if cached:
+        content = restamp_quiz_header(cached[0], f"【語彙力クイズ】{today}")
+    else:
+        quiz_words = select_quiz_words(word_dict, questions, seed, recent_words)
+        content = render_pronunciation_quiz(url, quiz_words, today)
+        save_cached_quiz(key, content)
+
     # write the test to a file
-    with open(DEF_QUIZ_LOCATION, "w", encoding="utf-8") as f:
-        f.write(f"【単語意味クイズ】{today}\n\n")
-        f.write(
-            f"今日のNHK EASYニュース📰です。(1) から正しい単語の意味を順番に並べてください。({
-                len(new_word_list)}ポイント)\n\n"
+    with open(PRONOUN_QUIZ_LOCATION, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def generate_definition_quiz(
+    url: str,
+    paragraphs: List[str],
+    word_dict: Dict[str, str],
+    word_list: List,
+    questions=4,
+    seed: int = 0,
+    recent_words: Optional[Set[str]] = None,
+) -> str:
+    """Generate a definition test for students and return the answer key"""
+    today = get_today_date_jp()[1]
+    key = get_quiz_cache_key(
+        get_article_id(url),
+        seed,
+        "単語意味クイズ",
+        questions,
+        (recent_words or set()) & word_dict.keys(),
+    )
+
+    cached = load_cached_quiz(key)
+    if cached:
+        content = restamp_quiz_header(cached[0], f"【単語意味クイズ】{today}")
+        answer = cached[1]
+    else:
+        quiz_words = select_quiz_words(word_dict, questions, seed, recent_words)
+        content, answer = render_definition_quiz(
+            paragraphs, quiz_words, word_list, seed, today
         )
+        save_cached_quiz(key, content, answer)
+    print(f"\n単語意味クイズ解答：{answer}")
+
+    # write the test to a file
+    with open(DEF_QUIZ_LOCATION, "w", encoding="utf-8") as f:
+        f.write(content)
+
+    return answer
+
+
+def generate_quizzes(
+    url: str,
+    paragraphs: List[str],
+    word_dict: Dict[str, str],
+    word_list: List,
+    questions: int,
+    seed: int,
+) -> str:
+    """Generate both quizzes from the same seed and return the definition answer key"""
+    # Both quizzes avoid the words that were quizzed in the last few days
+    recent_words = load_recent_words(RECENT_WORD_DAYS, PAST_QUIZ_DATA_LOCATION)
+    generate_pronunciation_quiz(
+        url, word_dict, questions=questions, seed=seed, recent_words=recent_words
+    )
+    return generate_definition_quiz(
+        url,
+        paragraphs,
+        word_dict,
+        word_list,
+        questions=questions,
+        seed=seed,
+        recent_words=recent_words,
+    )
+
+
+def read_saved_article() -> Tuple[str, List[str], Dict[str, str], List[str]]:
+    """Read the url, paragraphs, vocabularies and definitions from news_article.txt"""
+    with open(NEWS_ARTICLE_TXT_LOCATION, "r", encoding="utf-8") as f:
+        parts = f.read().split("---")
+
+    # Skip the url, title and date lines of the article
+    article_lines = [line.strip() for line in parts[0].splitlines() if line.strip()]
+    url = article_lines[0]
+    paragraphs = article_lines[3:]
 
-        # write the article to a file
-        for paragraph in article:
-            for p_tag in paragraph.find_all("p"):
-                f.write(p_tag.text.strip() + "\n\n")
+    # Recover 話し合う: はな あ from 話(はな)し合(あ)う
+    word_dict = dict(split_formatted_word(word) for word in parts[1].split())
 
-        f.write("---\n\n")
+    definitions = [line.strip() for line in parts[2].splitlines() if line.strip()]
+    return url, paragraphs, word_dict, definitions
 
-        for i, word in enumerate(new_word_list_header, start=1):
-            f.write(f'({i}) {word.split(" ")[0]} ')
 
-        f.write("\n\n")
+def regenerate_quizzes(questions=5, seed: Optional[int] = None) -> str:
+    """Regenerate both quizzes of the saved article with a new seed, or the given one"""
+    # A logged seed reproduces its quizzes (from the cache); a regeneration asks for new ones
+    if seed is None:
+        seed = random.randrange(2**32)
 
-        for i, word in enumerate(new_word_list, start=1):
-            letter = string.ascii_uppercase[i - 1]
-            f.write(f"{letter}. {word}\n\n")
+    url, paragraphs, word_dict, definitions = read_saved_article()
+    def_answer = generate_quizzes(
+        url, paragraphs, word_dict, definitions, questions, seed
+    )
+    update_quiz_log(def_answer, seed)
+    return def_answer
+
+
+def update_quiz_log(def_answer: str, seed: int) -> None:
+    """Update the answer key and seed of the log file after a regeneration"""
+    with open(LOG_LOCATION, "r", encoding="utf-8") as f:
+        lines = f.readlines()
 
-        # write sample answer format
-        f.write("【返信フォーマット】(英語アルファベットと数字のみ):\n")
-        f.write("学生番号: A10001\n")
-        f.write("解答: ABCDE")
+    lines[2] = f"単語意味クイズ解答：{def_answer}\n"
+    seed_line = f"シード：{seed}\n"
+    if len(lines) > 3 and lines[3].startswith("シード："):
+        lines[3] = seed_line
+    else:
+        lines.insert(3, seed_line)
 
-        return answer
+    with open(LOG_LOCATION, "w", encoding="utf-8") as f:
+        f.writelines(lines)
 
 
-def get_news_url(driver: webdriver.Chrome) -> str:
+def get_news_url(driver: "webdriver.Chrome") -> str:
     """Retrieve up-to-date news url links"""
+    from selenium.common.exceptions import WebDriverException
+    from selenium.webdriver.common.by import By
+
     for _ in range(MAX_URL_CHECKING_ATTEMPTS):
         try:
             driver.get(NEWS_HOMEPAGE_URL)
@@ -213,11 +405,6 @@ def write_content_data(
                 file.write(f"{content.text.strip()}\n\n")
 
 
-def is_hiragana_char(character: str) -> bool:
-    """Check if a character is hiragana or not"""
-    return "\u3040" <= character <= "\u309F"
-
-
 def get_today_date_jp() -> Tuple:
     """Return today's date in both datetime and Japanese format"""
     now = datetime.now()
@@ -230,36 +417,285 @@ def get_day_of_week_jp(date) -> List:
     return week_list[date.weekday()]
 
 
-def save_quiz_vocab(news_url: str) -> None:
-    """Save pushed quiz vocabularies and news url to a file"""
+def archive_news_article(url: str) -> None:
+    """Keep a copy of news_article.txt for corpus statistics such as batch sentiment scoring"""
+    if not os.path.exists(ARTICLE_ARCHIVE_FOLDER):
+        os.makedirs(ARTICLE_ARCHIVE_FOLDER)
+    archive_location = os.path.join(ARTICLE_ARCHIVE_FOLDER, f"{get_article_id(url)}.txt")
+    shutil.copyfile(NEWS_ARTICLE_TXT_LOCATION, archive_location)
+
+
+def get_quiz_record(news_url: str, quiz_words: Optional[Set[str]] = None) -> str:
+    """Return the quiz history record of the current article, limited to the quizzed words"""
     today = get_today_date_jp()[1]
     with open(NEWS_ARTICLE_TXT_LOCATION, "r", encoding="utf-8") as f:
         content = f.read()
         parts = content.split("---")
-        vocab = parts[1].strip()
-        vocab_def = parts[2].strip()
-    with open(PAST_QUIZ_DATA_LOCATION, "a+", encoding="utf-8") as f:
-        f.write(f"{today}\n{news_url}\n{vocab}\n\n{vocab_def}\n\n")
-        f.write("---\n\n")
+        vocab_lines = parts[1].split()
+        vocab_def_lines = [line.strip() for line in parts[2].splitlines() if line.strip()]
+
+    # Only the quizzed words count as recent for the next quizzes
+    if quiz_words is not None:
+        vocab_lines = [
+            line for line in vocab_lines if split_formatted_word(line)[0] in quiz_words
+        ]
+        vocab_def_lines = [
+            line for line in vocab_def_lines if line.split("：", 1)[0] in quiz_words
+        ]
+    vocab = "\n".join(vocab_lines)
+    vocab_def = "\n".join(vocab_def_lines)
+    return f"{today}\n{news_url}\n{vocab}\n\n{vocab_def}\n\n---\n\n"
+
+
+def save_quiz_vocab(news_url: str) -> None:
+    """Save pushed quiz vocabularies and news url to the indexed quiz history"""
+    now = get_today_date_jp()[0]
+    append_record(now, get_quiz_record(news_url), PAST_QUIZ_DATA_LOCATION)
+
+
+def get_logged_answer() -> str:
+    """Get the definition quiz answer key of the last generation from the log file"""
+    with open(LOG_LOCATION, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("単語意味クイズ解答："):
+                return line.replace("単語意味クイズ解答：", "").strip()
+    return ""
+
+
+def is_definition_quiz(test_type: str) -> bool:
+    return os.path.normpath(test_type) == os.path.normpath(DEF_QUIZ_LOCATION)
+
+
+def get_quiz_questions(test_type: str) -> List[Tuple[str, str]]:
+    """Return the (letter or number, word) of each question of a quiz file, as edited"""
+    with open(test_type, "r", encoding="utf-8") as f:
+        questions = f.read().split("---")[1]
+    if is_definition_quiz(test_type):
+        # (1) 話し合う (2) 政府 ...
+        return re.findall(r"\((\d+)\)\s*(\S+)", questions)
+    # A. 話し合う:
+    return re.findall(r"(?m)^\s*([A-Z])\.\s*(.+?)\s*:", questions)
+
+
+def get_quiz_key(test_type: str) -> Dict:
+    """Return what check_grade_book needs to grade a quiz file once it is sent"""
+    if is_definition_quiz(test_type):
+        return {"quiz_type": "単語意味クイズ", "answer": get_logged_answer()}
+
+    # Pronunciation quiz: the letter and the word with furigana of each question
+    with open(NEWS_ARTICLE_TXT_LOCATION, "r", encoding="utf-8") as f:
+        formatted_words = f.read().split("---")[1].split()
+    formatted_word_dict = {
+        split_formatted_word(formatted_word)[0]: formatted_word
+        for formatted_word in formatted_words
+    }
+    words = [
+        [letter, formatted_word_dict.get(word, word)]
+        for letter, word in get_quiz_questions(test_type)
+    ]
+    return {"quiz_type": "読み方クイズ", "words": words}
+
+
+def log_push_status(entry: Dict, status: str, message: str) -> None:
+    """Save a sent quiz to the history and write the outbox status to push_log.txt"""
+    context = entry["context"]
+    if status == SENT and context.get("record"):
+        append_record(datetime.now(), context["record"], PAST_QUIZ_DATA_LOCATION)
+    if status == SENT and context.get("quiz"):
+        # The answer key with the time the quiz window opened, for check_grade_book
+        append_sent_quiz(
+            {
+                "id": entry["id"],
+                "sent_time": datetime.now().isoformat(timespec="seconds"),
+                "url": context.get("url", ""),
+                **context["quiz"],
+            }
+        )
+
+    # push_log.txt is rewritten for every article; older quizzes are not logged
+    try:
+        with open(LOG_LOCATION, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return
+    if len(lines) < 2 or lines[1].strip() != context.get("url"):
+        return
+    with open(LOG_LOCATION, "a", encoding="utf-8") as f:
+        if status == SENT:
+            f.write("送信済み\n")
+        elif status == PENDING:
+            f.write(f"送信エラー：{message}\n")
+        else:
+            f.write(f"送信失敗：{message}\n")
+
+
+def get_push_outbox() -> Outbox:
+    """Return the outbox with its push_log.txt listener; pending quizzes resume sending"""
+    outbox = get_outbox()
+    outbox.add_listener(log_push_status)
+    return outbox
 
 
-def push_quiz(test_type: str, broadcasting=False) -> None:
-    """Send message via LINE API to students"""
+def push_quiz(
+    test_type: str,
+    broadcasting=False,
+    sticker: Optional[Tuple[str, str]] = None,
+    news_url: Optional[str] = None,
+) -> str:
+    """Queue a quiz in the outbox and return its entry ID; it is sent in the background"""
     with open(test_type, "r", encoding="utf-8") as f:
         content = f.read()
         parts = content.split("---")
         instruction = parts[0].strip()
         questions = parts[1].strip()
 
-    send_message("text", instruction, broadcasting=broadcasting)
-    send_message("text", questions, broadcasting=broadcasting)
+    # The record and the answer key are saved once LINE accepts the quiz
+    context: Dict = {"quiz": get_quiz_key(test_type)}
+    if news_url:
+        context["url"] = news_url.strip()
+        quiz_words = {word for _, word in get_quiz_questions(test_type)}
+        context["record"] = get_quiz_record(news_url, quiz_words)
+
+    # Instruction, questions and sticker go out in a single request
+    return get_push_outbox().enqueue(
+        [instruction, questions], broadcasting, sticker, context
+    )
+
+
+def wait_for_push(entry_id: str, timeout: float = PUSH_TIMEOUT) -> None:
+    """Wait until a queued quiz is sent; raise if it failed or is still queued"""
+    entry = get_push_outbox().wait(entry_id, timeout)
+    if entry is None or entry["status"] == SENT:
+        return
+    if entry["status_code"] in (401, 403):
+        raise PermissionError(entry["last_error"])
+    if entry["status"] == FAILED:
+        raise ConnectionError(f"送信失敗：{entry['last_error']}")
+    raise ConnectionError(f"送信待ち（再送信します）：{entry['last_error']}")
+
+
+def log_sentiment_score(
+    article: Optional[str] = None,
+) -> Tuple[Dict[str, str], List[Tuple[str, Dict[str, str]]]]:
+    """Get the sentiment score of the text and of each paragraph."""
+    from check_sentiment import (
+        load_sentiment_backend,
+        predict_paragraph_sentiment_jp,
+        read_news_article,
+    )
+
+    if article is None:
+        article = read_news_article()
+    return predict_paragraph_sentiment_jp(article, backend=load_sentiment_backend())
+
+
+def start_sentiment_analysis() -> Optional[Future]:
+    """Score the article just written to news_article.txt in the model worker process"""
+    try:
+        from check_sentiment import read_news_article
+        from model_worker import get_model_worker
+    except ImportError:
+        print("Sentiment analysis module failed. Skipping sentiment analysis.")
+        return None
+    try:
+        return get_model_worker().submit(read_news_article())
+    except RuntimeError as e:
+        print(f"Sentiment analysis module failed ({e!r}). Skipping sentiment analysis.")
+        return None
+
+
+def format_sentiment_log(future: Optional[Future]) -> str:
+    """Wait for the model worker and format its scores for push_log.txt"""
+    if future is None:
+        return ""
+    try:
+        from model_worker import get_model_worker
+
+        scores_dict, paragraph_scores = get_model_worker().result(future)
+    except Exception as e:
+        print(f"Sentiment analysis module failed ({e!r}). Skipping sentiment analysis.")
+        return ""
+
+    lines = [f"{sentiment}: {score}" for sentiment, score in scores_dict.items()]
+
+    # Per-paragraph scores for teachers
+    for i, (_, paragraph_scores_dict) in enumerate(paragraph_scores, 1):
+        scores = " ".join(
+            f"{sentiment}: {score}"
+            for sentiment, score in paragraph_scores_dict.items()
+        )
+        lines.append(f"段落{i}: {scores}")
+    return "".join(f"{line}\n" for line in lines)
+
+
+def write_vocabulary_and_quizzes(
+    url: str,
+    soup: "BeautifulSoup",
+    article: List,
+    definition_list: List[str],
+    questions: int,
+    seed: Optional[int],
+) -> Tuple[str, int]:
+    """Write the vocabularies and definitions, generate both quizzes and return the answer and seed"""
+    # Important vocabularies (語彙)
+    vocabulary_list = soup.find_all("a", class_="dicWin")
+
+    # Create a dictionary of vocabulary: furigana, e.g. 話し合う: はな あ -> 話(はな)し合(あ)う
+    # カタカナ words have no ruby, so their furigana is an empty string
+    vocabulary_dict = {}
+    formatted_word_dict = {}
+    for vocabulary in vocabulary_list:
+        tokens = parse_ruby_tokens(str(vocabulary))
+        word = get_base_text(tokens)
+        vocabulary_dict[word] = get_furigana(tokens)
+        formatted_word_dict[word] = format_ruby_tokens(tokens)
+    formatted_word_list = list(formatted_word_dict.values())
+
+    # Write formatted vocabularies to a file
+    with open(NEWS_ARTICLE_TXT_LOCATION, "a", encoding="utf-8") as f:
+        f.write("---\n")
+        for word in formatted_word_list:
+            f.write(f"\n{word}")
+
+    # Modify the definition list to include the original word; get current progress
 
+    definition_list_original_word = []
+    for key, meaning in zip(vocabulary_dict.keys(), definition_list):
+        try:
+            definition_list_original_word.append(
+                key + "：" + meaning.split("：", 1)[1])
+        except IndexError:
+            print(
+                f"\nWARNING: definition_list is missing a or some element(s). "
+                f"This is a rare case due to incomplete scrapping of selenium. "
+                f"Consider re-running the program or change the scale for "
+                f"document.body.style.transform in get_definition.py."
+            )
+            pass
 
-def log_sentiment_score() -> Dict[str, str]:
-    """Get the sentiment score of the text."""
-    article = read_news_article()
-    score_dict = predict_sentiment_jp(article)
-    return score_dict
+    # Save definitions to a news_article.txt file
+    with open(NEWS_ARTICLE_TXT_LOCATION, "a", encoding="utf-8") as f:
+        f.write("\n\n---\n\n")
+        for definition in definition_list_original_word:
+            f.write(f"{definition}\n")
+    archive_news_article(url)
+
+    # Generate both quizzes from the same seed so that they can be reproduced
+    if seed is None:
+        seed = random.randrange(2**32)
+    paragraphs = [
+        p_tag.text.strip() for paragraph in article for p_tag in paragraph.find_all("p")
+    ]
+    def_answer = generate_quizzes(
+        url,
+        paragraphs,
+        vocabulary_dict,
+        definition_list_original_word,
+        questions,
+        seed,
+    )
+
+    return def_answer, seed
 
 
 def clear_terminal() -> None:
@@ -272,18 +708,23 @@ def main(
     broadcasting=False,
     emotion=False,
     questions=5,
+    seed: Optional[int] = None,
     progress_callback: Optional[Callable] = None,
 ) -> None:
     """Establish request connection and randomly scrap a Japanese news article's content and vocabularies"""
+    import chardet
+    import requests
+    from bs4 import BeautifulSoup
+
     # Get and encode a random news url; parsing the HTML content
     driver = setup_selenium_webdriver()
-    url = get_news_url(driver)
+    try:
+        url = get_news_url(driver)
+    except Exception:
+        driver.close()
+        raise
 
-    # Get the article vocabularies and definitions
-    definition_list = get_definition_list(driver, url, progress_callback)
-    driver.close()
-
-    # Establish a request connection to the url
+    # Establish a request connection to the url before the slow definition scraping
     response = requests.get(url)
     encoding = chardet.detect(response.content)["encoding"]
     response.encoding = encoding
@@ -291,6 +732,7 @@ def main(
         # HTTP status OK
         html_content = response.text
     else:
+        driver.close()
         sys.exit("Request failed. Check your Internet connection.")
     soup = BeautifulSoup(html_content, "html.parser")
 
@@ -311,134 +753,44 @@ def main(
     for paragraph in article:
         write_content_data("article", paragraph)
 
-    # Important vocabularies (語彙)
-    vocabulary_list = soup.find_all("a", class_="dicWin")
-    vocabulary_dict = {}
-    furigana = ""
-
-    # Create a dictionary of vocabulary: furigana
-    for vocabulary in vocabulary_list:
-        word = vocabulary.text
-        rt = vocabulary.find_all("rt")
-
-        if rt:
-            for i, _ in enumerate(rt):
-                curr = rt[i].text
-                if i > 0:
-                    furigana += " " + curr
-                else:
-                    furigana = curr
-
-        else:
-            # If keys are カタカナ, give them empty string as values instead
-            furigana = ""
-
-        vocabulary_dict[word] = furigana
-
-    # Reformat word: 話し合う: はな あ -> 話(はな)し合(あ)う
-    formatted_word_list = []
-    for key, value in vocabulary_dict.items():
-        word = ""
-        combine = False
-        for char in key:
-            if is_hiragana_char(char):
-                combine = True
-
-        # If the word is a combination of hiragana, combine the furigana
-        if combine:
-            key += " "
-            kana = deque(value.split(" "))
-            for i, char in enumerate(key):
-                if (
-                    not is_hiragana_char(char)
-                    and (i + 1 < len(key))
-                    and (is_hiragana_char(key[i + 1]) or " ")
-                ):
-                    try:
-                        word += f"{char}({kana[0]})"
-                        kana.popleft()
-                    except IndexError:
-                        word += char
-                        word = word.replace(f"({value})", "")
-                else:
-                    word += char
-        if word:
-            word = word.replace(" ", "")
-            formatted_word_list.append(word)
-        else:
-            formatted_word = f"{key}({value})"
-            if "()" in formatted_word:
-                formatted_word = formatted_word.replace("()", "")
-            formatted_word_list.append(formatted_word)
-
-    # Write formatted vocabularies to a file
-    with open(NEWS_ARTICLE_TXT_LOCATION, "a", encoding="utf-8") as f:
-        f.write("---\n")
-        for word in formatted_word_list:
-            f.write(f"\n{word}")
-
     # Printing news title, date, and url
     if title and date:
         print(f"\n{title.text.strip()} {date.text}")
         print(f"{url}\n")
 
-    # Modify the definition list to include the original word; get current progress
+    # Score the sentiment in the model worker process while the definitions are
+    # scraped and the quizzes are generated; a process keeps torch off the GUI's GIL
+    sentiment_future = start_sentiment_analysis() if emotion else None
 
-    definition_list_original_word = []
-    for key, meaning in zip(vocabulary_dict.keys(), definition_list):
-        try:
-            definition_list_original_word.append(
-                key + "：" + meaning.split("：", 1)[1])
-        except IndexError:
-            print(
-                f"\nWARNING: definition_list is missing a or some element(s). "
-                f"This is a rare case due to incomplete scrapping of selenium. "
-                f"Consider re-running the program or change the scale for "
-                f"document.body.style.transform in get_definition.py."
-            )
-            pass
-
-    # Save definitions to a news_article.txt file
-    with open(NEWS_ARTICLE_TXT_LOCATION, "a", encoding="utf-8") as f:
-        f.write("\n\n---\n\n")
-        for definition in definition_list_original_word:
-            f.write(f"{definition}\n")
-
-    # Generate the pronunciation quiz
-    generate_pronunciation_quiz(url, vocabulary_dict, questions=questions)
+    # Get the article vocabularies and definitions
+    try:
+        definition_list = get_definition_list(driver, url, progress_callback)
+    finally:
+        driver.close()
 
-    # Get the answer to the definition quiz and generate the definition quiz
-    def_answer = generate_definition_quiz(
-        article, vocabulary_dict, definition_list_original_word
+    def_answer, seed = write_vocabulary_and_quizzes(
+        url, soup, article, definition_list, questions, seed
     )
 
+    # Write the log once both the quizzes and the sentiment scores are ready
+    sentiment_log = format_sentiment_log(sentiment_future)
+
     # Save quiz sent time and news url to a log file
     with open(LOG_LOCATION, "w", encoding="utf-8") as f:
         now = get_today_date_jp()[0]
         now = now.strftime(f"%Y-%m-%d %H:%M:%S")
-        f.write(f"{now}\n{url}\n単語意味クイズ解答：{def_answer}\n")
-
-        # Log sentiment analysis score
-        if emotion:
-            try:
-                scores_dict = log_sentiment_score()
-                for sentiment, score in scores_dict.items():
-                    f.write(f"{sentiment}: {score}\n")
-            except NameError:
-                print("Sentiment analysis module failed. Skipping sentiment analysis.")
-
-    # Push quiz to LINE if push is True
+        f.write(f"{now}\n{url}\n単語意味クイズ解答：{def_answer}\nシード：{seed}\n")
+        f.write(sentiment_log)
+
+    # Push quiz to LINE if push is True; the outbox logs "送信済み" and saves the
+    # quiz history once it is sent
     if push:
         if quiz_type == "単語意味クイズ":
-            push_quiz(DEF_QUIZ_LOCATION, broadcasting=broadcasting)
-            save_quiz_vocab(url)
+            entry_id = push_quiz(DEF_QUIZ_LOCATION, broadcasting, news_url=url)
+            wait_for_push(entry_id)
         elif quiz_type == "読み方クイズ":
-            push_quiz(PRONOUN_QUIZ_LOCATION, broadcasting=broadcasting)
-            save_quiz_vocab(url)
-
-        # Save quiz sent time and news url to a log file
-        with open(LOG_LOCATION, "a", encoding="utf-8") as f:
-            f.write("送信済み\n")
+            entry_id = push_quiz(PRONOUN_QUIZ_LOCATION, broadcasting, news_url=url)
+            wait_for_push(entry_id)
 
 
 if __name__ == "__main__":
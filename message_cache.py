@@ -0,0 +1,170 @@
+# Standard library imports
+import os
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Third-party imports
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+
+"""
+Local copy of the LINE Messages sheet. Each run fetches only the rows added since the
+last run (json_files/message_cursor.json remembers the last row) and appends them to
+a SQLite cache, so grading reads the quiz window from the cache instead of downloading
+the whole sheet.
+"""
+
+MESSAGE_CACHE_LOCATION = r"txt_files/line_messages.sqlite3"
+MESSAGE_CURSOR_LOCATION = r"json_files/message_cursor.json"
+# Fixed width so that text order is time order
+SENT_TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def connect_cache(location: str = MESSAGE_CACHE_LOCATION) -> sqlite3.Connection:
+    """Open the message cache, creating it if needed"""
+    directory = os.path.dirname(location)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    connection = sqlite3.connect(location)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS messages ("
+        "row_number INTEGER PRIMARY KEY, sent_time TEXT, message TEXT, record TEXT)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS messages_sent_time ON messages (sent_time)"
+    )
+    return connection
+
+
+def read_cursor(location: str = MESSAGE_CURSOR_LOCATION) -> Dict:
+    """Return the last ingested row number, its values and the header"""
+    try:
+        with open(location, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"last_row": 0, "last_row_values": [], "header": []}
+
+
+def write_cursor(cursor: Dict, location: str = MESSAGE_CURSOR_LOCATION) -> None:
+    """Save the cursor atomically"""
+    directory = os.path.dirname(location)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    temp_location = f"{location}.tmp"
+    with open(temp_location, "w", encoding="utf-8") as f:
+        json.dump(cursor, f, ensure_ascii=False, indent=4)
+    os.replace(temp_location, location)
+
+
+def trim_row(row: List[str]) -> List[str]:
+    """Drop trailing empty cells, which the Sheets API may or may not return"""
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def sync_messages(
+    message_sheet,
+    cache_location: str = MESSAGE_CACHE_LOCATION,
+    cursor_location: str = MESSAGE_CURSOR_LOCATION,
+) -> int:
+    """Append the rows added to the Messages sheet since the last sync and return their number
+
+    The last synced row is fetched again: if it changed, rows were deleted or moved
+    in the sheet and the cache is rebuilt from the first row.
+    """
+    cursor = read_cursor(cursor_location)
+    last_row = cursor["last_row"]
+    if last_row:
+        last_column = rowcol_to_a1(1, len(cursor["header"])).rstrip("0123456789")
+        rows = message_sheet.get_values(f"A{last_row}:{last_column}")
+        if not rows or trim_row(rows[0]) != cursor["last_row_values"]:
+            print(
+                "WARNING: The Messages sheet was edited. Rebuilding the message cache."
+            )
+            last_row = 0
+
+    if not last_row:
+        rows = message_sheet.get_values()
+        if not rows:
+            return 0
+        cursor = {"header": trim_row(rows[0])}
+        last_row = 1
+    header = cursor["header"]
+    new_rows = rows[1:]
+
+    if new_rows:
+        df_new = pd.DataFrame(
+            [row[: len(header)] + [""] * (len(header) - len(row)) for row in new_rows],
+            columns=header,
+        )
+        sent_times = pd.to_datetime(df_new.get("Sent Time"), errors="coerce")
+        records = [
+            (
+                last_row + offset,
+                None if pd.isna(sent_time) else sent_time.strftime(SENT_TIME_FORMAT),
+                message,
+                json.dumps(record, ensure_ascii=False),
+            )
+            for offset, (sent_time, message, record) in enumerate(
+                zip(
+                    sent_times,
+                    df_new.get("Message", [""] * len(df_new)),
+                    df_new.to_dict("records"),
+                ),
+                start=1,
+            )
+        ]
+    else:
+        records = []
+
+    connection = connect_cache(cache_location)
+    try:
+        with connection:
+            if last_row == 1:
+                connection.execute("DELETE FROM messages")
+            connection.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?)", records
+            )
+    finally:
+        connection.close()
+
+    # Written after the rows so that a crash in between only re-fetches them
+    cursor["last_row"] = last_row + len(new_rows)
+    # Same width as the refetch of the last row, which stops at the last header column
+    cursor["last_row_values"] = trim_row(rows[-1][: len(header)])
+    write_cursor(cursor, cursor_location)
+    return len(new_rows)
+
+
+def load_messages(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cache_location: str = MESSAGE_CACHE_LOCATION,
+) -> pd.DataFrame:
+    """Return the cached messages sent between start and end with their row numbers"""
+    conditions, parameters = [], []
+    if start is not None:
+        conditions.append("sent_time >= ?")
+        parameters.append(start.strftime(SENT_TIME_FORMAT))
+    if end is not None:
+        conditions.append("sent_time <= ?")
+        parameters.append(end.strftime(SENT_TIME_FORMAT))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    connection = connect_cache(cache_location)
+    try:
+        df_message = pd.read_sql_query(
+            'SELECT row_number, sent_time AS "Sent Time", message AS "Message" '
+            f"FROM messages {where} ORDER BY row_number",
+            connection,
+            params=parameters,
+            index_col="row_number",
+        )
+    finally:
+        connection.close()
+    df_message["Sent Time"] = pd.to_datetime(df_message["Sent Time"])
+    return df_message
@@ -0,0 +1,248 @@
+# Standard library imports
+import queue
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError
+from typing import Any, Dict, Optional
+
+# Local imports
+from check_sentiment import DEFAULT_MODEL_NAME, load_sentiment_backend
+
+"""
+The sentiment model runs in a long-lived subprocess so that importing torch and
+running inference never hold the GIL of the GUI process. Requests and responses
+go through queues and are matched by request ID.
+"""
+
+SENTIMENT_TIMEOUT = 180  # seconds, including the first model load
+MAX_RESTARTS = 3
+POLL_INTERVAL = 0.2
+PARENT_CHECK_INTERVAL = 1
+
+# Spawn a fresh interpreter instead of forking a process that runs Tk threads
+_context = multiprocessing.get_context("spawn")
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised for requests that were pending when the worker process died"""
+
+
+def run_worker(request_queue, response_queue, model_name: str, backend: str) -> None:
+    """Serve sentiment requests until None is received (runs in the subprocess)"""
+    from check_sentiment import get_sentiment_model, predict_paragraph_sentiment_jp
+
+    # Load the model before the first request; errors are reported per request
+    load_error = None
+    try:
+        get_sentiment_model(model_name, backend).load()
+    except Exception as e:
+        load_error = repr(e)
+
+    # Exit with the app, also when it is killed or restarted with os.execl
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            request = request_queue.get(timeout=PARENT_CHECK_INTERVAL)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():
+                return
+            continue
+        if request is None:
+            return
+        request_id, text = request
+        if load_error:
+            response_queue.put((request_id, False, load_error))
+            continue
+        try:
+            result = predict_paragraph_sentiment_jp(text, model_name, backend)
+        except Exception as e:
+            response_queue.put((request_id, False, repr(e)))
+        else:
+            response_queue.put((request_id, True, result))
+
+
+def stop_process(process, timeout: float) -> None:
+    """Wait for a worker process to exit and kill it if it does not exit in time"""
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+
+
+class ModelWorker:
+    """Client of the sentiment worker process that restarts it when it crashes"""
+
+    def __init__(
+        self, model_name: str = DEFAULT_MODEL_NAME, backend: Optional[str] = None
+    ) -> None:
+        self.model_name = model_name
+        self.backend = backend or load_sentiment_backend()
+        self.restart_count = 0
+        self._process = None
+        self._request_queue = None
+        self._pending: Dict[int, Future] = {}
+        self._request_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def is_stopped(self) -> bool:
+        return self._stopped
+
+    def start(self) -> None:
+        """Start the worker process if it is not running"""
+        with self._lock:
+            self._stopped = False
+            if not self.is_alive:
+                self._start_process()
+
+    def _start_process(self) -> None:
+        """Start a worker process with fresh queues and a thread reading its responses"""
+        # New queues so that a restarted worker never reads requests of a dead one
+        request_queue, response_queue = _context.Queue(), _context.Queue()
+        process = _context.Process(
+            target=run_worker,
+            args=(request_queue, response_queue, self.model_name, self.backend),
+            daemon=True,
+        )
+        process.start()
+        self._process, self._request_queue = process, request_queue
+
+        reader = threading.Thread(
+            target=self._read_responses, args=(process, response_queue), daemon=True
+        )
+        reader.start()
+
+    def _read_responses(self, process, response_queue) -> None:
+        """Resolve pending futures with the responses of one worker process"""
+        while True:
+            try:
+                request_id, success, result = response_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                self._handle_exit(process)
+                return
+
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+                self.restart_count = 0
+            if future is None:
+                continue  # The request timed out and was given up
+            if success:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(result))
+
+    def _handle_exit(self, process) -> None:
+        """Fail the pending requests of an exited worker and restart it if it crashed"""
+        with self._lock:
+            if process is not self._process:
+                return  # Already replaced, e.g. after a timeout
+            pending, self._pending = self._pending, {}
+            crashed = not self._stopped
+            if crashed and self.restart_count < MAX_RESTARTS:
+                self.restart_count += 1
+                print(
+                    f"Sentiment worker exited with code {process.exitcode}. "
+                    f"Restarting ({self.restart_count}/{MAX_RESTARTS})."
+                )
+                self._start_process()
+            else:
+                self._process = None
+
+        for future in pending.values():
+            future.set_exception(
+                WorkerCrashedError(
+                    f"Sentiment worker exited with code {process.exitcode}"
+                )
+            )
+
+    def submit(self, text: str) -> Future:
+        """Send a text to the worker and return a future of its sentiment scores"""
+        future: Future = Future()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("Sentiment worker is stopped")
+            if not self.is_alive:
+                self._start_process()
+            request_id = next(self._request_ids)
+            self._pending[request_id] = future
+            self._request_queue.put((request_id, text))  # type: ignore
+        return future
+
+    def result(self, future: Future, timeout: float = SENTIMENT_TIMEOUT) -> Any:
+        """Wait for a submitted request; a worker that does not answer in time is restarted"""
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # A stuck worker would also block every later request
+            self.restart()
+            raise
+
+    def predict(self, text: str, timeout: float = SENTIMENT_TIMEOUT) -> Any:
+        """Return the overall and paragraph sentiment scores of a text"""
+        return self.result(self.submit(text), timeout)
+
+    def restart(self) -> None:
+        """Kill the worker process and start a new one"""
+        with self._lock:
+            process = self._process
+            pending, self._pending = self._pending, {}
+            if process is not None:
+                process.terminate()
+            self._start_process()
+        for future in pending.values():
+            future.set_exception(WorkerCrashedError("Sentiment worker was restarted"))
+
+    def stop(self, timeout: float = 5) -> None:
+        """Ask the worker to exit, killing it if it does not exit in time
+
+        Returns at once: a worker that is loading the model only reads the exit request
+        when it is done, so waiting for it would freeze the GUI.
+        """
+        with self._lock:
+            self._stopped = True
+            process, self._process = self._process, None
+            pending, self._pending = self._pending, {}
+            if process is not None:
+                self._request_queue.put(None)  # type: ignore
+        for future in pending.values():
+            future.set_exception(WorkerCrashedError("Sentiment worker was stopped"))
+        if process is not None:
+            threading.Thread(
+                target=stop_process, args=(process, timeout), daemon=True
+            ).start()
+
+
+# One worker for the whole process
+_model_worker: Optional[ModelWorker] = None
+_model_worker_lock = threading.Lock()
+
+
+def get_model_worker(
+    model_name: str = DEFAULT_MODEL_NAME, backend: Optional[str] = None
+) -> ModelWorker:
+    """Return the process-wide model worker, replacing it if it was stopped or changed
+
+    backend defaults to the running worker's backend, so callers that do not pick one
+    (e.g. main) reuse the worker the GUI started instead of reloading the model.
+    """
+    global _model_worker
+    with _model_worker_lock:
+        worker = _model_worker
+        backend = backend or (worker.backend if worker else load_sentiment_backend())
+        if worker is not None and (
+            worker.is_stopped
+            or worker.model_name != model_name
+            or worker.backend != backend
+        ):
+            worker.stop()
+            _model_worker = None
+        if _model_worker is None:
+            _model_worker = ModelWorker(model_name, backend)
+        return _model_worker
@@ -0,0 +1,283 @@
+# Standard library imports
+import os
+import json
+import time
+import uuid
+import random
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Local imports
+from rate_limiter import TokenBucket
+
+"""
+Outgoing LINE messages are written to json_files/outbox.json before they are sent,
+so a quiz survives network errors and app restarts. A background worker sends the
+entries and retries transient failures with exponential backoff and jitter.
+Every request carries a retry key derived from the entry ID, so LINE ignores
+a retried request that was already accepted (409 Conflict).
+"""
+
+OUTBOX_LOCATION = r"json_files/outbox.json"
+MAX_ATTEMPTS = 8
+BASE_BACKOFF = 2.0  # seconds
+MAX_BACKOFF = 300.0
+SEND_REQUESTS_PER_SECOND = 10
+KEPT_FINISHED_ENTRIES = 20
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+Entry = Dict[str, object]
+Listener = Callable[[Entry, str, str], None]
+
+
+def get_retry_key(entry_id: str, request_index: int) -> str:
+    """Return the retry key (a UUID) of one request of an entry"""
+    return str(uuid.uuid5(uuid.UUID(entry_id), str(request_index)))
+
+
+def get_backoff(attempts: int, rng: Callable[[], float] = random.random) -> float:
+    """Return the delay before the next attempt: full jitter exponential backoff"""
+    return rng() * min(MAX_BACKOFF, BASE_BACKOFF * 2**attempts)
+
+
+def classify_error(error: Exception) -> Tuple[bool, str]:
+    """Return whether an error is worth retrying and a message for the log"""
+    import requests
+
+    if isinstance(
+        error, (requests.exceptions.RequestException, ConnectionError, TimeoutError)
+    ):
+        return True, f"接続エラー：{error!r}"  # Network errors and timeouts
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        return False, f"送信エラー：{error!r}"
+    if status_code in (401, 403):
+        return False, "認証に失敗しました。アクセストークンを確認してください。"
+    if status_code == 429 or status_code >= 500:
+        return True, f"LINE APIエラー({status_code})"
+    return False, f"LINE APIエラー({status_code})：{error}"
+
+
+def default_send_request(
+    texts: List[str],
+    sticker: Optional[Tuple[str, str]],
+    broadcasting: bool,
+    request_index: int,
+    retry_key: str,
+) -> int:
+    """Send one request of an entry and return the number of requests of the entry"""
+    from send_line_message import MAX_MESSAGES_PER_REQUEST, build_messages, send_request
+
+    messages = build_messages(texts, sticker)
+    start = request_index * MAX_MESSAGES_PER_REQUEST
+    send_request(
+        messages[start : start + MAX_MESSAGES_PER_REQUEST], broadcasting, retry_key
+    )
+    return -(-len(messages) // MAX_MESSAGES_PER_REQUEST)
+
+
+class Outbox:
+    """Persistent queue of outgoing messages drained by a background worker"""
+
+    def __init__(
+        self,
+        location: str = OUTBOX_LOCATION,
+        send_request: Callable[..., int] = default_send_request,
+        clock: Callable[[], float] = time.time,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self.location = location
+        self.send_request = send_request
+        self.clock = clock
+        self.rng = rng
+        self.bucket = TokenBucket(SEND_REQUESTS_PER_SECOND)
+        self.entries: List[Entry] = self.load()
+        self._listeners: List[Listener] = []
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def load(self) -> List[Entry]:
+        """Load the entries saved by a previous run"""
+        try:
+            with open(self.location, "r", encoding="utf-8") as f:
+                return json.load(f)["entries"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return []
+
+    def save(self) -> None:
+        """Save the entries atomically, keeping only the latest finished ones"""
+        finished = [entry for entry in self.entries if entry["status"] != PENDING]
+        for entry in finished[:-KEPT_FINISHED_ENTRIES]:
+            self.entries.remove(entry)
+
+        directory = os.path.dirname(self.location)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_location = f"{self.location}.tmp"
+        with open(temp_location, "w", encoding="utf-8") as f:
+            json.dump({"entries": self.entries}, f, ensure_ascii=False, indent=4)
+        os.replace(temp_location, self.location)
+
+    def add_listener(self, listener: Listener) -> None:
+        """Call listener(entry, status, message) whenever an entry is sent, retried or failed"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def notify(self, entry: Entry, status: str, message: str) -> None:
+        """Report a status change to the listeners; a broken listener never stops the worker"""
+        for listener in list(self._listeners):
+            try:
+                listener(entry, status, message)
+            except Exception as e:
+                print(f"Outbox listener failed: {e!r}")
+
+    def enqueue(
+        self,
+        texts: List[str],
+        broadcasting: bool = False,
+        sticker: Optional[Tuple[str, str]] = None,
+        context: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Save messages to the outbox and return the entry ID"""
+        entry: Entry = {
+            "id": str(uuid.uuid4()),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "texts": texts,
+            "sticker": list(sticker) if sticker else None,
+            "broadcasting": broadcasting,
+            "context": context or {},
+            "status": PENDING,
+            "sent_requests": 0,
+            "attempts": 0,
+            "next_attempt": self.clock(),
+            "last_error": "",
+            "status_code": None,
+        }
+        with self._condition:
+            self.entries.append(entry)
+            self.save()
+            self._condition.notify_all()
+        return str(entry["id"])
+
+    def get(self, entry_id: str) -> Optional[Entry]:
+        """Return a copy of an entry, or None if it is unknown"""
+        with self._condition:
+            for entry in self.entries:
+                if entry["id"] == entry_id:
+                    return dict(entry)
+        return None
+
+    def wait(self, entry_id: str, timeout: Optional[float] = None) -> Optional[Entry]:
+        """Wait until an entry is sent or failed (or the timeout passes) and return it"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: (self.get(entry_id) or {}).get("status") != PENDING, timeout
+            )
+            return self.get(entry_id)
+
+    def get_due_entry(self) -> Tuple[Optional[Entry], float]:
+        """Return the next pending entry that is due, or the seconds until one is"""
+        pending = [entry for entry in self.entries if entry["status"] == PENDING]
+        if not pending:
+            return None, float("inf")
+        entry = min(pending, key=lambda entry: entry["next_attempt"])  # type: ignore
+        delay = float(entry["next_attempt"]) - self.clock()  # type: ignore
+        return (entry, 0.0) if delay <= 0 else (None, delay)
+
+    def send_entry(self, entry: Entry) -> None:
+        """Send the remaining requests of an entry and update its status"""
+        sticker = tuple(entry["sticker"]) if entry["sticker"] else None  # type: ignore
+        try:
+            while True:
+                self.bucket.acquire()
+                request_index = int(entry["sent_requests"])  # type: ignore
+                request_count = self.send_request(
+                    entry["texts"],
+                    sticker,
+                    entry["broadcasting"],
+                    request_index,
+                    get_retry_key(str(entry["id"]), request_index),
+                )
+                with self._condition:
+                    entry["sent_requests"] = request_index + 1
+                    self.save()
+                if request_index + 1 >= request_count:
+                    break
+        except Exception as e:
+            retry, message = classify_error(e)
+            with self._condition:
+                entry["attempts"] = int(entry["attempts"]) + 1  # type: ignore
+                entry["last_error"] = message
+                entry["status_code"] = getattr(e, "status_code", None)
+                if retry and int(entry["attempts"]) < MAX_ATTEMPTS:  # type: ignore
+                    delay = get_backoff(int(entry["attempts"]), self.rng)  # type: ignore
+                    entry["next_attempt"] = self.clock() + delay
+                    status = PENDING
+                    message = f"{message} {delay:.0f}秒後に再送信します({entry['attempts']}/{MAX_ATTEMPTS})"
+                else:
+                    entry["status"] = status = FAILED
+                self.save()
+                self._condition.notify_all()
+            self.notify(entry, status, message)
+            return
+
+        with self._condition:
+            entry["status"] = SENT
+            entry["last_error"] = ""
+            self.save()
+            self._condition.notify_all()
+        self.notify(entry, SENT, "")
+
+    def process_due_entries(self) -> float:
+        """Send every entry that is due and return the seconds until the next one"""
+        while True:
+            with self._condition:
+                entry, delay = self.get_due_entry()
+            if entry is None:
+                return delay
+            self.send_entry(entry)
+
+    def run(self) -> None:
+        """Worker loop: send due entries, then sleep until the next one or a new entry"""
+        while True:
+            delay = self.process_due_entries()
+            with self._condition:
+                if self._stopped:
+                    return
+                self._condition.wait(None if delay == float("inf") else delay)
+                if self._stopped:
+                    return
+
+    def start(self) -> None:
+        """Start the background worker if it is not running"""
+        with self._condition:
+            self._stopped = False
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self.run, daemon=True)
+                self._worker.start()
+
+    def stop(self) -> None:
+        """Stop the background worker after the current request"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+
+# One outbox for the whole process
+_outbox: Optional[Outbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    """Return the process-wide outbox with its worker running"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox()
+        _outbox.start()
+        return _outbox
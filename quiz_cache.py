@@ -0,0 +1,59 @@
+# Standard library imports
+import os
+import json
+import hashlib
+from typing import Iterable, Optional, Tuple
+
+QUIZ_CACHE_FOLDER = r"txt_files/quiz_cache"
+
+
+def get_article_id(url: str) -> str:
+    """Return the article ID (e.g. k10014571511000) of a news url"""
+    return os.path.splitext(os.path.basename(url.strip()))[0]
+
+
+def get_quiz_cache_key(
+    article_id: str,
+    seed: int,
+    quiz_type: str,
+    questions: int,
+    recent_words: Iterable[str] = (),
+) -> str:
+    """Return the cache key of a rendered quiz
+
+    recent_words are the article's words quizzed recently: the selection depends on
+    them, so a quiz chosen before the history changed is not reused.
+    """
+    raw_key = (
+        f"{article_id}|{seed}|{quiz_type}|{questions}|{','.join(sorted(recent_words))}"
+    )
+    return hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+
+def get_cache_path(key: str) -> str:
+    """Return the file path of a cached quiz"""
+    return os.path.join(QUIZ_CACHE_FOLDER, f"{key}.json")
+
+
+def load_cached_quiz(key: str) -> Optional[Tuple[str, str]]:
+    """Return the cached quiz content and answer key, or None on a cache miss"""
+    try:
+        with open(get_cache_path(key), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return data["content"], data.get("answer", "")
+
+
+def save_cached_quiz(key: str, content: str, answer: str = "") -> None:
+    """Save a rendered quiz and its answer key to the cache"""
+    if not os.path.exists(QUIZ_CACHE_FOLDER):
+        os.makedirs(QUIZ_CACHE_FOLDER)
+
+    # Write to a temporary file first so that a crash never leaves a broken entry
+    path = get_cache_path(key)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"content": content, "answer": answer}, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
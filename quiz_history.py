@@ -0,0 +1,259 @@
+# Standard library imports
+import os
+import re
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+PAST_QUIZ_DATA_LOCATION = r"txt_files/past_quiz_data.txt"
+PAST_QUIZ_INDEX_LOCATION = r"txt_files/past_quiz_index.json"
+RECENT_WORDS_LOCATION = r"txt_files/recent_words.json"
+SENT_QUIZ_LOCATION = r"txt_files/sent_quizzes.jsonl"
+RECENT_WORD_DAYS = 7
+
+# e.g. 2023年04月08日 土曜日 10時30分
+RECORD_DATE_PATTERN = re.compile(
+    r"(\d{4})年(\d{1,2})月(\d{1,2})日.*?(\d{1,2})時(\d{1,2})分"
+)
+RECORD_SEPARATOR = b"---"
+
+
+class QuizRecord(NamedTuple):
+    """A pushed quiz saved in past_quiz_data.txt"""
+
+    sent_time: datetime
+    url: str
+    vocab: List[str]
+    definitions: List[str]
+
+
+def parse_record_date(line: str) -> Optional[datetime]:
+    """Parse the Japanese date line of a quiz record"""
+    match = RECORD_DATE_PATTERN.search(line)
+    if not match:
+        return None
+    return datetime(*[int(value) for value in match.groups()])  # type: ignore
+
+
+def parse_record(raw_record: str) -> Optional[QuizRecord]:
+    """Parse a single quiz record written by main.save_quiz_vocab"""
+    lines = [line.strip() for line in raw_record.splitlines()]
+    lines = [line for line in lines if line and line != "---"]
+    if len(lines) < 2:
+        return None
+
+    sent_time = parse_record_date(lines[0])
+    if sent_time is None:
+        return None
+
+    # Definitions are written as 単語：意味, vocabularies as 話(はな)し合(あ)う
+    vocab = [line for line in lines[2:] if "：" not in line]
+    definitions = [line for line in lines[2:] if "：" in line]
+    return QuizRecord(sent_time, lines[1], vocab, definitions)
+
+
+def split_formatted_word(formatted_word: str) -> Tuple[str, str]:
+    """Split 話(はな)し合(あ)う into the word 話し合う and its furigana はな あ"""
+    word = re.sub(r"\(.*?\)", "", formatted_word)
+    return word, " ".join(re.findall(r"\((.*?)\)", formatted_word))
+
+
+def scan_records(
+    location: str = PAST_QUIZ_DATA_LOCATION, start_offset: int = 0
+) -> List[Tuple[str, int, int]]:
+    """Scan the history file from a byte offset and return (time, offset, length) entries"""
+    entries = []
+    with open(location, "rb") as f:
+        f.seek(start_offset)
+        offset = start_offset
+        record_start = None
+        record_lines: List[bytes] = []
+        for line in f:
+            if record_start is None and line.strip():
+                record_start = offset
+            offset += len(line)
+            if record_start is None:
+                continue
+
+            record_lines.append(line)
+            if line.strip() == RECORD_SEPARATOR:
+                record = parse_record(b"".join(record_lines).decode("utf-8"))
+                if record:
+                    entries.append(
+                        (
+                            record.sent_time.isoformat(),
+                            record_start,
+                            offset - record_start,
+                        )
+                    )
+                record_start = None
+                record_lines = []
+    return entries
+
+
+def load_index(
+    location: str = PAST_QUIZ_DATA_LOCATION,
+    index_location: str = PAST_QUIZ_INDEX_LOCATION,
+) -> List[Tuple[str, int, int]]:
+    """Load the history index, scanning only the part of the file that is not indexed yet"""
+    if not os.path.exists(location):
+        return []
+    file_size = os.path.getsize(location)
+
+    try:
+        with open(index_location, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        entries = [tuple(entry) for entry in index["entries"]]
+        indexed_size = index["file_size"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        entries, indexed_size = [], 0
+
+    if indexed_size == file_size:
+        return entries  # type: ignore
+
+    # The file was truncated (e.g. past quizzes deleted), so the whole index is stale
+    if indexed_size > file_size:
+        entries, indexed_size = [], 0
+
+    entries += scan_records(location, indexed_size)  # type: ignore
+    entries.sort()
+    save_index(entries, file_size, index_location)
+    return entries  # type: ignore
+
+
+def save_index(
+    entries: List[Tuple[str, int, int]],
+    file_size: int,
+    index_location: str = PAST_QUIZ_INDEX_LOCATION,
+) -> None:
+    """Save the history index to a file"""
+    directory = os.path.dirname(index_location)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(index_location, "w", encoding="utf-8") as f:
+        json.dump({"file_size": file_size, "entries": entries}, f)
+
+
+def append_record(
+    sent_time: datetime,
+    record_text: str,
+    location: str = PAST_QUIZ_DATA_LOCATION,
+    index_location: str = PAST_QUIZ_INDEX_LOCATION,
+) -> None:
+    """Append a quiz record to the history file and its index"""
+    # Bring the index up to date before the file grows
+    entries = load_index(location, index_location)
+    offset = os.path.getsize(location) if os.path.exists(location) else 0
+
+    with open(location, "a+", encoding="utf-8") as f:
+        f.write(record_text)
+
+    file_size = os.path.getsize(location)
+    entries.append((sent_time.isoformat(), offset, file_size - offset))
+    entries.sort()
+    save_index(entries, file_size, index_location)
+
+
+def read_quiz_records(
+    start_date: date,
+    end_date: date,
+    location: str = PAST_QUIZ_DATA_LOCATION,
+    index_location: str = PAST_QUIZ_INDEX_LOCATION,
+) -> List[QuizRecord]:
+    """Read the quiz records sent between two dates (inclusive)"""
+    entries = load_index(location, index_location)
+    keys = [entry[0] for entry in entries]
+    first = bisect_left(keys, start_date.isoformat())
+    last = bisect_right(keys, f"{end_date.isoformat()}T99")
+
+    # Seek to each indexed record instead of parsing the whole file
+    records = []
+    with open(location, "rb") as f:
+        for _, offset, length in entries[first:last]:
+            f.seek(offset)
+            record = parse_record(f.read(length).decode("utf-8"))
+            if record:
+                records.append(record)
+    return records
+
+
+def update_recent_words(
+    location: str = PAST_QUIZ_DATA_LOCATION,
+    index_location: str = PAST_QUIZ_INDEX_LOCATION,
+    recent_location: str = RECENT_WORDS_LOCATION,
+) -> Dict[str, str]:
+    """Return the last quizzed date of every word, reading only records added since the last call"""
+    try:
+        with open(recent_location, "r", encoding="utf-8") as f:
+            recent = json.load(f)
+        last_seen = recent["last_seen"]
+        indexed_size = recent["file_size"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        last_seen, indexed_size = {}, 0
+
+    entries = load_index(location, index_location)
+    file_size = os.path.getsize(location) if os.path.exists(location) else 0
+    if indexed_size == file_size:
+        return last_seen
+
+    # Rebuild from scratch if the history file was truncated
+    if indexed_size > file_size:
+        last_seen, indexed_size = {}, 0
+
+    with open(location, "rb") as f:
+        for sent_time, offset, length in entries:
+            if offset < indexed_size:
+                continue
+            f.seek(offset)
+            record = parse_record(f.read(length).decode("utf-8"))
+            if record is None:
+                continue
+            for formatted_word in record.vocab:
+                word = split_formatted_word(formatted_word)[0]
+                last_seen[word] = max(last_seen.get(word, ""), sent_time[:10])
+
+    directory = os.path.dirname(recent_location)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(recent_location, "w", encoding="utf-8") as f:
+        json.dump(
+            {"file_size": file_size, "last_seen": last_seen}, f, ensure_ascii=False
+        )
+    return last_seen
+
+
+def load_recent_words(
+    days: int = RECENT_WORD_DAYS,
+    location: str = PAST_QUIZ_DATA_LOCATION,
+    index_location: str = PAST_QUIZ_INDEX_LOCATION,
+    recent_location: str = RECENT_WORDS_LOCATION,
+) -> Set[str]:
+    """Return the set of words quizzed in the last N days"""
+    cutoff = (datetime.now().date() - timedelta(days=days)).isoformat()
+    last_seen = update_recent_words(location, index_location, recent_location)
+    return {word for word, seen_date in last_seen.items() if seen_date >= cutoff}
+
+
+def append_sent_quiz(quiz: Dict, location: str = SENT_QUIZ_LOCATION) -> None:
+    """Append the answer key of a sent quiz (one JSON object per line)"""
+    directory = os.path.dirname(location)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(location, "a", encoding="utf-8") as f:
+        f.write(json.dumps(quiz, ensure_ascii=False) + "\n")
+
+
+def load_sent_quizzes(location: str = SENT_QUIZ_LOCATION) -> List[Dict]:
+    """Return the answer keys of every sent quiz, skipping broken lines"""
+    quizzes = []
+    try:
+        with open(location, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    quizzes.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return quizzes
@@ -0,0 +1,142 @@
+# Standard library imports
+import difflib
+from typing import List
+
+# Third-party imports
+import numpy as np
+import pandas as pd
+
+# Local imports
+from furigana import get_formatted_word_reading
+from jp_script import KATAKANA_TO_HIRAGANA_TABLE, is_katakana
+
+"""
+Grading of the pronunciation (読み方) quiz. Students reply with their student number
+and one line per question:
+
+    A10001
+    A. はなしあう
+    B. セイフ
+
+Answers and readings are normalized the same way (NFKC for full-width and half-width
+characters, katakana to hiragana, no whitespace), so セイフ, ｾｲﾌ and せい ふ all match
+せいふ. An exact match is worth 1 point and a close answer half a point. Katakana words
+are answered with their meaning and are left for the teacher to grade.
+"""
+
+FULL_CREDIT = 1.0
+PARTIAL_CREDIT = 0.5
+PARTIAL_CREDIT_RATIO = 0.75  # difflib similarity needed for partial credit
+
+STUDENT_ID_PATTERN = r"\A\s*(?:学生番号\s*:?\s*)?(?P<student_id>[^\n]*?)\s*(?:\n|\Z)"
+# "A. はなしあう", "a: はなしあう" or a copied question line "A. 話し合う: はなしあう"
+ANSWER_LINE_PATTERN = r"(?m)^\s*(?P<letter>[A-Za-z])\s*[.:、。]\s*(?P<answer>.*?)\s*$"
+
+
+def normalize_readings(readings: pd.Series) -> pd.Series:
+    """Normalize width, katakana and whitespace of readings (vectorized)"""
+    return (
+        readings.astype(str)
+        .str.normalize("NFKC")
+        .str.translate(KATAKANA_TO_HIRAGANA_TABLE)
+        .str.replace(r"[\s・]+", "", regex=True)
+    )
+
+
+def build_reading_lookup(quizzes: pd.DataFrame) -> pd.DataFrame:
+    """Return one row per question of every pronunciation quiz with its normalized reading
+
+    quizzes has the quiz_id and words ([[letter, formatted word], ...]) columns of
+    check_grade_book.load_quiz_windows.
+    """
+    rows = [
+        (quiz_id, letter, formatted_word)
+        for quiz_id, words in zip(quizzes["quiz_id"], quizzes["words"])
+        if isinstance(words, list)
+        for letter, formatted_word in words
+    ]
+    lookup = pd.DataFrame(rows, columns=["quiz_id", "letter", "formatted_word"])
+    readings = lookup["formatted_word"].map(get_formatted_word_reading)
+    lookup["reading"] = normalize_readings(readings)
+    lookup["manual"] = lookup["formatted_word"].map(is_katakana).astype(bool)
+    return lookup
+
+
+def parse_reading_answers(messages: pd.Series) -> pd.DataFrame:
+    """Split replies into one row per answered question (message index, student, letter)"""
+    normalized = messages.astype(str).str.normalize("NFKC")
+    student_ids = normalized.str.extract(STUDENT_ID_PATTERN)["student_id"]
+    answers = normalized.str.extractall(ANSWER_LINE_PATTERN)
+    if answers.empty:
+        return pd.DataFrame(columns=["student_id", "letter", "given_answer"])
+
+    answers = answers.droplevel("match")
+    answers["letter"] = answers["letter"].str.upper()
+    # Only the first answer to a question counts, so repeating a line earns nothing
+    index_name = answers.index.name or "index"
+    answers = (
+        answers.rename_axis(index_name)
+        .reset_index()
+        .drop_duplicates([index_name, "letter"])
+        .set_index(index_name)
+    )
+    # Keep only the reading of a copied question line
+    answers["given_answer"] = answers["answer"].str.rsplit(":", n=1).str[-1].str.strip()
+    answers["student_id"] = student_ids.reindex(answers.index)
+    answers = answers[answers["student_id"].fillna("") != ""]
+    return answers[["student_id", "letter", "given_answer"]]
+
+
+def score_partial_credit(given: List[str], readings: List[str]) -> np.ndarray:
+    """Partial credit for close answers; only the answers that are not exact get here"""
+    ratios = {
+        pair: difflib.SequenceMatcher(None, *pair).ratio()
+        for pair in set(zip(given, readings))
+    }
+    return np.array(
+        [
+            PARTIAL_CREDIT if ratios[pair] >= PARTIAL_CREDIT_RATIO else 0.0
+            for pair in zip(given, readings)
+        ],
+        dtype=float,
+    )
+
+
+def grade_reading_answers(
+    answers: pd.DataFrame, quiz_ids: pd.Series, lookup: pd.DataFrame
+) -> pd.DataFrame:
+    """Score each answer against the lookup; katakana questions get NaN points
+
+    answers comes from parse_reading_answers, quiz_ids maps a message index to its quiz.
+    """
+    graded = answers.assign(quiz_id=quiz_ids.reindex(answers.index).to_numpy())
+    index_name = graded.index.name or "index"
+    graded = (
+        graded.reset_index()
+        .merge(lookup, on=["quiz_id", "letter"], how="inner")
+        .set_index(index_name)
+    )
+    given = normalize_readings(graded["given_answer"])
+    exact = (given == graded["reading"]).to_numpy()
+
+    points = np.where(exact, FULL_CREDIT, 0.0)
+    close = ~exact & (given != "").to_numpy()
+    if close.any():
+        points[close] = score_partial_credit(
+            given[close].tolist(), graded["reading"][close].tolist()
+        )
+    graded["points"] = np.where(graded["manual"].to_numpy(), np.nan, points)
+    return graded
+
+
+def total_reading_points(graded: pd.DataFrame) -> pd.DataFrame:
+    """Sum the points of each reply and count the answers left for manual grading"""
+    grouped = graded.groupby(level=0, sort=False)
+    return pd.DataFrame(
+        {
+            "student_id": grouped["student_id"].first(),
+            "given_answer": grouped["given_answer"].agg(list).str.join(" / "),
+            "points": grouped["points"].sum(min_count=0),
+            "manual": graded["points"].isna().groupby(level=0, sort=False).sum(),
+        }
+    )
@@ -0,0 +1,127 @@
+# Standard library imports
+import random
+import argparse
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+# Local imports
+from quiz_history import QuizRecord, read_quiz_records, split_formatted_word
+from main import render_definition_quiz, render_pronunciation_quiz
+
+REVIEW_PRONOUN_QUIZ_LOCATION = r"txt_files/review_pronunciation_quiz.txt"
+REVIEW_DEF_QUIZ_LOCATION = r"txt_files/review_definition_quiz.txt"
+MAX_REVIEW_QUESTIONS = 26
+
+
+def collect_review_words(
+    records: List[QuizRecord],
+) -> Tuple[Counter, Dict[str, str], Dict[str, str]]:
+    """Count how often each word was quizzed and keep its furigana and latest definition"""
+    frequency: Counter = Counter()
+    furigana_dict = {}
+    definition_dict = {}
+    for record in records:
+        for formatted_word in record.vocab:
+            word, furigana = split_formatted_word(formatted_word)
+            frequency[word] += 1
+            furigana_dict[word] = furigana
+        for definition in record.definitions:
+            word, meaning = definition.split("：", 1)
+            definition_dict[word] = meaning
+    return frequency, furigana_dict, definition_dict
+
+
+def sample_weighted_words(frequency: Counter, questions: int, seed: int) -> List[str]:
+    """Sample words without replacement, favoring words that appeared more often"""
+    rng = random.Random(seed)
+
+    # Efraimidis-Spirakis: keep the words with the largest u ** (1 / weight)
+    keys = {word: rng.random() ** (1 / count) for word, count in frequency.items()}
+    return sorted(keys, key=keys.__getitem__, reverse=True)[:questions]
+
+
+def generate_review_quiz(
+    start_date: date,
+    end_date: date,
+    questions: int = 10,
+    seed: Optional[int] = None,
+) -> str:
+    """Generate review quizzes from the quizzes sent between two dates and return the answer key"""
+    if seed is None:
+        seed = random.randrange(2**32)
+    questions = min(questions, MAX_REVIEW_QUESTIONS)
+
+    records = read_quiz_records(start_date, end_date)
+    if not records:
+        raise ValueError(
+            f"{start_date}〜{end_date}のクイズ履歴が見つかりませんでした。"
+        )
+
+    frequency, furigana_dict, definition_dict = collect_review_words(records)
+    review_words = sample_weighted_words(frequency, questions, seed)
+    word_dict = {word: furigana_dict[word] for word in review_words}
+    word_list = [
+        f"{word}：{definition_dict[word]}"
+        for word in review_words
+        if word in definition_dict
+    ]
+
+    period = f"{start_date.strftime('%m月%d日')}〜{end_date.strftime('%m月%d日')}"
+    pronunciation_quiz = render_pronunciation_quiz(
+        "",
+        word_dict,
+        period,
+        title="復習語彙力クイズ",
+        intro="今週のNHK EASYニュース📰",
+    )
+    definition_quiz, answer = render_definition_quiz(
+        [],
+        word_dict,
+        word_list,
+        seed,
+        period,
+        title="復習単語意味クイズ",
+        intro="今週のNHK EASYニュース📰の復習です。",
+    )
+
+    with open(REVIEW_PRONOUN_QUIZ_LOCATION, "w", encoding="utf-8") as f:
+        f.write(pronunciation_quiz)
+    with open(REVIEW_DEF_QUIZ_LOCATION, "w", encoding="utf-8") as f:
+        f.write(definition_quiz)
+
+    print(f"\n復習単語意味クイズ解答：{answer}")
+    return answer
+
+
+def main() -> None:
+    """Main function"""
+    today = datetime.now().date()
+    parser = argparse.ArgumentParser(
+        description="Generate review quizzes from past pushed quizzes"
+    )
+    parser.add_argument(
+        "-s",
+        "--start",
+        type=date.fromisoformat,
+        default=today - timedelta(days=6),
+        help="first date (YYYY-MM-DD, default: 6 days ago)",
+    )
+    parser.add_argument(
+        "-e",
+        "--end",
+        type=date.fromisoformat,
+        default=today,
+        help="last date (YYYY-MM-DD, default: today)",
+    )
+    parser.add_argument(
+        "-q", "--questions", type=int, default=10, help="number of questions"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+
+    args = parser.parse_args()
+    generate_review_quiz(args.start, args.end, args.questions, args.seed)
+
+
+if __name__ == "__main__":
+    main()
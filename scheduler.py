@@ -0,0 +1,293 @@
+# Standard library imports
+import os
+import json
+import uuid
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+"""
+Scheduled delivery of messages rendered in advance. A payload is built and validated
+when it is scheduled and saved to json_files/schedule.json, so sending it at 08:00 is
+a single LINE request with no scraping or rendering:
+
+    python send_line_message.py --at 08:00   # schedule the morning announcement
+    python scheduler.py                      # send scheduled payloads when they are due
+
+The GUI runs the same loop in the background. A payload whose time passed while
+nothing was running is sent late if it is within its catch-up window, otherwise it
+is marked as missed.
+"""
+
+SCHEDULE_LOCATION = r"json_files/schedule.json"
+DEFAULT_CATCH_UP_MINUTES = 120
+MAX_SLEEP = 30.0  # seconds; also how often schedule.json is checked for changes
+RETRY_INTERVAL = 60.0
+KEPT_FINISHED_ENTRIES = 50
+
+SCHEDULED = "scheduled"
+SENT = "sent"
+MISSED = "missed"
+FAILED = "failed"
+
+Entry = Dict[str, object]
+
+
+def parse_send_time(text: str, now: Optional[datetime] = None) -> datetime:
+    """Parse "HH:MM" (the next time it comes) or "YYYY-MM-DD HH:MM" """
+    now = now or datetime.now()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    try:
+        clock_time = datetime.strptime(text, "%H:%M").time()
+    except ValueError:
+        raise ValueError(
+            f"送信時刻は HH:MM または YYYY-MM-DD HH:MM で指定してください：{text}"
+        ) from None
+    send_at = datetime.combine(now.date(), clock_time)
+    return send_at if send_at > now else send_at + timedelta(days=1)
+
+
+def render_payload(
+    texts: List[str], sticker: Optional[Tuple[str, str]] = None
+) -> List[Dict]:
+    """Build the LINE messages of a payload and check that they fit in one request"""
+    from send_line_message import MAX_MESSAGES_PER_REQUEST, build_messages
+
+    messages = [message.as_json_dict() for message in build_messages(texts, sticker)]
+    if not messages:
+        raise ValueError("送信するメッセージがありません。")
+    if len(messages) > MAX_MESSAGES_PER_REQUEST:
+        raise ValueError(
+            f"予約送信は1回のリクエスト({MAX_MESSAGES_PER_REQUEST}件)以内にしてください："
+            f"{len(messages)}件"
+        )
+    return messages
+
+
+def default_send_payload(
+    messages: List[Dict], broadcasting: bool, channel: Optional[str], retry_key: str
+) -> None:
+    """Send a rendered payload in one request"""
+    from send_line_message import send_request
+
+    send_request(messages, broadcasting, retry_key, channel)
+
+
+class Scheduler:
+    """Send the payloads of schedule.json when they are due"""
+
+    def __init__(
+        self,
+        location: str = SCHEDULE_LOCATION,
+        send_payload: Callable[..., None] = default_send_payload,
+        clock: Callable[[], datetime] = datetime.now,
+    ) -> None:
+        self.location = location
+        self.send_payload = send_payload
+        self.clock = clock
+        self.entries: List[Entry] = []
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+        self.reload()
+
+    def reload(self) -> None:
+        """Read schedule.json again if another process (e.g. --at) changed it"""
+        try:
+            stat = os.stat(self.location)
+        except FileNotFoundError:
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature == self._signature:
+                return
+            try:
+                with open(self.location, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)["entries"]
+            except (json.JSONDecodeError, KeyError) as e:
+                print(f"WARNING: {self.location} could not be read: {e!r}")
+            self._signature = signature
+
+    def save(self) -> None:
+        """Save the entries atomically, keeping only the latest finished ones"""
+        with self._lock:
+            finished = [entry for entry in self.entries if entry["status"] != SCHEDULED]
+            for entry in finished[:-KEPT_FINISHED_ENTRIES]:
+                self.entries.remove(entry)
+
+            directory = os.path.dirname(self.location)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            temp_location = f"{self.location}.tmp"
+            with open(temp_location, "w", encoding="utf-8") as f:
+                json.dump({"entries": self.entries}, f, ensure_ascii=False, indent=4)
+            os.replace(temp_location, self.location)
+            stat = os.stat(self.location)
+            self._signature = (stat.st_mtime_ns, stat.st_size)
+
+    def schedule(
+        self,
+        texts: List[str],
+        send_at: datetime,
+        name: str = "",
+        broadcasting: bool = False,
+        sticker: Optional[Tuple[str, str]] = None,
+        channel: Optional[str] = None,
+        catch_up_minutes: int = DEFAULT_CATCH_UP_MINUTES,
+    ) -> str:
+        """Render and validate a payload now and save it to be sent at send_at"""
+        entry: Entry = {
+            "id": str(uuid.uuid4()),
+            "name": name,
+            "send_at": send_at.isoformat(timespec="seconds"),
+            "messages": render_payload(texts, sticker),
+            "broadcasting": broadcasting,
+            "channel": channel,
+            "catch_up_minutes": catch_up_minutes,
+            "status": SCHEDULED,
+            "next_attempt": None,
+            "sent_at": None,
+            "last_error": "",
+        }
+        with self._lock:
+            self.reload()
+            self.entries.append(entry)
+            self.save()
+        self._wake.set()
+        return str(entry["id"])
+
+    def cancel(self, entry_id: str) -> bool:
+        """Remove a scheduled payload and return whether it was found"""
+        with self._lock:
+            self.reload()
+            for entry in self.entries:
+                if entry["id"] == entry_id and entry["status"] == SCHEDULED:
+                    self.entries.remove(entry)
+                    self.save()
+                    return True
+        return False
+
+    def get_due_time(self, entry: Entry) -> datetime:
+        """Return when an entry should be sent next (later after a failed attempt)"""
+        return datetime.fromisoformat(str(entry["next_attempt"] or entry["send_at"]))
+
+    def send_entry(self, entry: Entry, now: datetime) -> None:
+        """Send one due entry, or mark it as missed if it is past its catch-up window"""
+        from outbox import classify_error
+
+        send_at = datetime.fromisoformat(str(entry["send_at"]))
+        deadline = send_at + timedelta(minutes=int(entry["catch_up_minutes"]))  # type: ignore
+        if now > deadline:
+            entry["status"] = MISSED
+            print(
+                f"Missed scheduled message {entry['name'] or entry['id']} ({send_at})"
+            )
+            return
+
+        try:
+            self.send_payload(
+                entry["messages"], entry["broadcasting"], entry["channel"], entry["id"]
+            )
+        except Exception as e:
+            retry, message = classify_error(e)
+            entry["last_error"] = message
+            if retry:
+                next_attempt = now + timedelta(seconds=RETRY_INTERVAL)
+                entry["next_attempt"] = next_attempt.isoformat(timespec="seconds")
+            else:
+                entry["status"] = FAILED
+            print(f"Scheduled message {entry['name'] or entry['id']}: {message}")
+            return
+        entry["status"] = SENT
+        entry["sent_at"] = now.isoformat(timespec="seconds")
+        entry["last_error"] = ""
+
+    def run_pending(self) -> float:
+        """Send every due entry and return the seconds until the next one"""
+        with self._lock:
+            self.reload()
+            now = self.clock()
+            scheduled = [
+                entry for entry in self.entries if entry["status"] == SCHEDULED
+            ]
+            due = [entry for entry in scheduled if self.get_due_time(entry) <= now]
+            for entry in sorted(due, key=self.get_due_time):
+                self.send_entry(entry, now)
+            if due:
+                self.save()
+
+            waiting = [
+                (self.get_due_time(entry) - now).total_seconds()
+                for entry in self.entries
+                if entry["status"] == SCHEDULED
+            ]
+        return max(min(waiting, default=float("inf")), 0.0)
+
+    def run(self) -> None:
+        """Background loop: sleep until the next entry is due or the file changes"""
+        while not self._stopped:
+            self._wake.clear()
+            try:
+                delay = self.run_pending()
+            except Exception as e:
+                print(f"WARNING: scheduler error: {e!r}")
+                delay = MAX_SLEEP
+            self._wake.wait(min(delay, MAX_SLEEP))
+
+    def start(self) -> None:
+        """Start the background loop if it is not running"""
+        with self._lock:
+            self._stopped = False
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self.run, daemon=True)
+                self._worker.start()
+
+    def stop(self) -> None:
+        """Stop the background loop"""
+        self._stopped = True
+        self._wake.set()
+
+
+# One scheduler for the whole process
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Return the process-wide scheduler with its loop running"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        _scheduler.start()
+        return _scheduler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send scheduled LINE messages")
+    parser.add_argument(
+        "-l", "--list", action="store_true", help="list the schedule and exit"
+    )
+    args = parser.parse_args()
+
+    scheduler = Scheduler()
+    if args.list:
+        for scheduled_entry in scheduler.entries:
+            print(
+                f"{scheduled_entry['send_at']} {scheduled_entry['status']:9} "
+                f"{scheduled_entry['name'] or scheduled_entry['id']}"
+            )
+    else:
+        print(
+            f"Waiting for scheduled messages in {scheduler.location} (Ctrl+C to quit)"
+        )
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            pass
@@ -2,17 +2,23 @@
 import os
 import sys
 import json
+import time
+import asyncio
+import argparse
 import datetime
-from typing import Tuple, Optional
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Tuple, Optional
 
-# Third-party imports
+# Third-party imports (requests and linebot are imported when a message is sent)
 import locale
-import requests
-from linebot import LineBotApi
-from linebot.models import TextSendMessage, StickerSendMessage
-from linebot.exceptions import LineBotApiError
 
 TOKEN_ID_FILE = r"./json_files/secrets.json"
+ROSTER_FILE = r"./json_files/roster.json"
+
+# e.g. http://localhost:8080 to send to line_stub_server.py instead of api.line.me
+LINE_API_ENDPOINT = os.environ.get("LINE_API_ENDPOINT")
 
 # Check if the directory exists, and create it if it doesn't
 directory = os.path.dirname(TOKEN_ID_FILE)
@@ -28,6 +34,17 @@ if not os.path.isfile(TOKEN_ID_FILE):
 
 NEWS_ARTICLE_TXT_LOCATION = r"txt_files/news_article.txt"
 
+# LINE Messaging API limits
+MAX_MESSAGES_PER_REQUEST = 5
+MAX_TEXT_LENGTH = 5000
+MAX_MULTICAST_RECIPIENTS = 500
+MULTICAST_REQUESTS_PER_SECOND = 100  # LINE allows 200
+MULTICAST_WORKERS = 8
+CHANNEL_CONCURRENCY = 4  # requests in flight per channel
+
+_line_clients: Dict[Optional[str], object] = {}
+_line_client_lock = threading.Lock()
+
 
 def read_secrets() -> Tuple:
     """Read the secrets from the secrets.json file"""
@@ -38,6 +55,109 @@ def read_secrets() -> Tuple:
     return CHANNEL_ACCESS_TOKEN, USER_ID
 
 
+def get_line_client(channel: Optional[str] = None):
+    """Return the process-wide LINE client of a channel (secrets are cached until the file changes)"""
+    with _line_client_lock:
+        if channel not in _line_clients:
+            from line_client import LineClient
+
+            _line_clients[channel] = LineClient(TOKEN_ID_FILE, LINE_API_ENDPOINT, channel)
+        return _line_clients[channel]
+
+
+def load_channels(token_file: str = TOKEN_ID_FILE) -> List[str]:
+    """Return the names of the LINE channels listed in secrets.json
+
+    {"channels": [{"name": "初級", "channel_access_token": "...", "user_id": "U..."}, ...]}
+    """
+    with open(token_file, "r", encoding="utf-8") as file:
+        secrets = json.load(file)
+    return [channel["name"] for channel in secrets.get("channels", [])]
+
+
+def get_text_length(text: str) -> int:
+    """Return the length of a text as counted by LINE (UTF-16 code units, 📰 is 2)"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def split_text(text: str, max_length: int = MAX_TEXT_LENGTH) -> List[str]:
+    """Split a text into parts within the LINE limit, preferably between lines"""
+    parts: List[str] = []
+    current = ""
+    for line in text.splitlines(keepends=True):
+        # A single line over the limit is cut wherever it has to be
+        while get_text_length(line) > max_length:
+            if current:
+                parts.append(current)
+                current = ""
+            cut = max_length
+            while get_text_length(line[:cut]) > max_length:
+                cut -= 1
+            parts.append(line[:cut])
+            line = line[cut:]
+
+        if current and get_text_length(current + line) > max_length:
+            parts.append(current)
+            current = ""
+        current += line
+    if current:
+        parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def build_messages(texts: List[str], sticker: Optional[Tuple[str, str]] = None) -> List:
+    """Build LINE text messages within the length limit and an optional sticker"""
+    from linebot.models import TextSendMessage, StickerSendMessage
+
+    messages: List = [
+        TextSendMessage(text=part) for text in texts for part in split_text(text)
+    ]
+    if sticker:
+        package_id, sticker_id = sticker
+        messages.append(StickerSendMessage(package_id=package_id, sticker_id=sticker_id))
+    return messages
+
+
+def send_request(
+    messages: List,
+    broadcasting=False,
+    retry_key: Optional[str] = None,
+    channel: Optional[str] = None,
+    to: Optional[List[str]] = None,
+) -> None:
+    """Send up to 5 messages in one request; a retried request LINE already accepted counts as sent"""
+    from linebot.exceptions import LineBotApiError
+
+    try:
+        get_line_client(channel).send(messages, broadcasting, retry_key, to)
+    except LineBotApiError as e:
+        # 409: a request with this retry key was already accepted
+        if not (retry_key and e.status_code == 409):
+            raise
+
+
+def send_messages(
+    texts: List[str],
+    broadcasting=False,
+    sticker: Optional[Tuple[str, str]] = None,
+) -> int:
+    """Send texts and an optional (package_id, sticker_id) sticker in as few requests as possible"""
+    import requests
+    from linebot.exceptions import LineBotApiError
+
+    messages = build_messages(texts, sticker)
+    request_count = 0
+    try:
+        for start in range(0, len(messages), MAX_MESSAGES_PER_REQUEST):
+            send_request(messages[start : start + MAX_MESSAGES_PER_REQUEST], broadcasting)
+            request_count += 1
+    except LineBotApiError:
+        raise PermissionError("認証に失敗しました。アクセストークンが有効であることを確認してください。") from None
+    except requests.exceptions.Timeout as e:
+        raise ConnectionError(f"Connection timeout error: {e}") from None
+    return request_count
+
+
 def send_message(
     message_type: str,
     content: Optional[str] = None,
@@ -46,32 +166,180 @@ def send_message(
     sticker_id=None,
 ) -> None:
     """Login to LINE bot API and send text message"""
-    CHANNEL_ACCESS_TOKEN, USER_ID = read_secrets()
-    line_bot_api = LineBotApi(CHANNEL_ACCESS_TOKEN)
-    try:
-        if not broadcasting:
-            if message_type == "text":
-                line_bot_api.push_message(
-                    USER_ID, TextSendMessage(text=content))
-            elif message_type == "stamp":
-                line_bot_api.push_message(
-                    USER_ID,
-                    StickerSendMessage(package_id=package_id,
-                                       sticker_id=sticker_id),
-                )
-        else:
-            if message_type == "text":
-                line_bot_api.broadcast(TextSendMessage(text=content))
-            elif message_type == "stamp":
-                line_bot_api.broadcast(
-                    StickerSendMessage(package_id=package_id,
-                                       sticker_id=sticker_id)
+    if message_type == "text":
+        send_messages([str(content)], broadcasting=broadcasting)
+    elif message_type == "stamp":
+        send_messages([], broadcasting=broadcasting, sticker=(package_id, sticker_id))
+
+
+class BatchResult(NamedTuple):
+    """Result of sending the messages to one batch of recipients"""
+
+    batch_index: int
+    recipients: int
+    requests: int
+    success: bool
+    error: str
+    elapsed: float
+
+
+def load_roster(
+    class_names: Optional[List[str]] = None, roster_file: str = ROSTER_FILE
+) -> List[str]:
+    """Return the unique user IDs of the given classes ({"class name": ["U...", ...]})"""
+    with open(roster_file, "r", encoding="utf-8") as file:
+        roster: Dict[str, List[str]] = json.load(file)
+    if class_names is None:
+        class_names = list(roster)
+
+    missing = [name for name in class_names if name not in roster]
+    if missing:
+        raise KeyError(f"名簿にないクラスです：{', '.join(missing)}")
+    return list(dict.fromkeys(uid for name in class_names for uid in roster[name]))
+
+
+def multicast_messages(
+    texts: List[str],
+    user_ids: List[str],
+    sticker: Optional[Tuple[str, str]] = None,
+    workers: int = MULTICAST_WORKERS,
+    requests_per_second: float = MULTICAST_REQUESTS_PER_SECOND,
+) -> List[BatchResult]:
+    """Send messages to many users in concurrent multicast batches of up to 500 users"""
+    from rate_limiter import TokenBucket
+
+    messages = build_messages(texts, sticker)
+    line_bot_api, _ = get_line_client().get_api()
+    bucket = TokenBucket(requests_per_second, capacity=workers)
+    recipient_batches = [
+        user_ids[start : start + MAX_MULTICAST_RECIPIENTS]
+        for start in range(0, len(user_ids), MAX_MULTICAST_RECIPIENTS)
+    ]
+
+    def send_batch(batch_index: int) -> BatchResult:
+        """Send every message to one batch of recipients; errors are reported, not raised"""
+        recipients = recipient_batches[batch_index]
+        start_time = time.perf_counter()
+        request_count = 0
+        try:
+            for start in range(0, len(messages), MAX_MESSAGES_PER_REQUEST):
+                bucket.acquire()
+                line_bot_api.multicast(
+                    recipients, messages[start : start + MAX_MESSAGES_PER_REQUEST]
                 )
-    except LineBotApiError:
-        raise PermissionError("認証に失敗しました。アクセストークンが有効であることを確認してください。") from None
-    except requests.exceptions.ConnectTimeout as ct:
-        print(f"Connection timeout error: {ct}")
-        sys.exit(1)
+                request_count += 1
+        except Exception as e:
+            return BatchResult(
+                batch_index,
+                len(recipients),
+                request_count,
+                False,
+                repr(e),
+                time.perf_counter() - start_time,
+            )
+        return BatchResult(
+            batch_index,
+            len(recipients),
+            request_count,
+            True,
+            "",
+            time.perf_counter() - start_time,
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(send_batch, range(len(recipient_batches))))
+
+
+class ChannelStats(NamedTuple):
+    """Result and request latencies (seconds) of sending to one channel"""
+
+    channel: str
+    requests: int
+    success: bool
+    error: str
+    mean_latency: float
+    median_latency: float
+    max_latency: float
+
+
+def summarize_channel(channel: str, latencies: List[float], error: str = "") -> ChannelStats:
+    """Summarize the request latencies of one channel"""
+    return ChannelStats(
+        channel,
+        len(latencies),
+        not error,
+        error,
+        statistics.fmean(latencies) if latencies else 0.0,
+        statistics.median(latencies) if latencies else 0.0,
+        max(latencies, default=0.0),
+    )
+
+
+async def dispatch_to_channels(
+    channel_texts: Dict[str, List[str]],
+    broadcasting=False,
+    sticker: Optional[Tuple[str, str]] = None,
+    channel_recipients: Optional[Dict[str, List[str]]] = None,
+    concurrency: int = CHANNEL_CONCURRENCY,
+) -> Dict[str, ChannelStats]:
+    """Send each channel its own texts, all channels at once
+
+    A channel with recipients multicasts to them in batches of 500 users, otherwise it
+    pushes to its user_id (or broadcasts). The blocking LINE requests run in threads
+    and a semaphore per channel limits the requests in flight to each channel. The
+    requests of one batch are sent in order so that its messages arrive in order.
+    """
+    channel_recipients = channel_recipients or {}
+    semaphores = {channel: asyncio.Semaphore(concurrency) for channel in channel_texts}
+    latencies: Dict[str, List[float]] = {channel: [] for channel in channel_texts}
+    errors: Dict[str, str] = {}
+
+    async def send_batch(channel: str, messages: List, recipients: Optional[List[str]]) -> None:
+        for start in range(0, len(messages), MAX_MESSAGES_PER_REQUEST):
+            async with semaphores[channel]:
+                start_time = time.perf_counter()
+                try:
+                    await asyncio.to_thread(
+                        send_request,
+                        messages[start : start + MAX_MESSAGES_PER_REQUEST],
+                        broadcasting,
+                        None,
+                        channel,
+                        recipients,
+                    )
+                except Exception as e:
+                    errors.setdefault(channel, repr(e))
+                    return
+                latencies[channel].append(time.perf_counter() - start_time)
+
+    batches = []
+    for channel, texts in channel_texts.items():
+        messages = build_messages(texts, sticker)
+        user_ids = channel_recipients.get(channel)
+        if not user_ids:
+            batches.append(send_batch(channel, messages, None))
+            continue
+        for start in range(0, len(user_ids), MAX_MULTICAST_RECIPIENTS):
+            recipients = user_ids[start : start + MAX_MULTICAST_RECIPIENTS]
+            batches.append(send_batch(channel, messages, recipients))
+    await asyncio.gather(*batches)
+
+    return {
+        channel: summarize_channel(channel, latencies[channel], errors.get(channel, ""))
+        for channel in channel_texts
+    }
+
+
+def send_to_channels(
+    channel_texts: Dict[str, List[str]],
+    broadcasting=False,
+    sticker: Optional[Tuple[str, str]] = None,
+    channel_recipients: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, ChannelStats]:
+    """Blocking wrapper of dispatch_to_channels for scripts and the GUI threads"""
+    return asyncio.run(
+        dispatch_to_channels(channel_texts, broadcasting, sticker, channel_recipients)
+    )
 
 
 def get_vocab() -> str:
@@ -83,14 +351,24 @@ def get_vocab() -> str:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send the morning announcement")
+    parser.add_argument(
+        "--at", metavar="TIME",
+        help='schedule it for "HH:MM" or "YYYY-MM-DD HH:MM" instead of sending now (see scheduler.py)')
+    args = parser.parse_args()
+
     # Set locale to Japanese
     if sys.platform.startswith("win32"):
         locale.setlocale(locale.LC_CTYPE, "Japanese_Japan.932")
     else:
         locale.setlocale(locale.LC_TIME, "ja_JP.UTF-8")
 
-    # Get today's date and day of the week
+    # Get the date and day of the week of the day it is sent
     now = datetime.datetime.now()
+    if args.at:
+        from scheduler import parse_send_time
+
+        now = parse_send_time(args.at, now)
     week_list = ["月曜日", "火曜日", "水曜日", "木曜日", "金曜日", "土曜日", "日曜日"]
     day_of_week = week_list[now.weekday()][0]
     today = now.strftime(f"%Y年%m月%d日 ({day_of_week})")
@@ -99,8 +377,26 @@ if __name__ == "__main__":
     announcement = f"【重要】{today}\n\nおはようございます！今日は試験の日です✍️\n頑張ってください！"
     answers = f"お疲れ様です。昨日のニュース📰の単語です。\n\n{get_vocab()}"
 
-    # Sending announcement and sticker
+    # Sending announcement and sticker in one request (to every channel at once if
+    # secrets.json lists several channels)
     """See https://developers.line.biz/ja/docs/messaging-api/sticker-list/ for valid sticker IDs"""
-    send_message("text", announcement, broadcasting=False)
-    send_message("stamp", broadcasting=False,
-                 package_id="6359", sticker_id="11069859")
+    channels = load_channels()
+    if args.at:
+        # Rendered and validated now; scheduler.py sends it in one request at that time
+        from scheduler import Scheduler
+
+        scheduler = Scheduler()
+        for channel in channels or [None]:
+            scheduler.schedule([announcement], now, name=f"朝のお知らせ {channel or ''}".strip(),
+                                 sticker=("6359", "11069859"), channel=channel)
+        print(f"Scheduled for {now:%Y-%m-%d %H:%M}. Keep scheduler.py or the GUI running.")
+    elif channels:
+        channel_stats = send_to_channels(
+            {channel: [announcement] for channel in channels}, sticker=("6359", "11069859"))
+        for stats in channel_stats.values():
+            status = "OK" if stats.success else f"NG {stats.error}"
+            print(f"{stats.channel}: {stats.requests} requests, "
+                  f"mean {stats.mean_latency:.3f}s, max {stats.max_latency:.3f}s {status}")
+    else:
+        send_messages([announcement], broadcasting=False,
+                      sticker=("6359", "11069859"))
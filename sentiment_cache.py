@@ -0,0 +1,85 @@
+# Standard library imports
+import os
+import json
+import hashlib
+from typing import List, Optional, Tuple
+
+SENTIMENT_CACHE_FOLDER = r"txt_files/sentiment_cache"
+MAX_SENTIMENT_CACHE_BYTES = 5 * 1024**2
+
+Scores = List[float]
+
+
+def get_sentiment_cache_key(text: str, model_name: str, backend: str) -> str:
+    """Return the cache key of the sentiment scores of a text"""
+    raw_key = f"{model_name}|{backend}|{text}"
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+def get_cache_path(key: str, folder: str = SENTIMENT_CACHE_FOLDER) -> str:
+    """Return the file path of cached sentiment scores"""
+    return os.path.join(folder, f"{key}.json")
+
+
+def load_cached_scores(
+    key: str, folder: str = SENTIMENT_CACHE_FOLDER
+) -> Optional[Tuple[Scores, List[Scores]]]:
+    """Return the cached overall and paragraph scores, or None on a cache miss"""
+    path = get_cache_path(key, folder)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    # Mark the entry as recently used so that eviction removes older ones first
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data["scores"], data["paragraph_scores"]
+
+
+def save_cached_scores(
+    key: str,
+    scores: Scores,
+    paragraph_scores: List[Scores],
+    folder: str = SENTIMENT_CACHE_FOLDER,
+    max_bytes: int = MAX_SENTIMENT_CACHE_BYTES,
+) -> None:
+    """Save sentiment scores to the cache and evict the least recently used entries"""
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    # Write to a temporary file first so that a crash never leaves a broken entry
+    path = get_cache_path(key, folder)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"scores": scores, "paragraph_scores": paragraph_scores}, f)
+    os.replace(temp_path, path)
+
+    evict_cached_scores(folder, max_bytes)
+
+
+def evict_cached_scores(
+    folder: str = SENTIMENT_CACHE_FOLDER, max_bytes: int = MAX_SENTIMENT_CACHE_BYTES
+) -> int:
+    """Delete the least recently used entries until the cache fits in max_bytes"""
+    entries = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.endswith(".json"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Already evicted by another process
+        total_bytes -= size
+        removed += 1
+    return removed
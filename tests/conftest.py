@@ -0,0 +1,47 @@
+# Standard library imports
+import os
+import sys
+import json
+
+# Third-party imports
+import pytest
+
+# The modules live at the top of the repository, next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Local imports
+from line_stub_server import start_stub_server
+
+LINE_SECRETS = {
+    "channel_access_token": "test-token",
+    "user_id": "U0000",
+    "channels": [
+        {"name": "初級", "channel_access_token": "beginner-token", "user_id": "U0001"},
+        {"name": "上級", "channel_access_token": "advanced-token", "user_id": "U0002"},
+        # The template's empty token: LINE answers 401
+        {"name": "未設定", "channel_access_token": "", "user_id": "U0003"},
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def working_directory(tmp_path, monkeypatch):
+    """Run every test in its own folder; the modules write to relative paths"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def line_stub(tmp_path, monkeypatch):
+    """Send LINE requests to line_stub_server with test secrets"""
+    import send_line_message
+
+    token_file = tmp_path / "secrets.json"
+    token_file.write_text(json.dumps(LINE_SECRETS), encoding="utf-8")
+    server = start_stub_server()
+    monkeypatch.setattr(send_line_message, "LINE_API_ENDPOINT", server.endpoint)
+    monkeypatch.setattr(send_line_message, "TOKEN_ID_FILE", str(token_file))
+    monkeypatch.setattr(send_line_message, "_line_clients", {})
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,125 @@
+# Standard library imports
+from datetime import datetime
+
+# Third-party imports
+import pandas as pd
+import pytest
+
+# Local imports
+from check_grade_book import process_messages, update_grade_book
+from fake_worksheet import FakeWorksheet
+
+MESSAGES = pd.DataFrame(
+    {
+        "Sent Time": pd.to_datetime(["2023-04-08 21:00"] * 4),
+        "Message": ["S001\nABCDA", "S002\nABCDB", "S003\nABCDA", "S003 ABCDA"],
+    },
+    index=pd.Index([2, 3, 4, 5], name="row_number"),
+)
+
+
+@pytest.fixture
+def df_result():
+    return process_messages(MESSAGES, "ABCDA")
+
+
+def test_process_messages(df_result):
+    assert df_result["student_id"].tolist() == ["S001", "S002", "S003"]
+    assert df_result["points"].tolist() == [5, 4, 5]
+
+
+def test_grade_book_is_read_once_and_written_in_batches(df_result, tmp_path):
+    sheet = FakeWorksheet(
+        [["学籍番号", "2023/04/07"], ["S001", 3], ["S002", 4], ["S004", 2]]
+    )
+    update_grade_book(
+        df_result,
+        datetime(2023, 4, 8, 22, 0),
+        sheet,
+        str(tmp_path / "grade_book.sqlite3"),
+    )
+
+    # One read, one batch update for existing students, one append for new ones
+    assert dict(sheet.calls) == {
+        "get_all_values": 1,
+        "batch_update": 1,
+        "append_rows": 1,
+    }
+    assert sheet.get_all_values() == [
+        ["学籍番号", "2023/04/07", "2023/04/08"],
+        ["S001", "3", "5"],
+        ["S002", "4", "4"],
+        ["S004", "2", ""],
+        ["S003", "", "5"],
+    ]
+
+
+def test_regrading_does_not_write_again(df_result, tmp_path):
+    sheet = FakeWorksheet([["学籍番号"]])
+    location = str(tmp_path / "grade_book.sqlite3")
+    update_grade_book(df_result, datetime(2023, 4, 8, 22, 0), sheet, location)
+    sheet.calls.clear()
+    update_grade_book(df_result, datetime(2023, 4, 8, 22, 0), sheet, location)
+
+    assert dict(sheet.calls) == {"get_all_values": 1}
+
+
+def test_reading_scores_above_the_question_count_are_capped(monkeypatch, capsys):
+    import check_grade_book
+    from reading_grader import total_reading_points
+
+    quizzes = pd.DataFrame(
+        {
+            "quiz_id": ["q1"],
+            "sent_time": pd.to_datetime(["2023-04-08 20:00"]),
+            "quiz_type": ["読み方クイズ"],
+            "answer": [None],
+            "words": [[["A", "政府(せいふ)"], ["B", "人々(ひとびと)"]]],
+            "url": [""],
+        }
+    )
+    messages = pd.DataFrame(
+        {
+            "Sent Time": pd.to_datetime(["2023-04-08 21:00"] * 2),
+            "Message": ["S001\nA. せいふ\nB. ひとびと", "S002\nA. せいふ"],
+        },
+        index=pd.Index([2, 3], name="row_number"),
+    )
+
+    def inflated_totals(graded):
+        totals = total_reading_points(graded)
+        totals.loc[2, "points"] += 10  # e.g. a grading bug or a malformed reply
+        return totals
+
+    monkeypatch.setattr(check_grade_book, "total_reading_points", inflated_totals)
+    graded = check_grade_book.grade_all_quizzes(messages, quizzes)
+
+    assert graded["points"].tolist() == [2.0, 1.0]
+    assert "S001" in capsys.readouterr().out
+
+
+def test_answers_go_to_the_quiz_of_their_type():
+    from check_grade_book import grade_all_quizzes
+
+    # The definition quiz is still open when the pronunciation quiz is sent
+    quizzes = pd.DataFrame(
+        {
+            "quiz_id": ["q1", "q2"],
+            "sent_time": pd.to_datetime(["2023-04-08 20:00", "2023-04-08 20:30"]),
+            "quiz_type": ["単語意味クイズ", "読み方クイズ"],
+            "answer": ["ABCDA", None],
+            "words": [None, [["A", "政府(せいふ)"], ["B", "人々(ひとびと)"]]],
+            "url": ["", ""],
+        }
+    )
+    messages = pd.DataFrame(
+        {
+            "Sent Time": pd.to_datetime(["2023-04-08 21:00"] * 2),
+            "Message": ["S001\nABCDA", "S001\nA. せいふ\nB. ひとびと"],
+        },
+        index=pd.Index([2, 3], name="row_number"),
+    )
+    graded = grade_all_quizzes(messages, quizzes)
+
+    assert graded["quiz_id"].tolist() == ["q1", "q2"]
+    assert graded["points"].tolist() == [5, 2]
@@ -0,0 +1,144 @@
+# Standard library imports
+import re
+import random
+from typing import List
+
+# Third-party imports
+import pytest
+
+# Local imports
+from furigana import (
+    RubyToken,
+    format_ruby_tokens,
+    get_base_text,
+    get_formatted_word_reading,
+    get_furigana,
+    parse_ruby_tokens,
+)
+
+"""
+Property tests of the ruby parser over generated dicWin markup: whatever the markup
+looks like, parsing keeps the text and readings in order, and the formatted word
+splits back into the tokens it was formatted from.
+"""
+
+KANJI = "話合政府接種人々日本語東京都会議"
+HIRAGANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+KATAKANA = "アイウエオカキクケコサシスセソタチツテトワクチンコロナウイルス"
+SPACES = ["", " ", "\n", "\n    "]
+SEEDS = range(200)
+
+# 話(はな) or し: the inverse of format_ruby_tokens for kanji bases and kana text
+FORMATTED_TOKEN_PATTERN = re.compile(f"([{KANJI}]+)\\(([^)]*)\\)|([^{KANJI}(]+)")
+
+
+def random_text(rng: random.Random, characters: str) -> str:
+    return "".join(rng.choice(characters) for _ in range(rng.randint(1, 4)))
+
+
+def random_tokens(rng: random.Random) -> List[RubyToken]:
+    """Kanji with a hiragana reading, or kana text without one"""
+    tokens = []
+    for _ in range(rng.randint(1, 6)):
+        if rng.random() < 0.5:
+            tokens.append((random_text(rng, KANJI), random_text(rng, HIRAGANA)))
+        else:
+            tokens.append((random_text(rng, HIRAGANA + KATAKANA), ""))
+    return tokens
+
+
+def to_markup(rng: random.Random, tokens: List[RubyToken]) -> str:
+    """Write tokens as NHK ruby markup with random whitespace, rp fallbacks and tags"""
+    parts = []
+    for base, reading in tokens:
+        space = rng.choice(SPACES)
+        if reading:
+            rp = ("<rp>(</rp>", "<rp>)</rp>") if rng.random() < 0.3 else ("", "")
+            parts.append(
+                f"<ruby>{space}{base}{rp[0]}<rt>{reading}{space}</rt>{rp[1]}</ruby>"
+            )
+        elif rng.random() < 0.2:
+            parts.append(f"<span>{base}</span>{space}")
+        else:
+            parts.append(f"{base}{space}")
+    return f'<a class="dicWin" id="id-0000">{"".join(parts)}</a>'
+
+
+def merge_tokens(tokens: List[RubyToken]) -> List[RubyToken]:
+    """Adjacent rubies, and adjacent plain text, become one token"""
+    merged: List[RubyToken] = []
+    for base, reading in tokens:
+        if merged and bool(merged[-1][1]) == bool(reading):
+            previous_base, previous_reading = merged.pop()
+            base, reading = previous_base + base, previous_reading + reading
+        merged.append((base, reading))
+    return merged
+
+
+def split_formatted_word(formatted_word: str) -> List[RubyToken]:
+    return [
+        (ruby_base, reading) if ruby_base else (text, "")
+        for ruby_base, reading, text in FORMATTED_TOKEN_PATTERN.findall(formatted_word)
+    ]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_parse_markup_round_trip(seed):
+    rng = random.Random(seed)
+    tokens = random_tokens(rng)
+    assert parse_ruby_tokens(to_markup(rng, tokens)) == merge_tokens(tokens)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_format_split_parse_round_trip(seed):
+    rng = random.Random(seed)
+    tokens = random_tokens(rng)
+    parsed = parse_ruby_tokens(to_markup(rng, tokens))
+    formatted_word = format_ruby_tokens(parsed)
+
+    assert split_formatted_word(formatted_word) == parsed
+    assert get_base_text(parsed) == "".join(base for base, _ in tokens)
+    assert get_formatted_word_reading(formatted_word) == "".join(
+        reading or base for base, reading in tokens
+    )
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_furigana_has_one_reading_per_ruby(seed):
+    rng = random.Random(seed)
+    parsed = parse_ruby_tokens(to_markup(rng, random_tokens(rng)))
+    rubies = [reading for _, reading in parsed if reading]
+    furigana = get_furigana(parsed)
+    assert (furigana.split(" ") if furigana else []) == rubies
+
+
+@pytest.mark.parametrize(
+    "markup, formatted_word, furigana",
+    [
+        (
+            "<ruby>話<rt>はな</rt></ruby>し<ruby>合<rt>あ</rt></ruby>う",
+            "話(はな)し合(あ)う",
+            "はな あ",
+        ),
+        (
+            "<ruby>東<rt>とう</rt></ruby><ruby>京<rt>きょう</rt></ruby>",
+            "東京(とうきょう)",
+            "とうきょう",
+        ),
+        (
+            "ワクチン<ruby>接種<rt>せっしゅ</rt></ruby>",
+            "ワクチン接種(せっしゅ)",
+            "せっしゅ",
+        ),
+        (
+            "<ruby>政府<rp>(</rp><rt>せいふ</rt><rp>)</rp></ruby>",
+            "政府(せいふ)",
+            "せいふ",
+        ),
+        ("コロナウイルス", "コロナウイルス", ""),
+    ],
+)
+def test_known_entries(markup, formatted_word, furigana):
+    tokens = parse_ruby_tokens(f'<a class="dicWin">{markup}</a>')
+    assert format_ruby_tokens(tokens) == formatted_word
+    assert get_furigana(tokens) == furigana
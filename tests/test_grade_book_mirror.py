@@ -0,0 +1,108 @@
+# Third-party imports
+import pandas as pd
+import pytest
+
+# Local imports
+from fake_worksheet import FakeWorksheet
+from grade_book_mirror import GradeBookMirror
+
+
+@pytest.fixture
+def sheet():
+    return FakeWorksheet([["学籍番号", "2023/04/07"], ["S001", 3], ["S002", 4]])
+
+
+@pytest.fixture
+def mirror(sheet, tmp_path):
+    mirror = GradeBookMirror(sheet, str(tmp_path / "grade_book.sqlite3"))
+    yield mirror
+    mirror.close()
+
+
+def results(points_by_student):
+    return pd.DataFrame(
+        {
+            "student_id": list(points_by_student),
+            "points": list(points_by_student.values()),
+        }
+    )
+
+
+def test_points_are_stored_as_numbers(sheet, mirror):
+    mirror.pull()
+    mirror.record_results(results({"S001": 5, "S003": 2.5}), "2023/04/08")
+    mirror.push()
+
+    values = sheet.get_values(value_render_option="UNFORMATTED_VALUE")
+    assert values[1] == ["S001", 3, 5]
+    # A new student is appended; their points must count in SUM and AVERAGE
+    assert values[3] == ["S003", "", 2.5]
+
+
+def test_second_sync_is_a_no_op(sheet, mirror):
+    mirror.record_results(results({"S001": 5, "S003": 2}), "2023/04/08")
+    report = mirror.sync()
+    assert report.pushed == [("S001", "2023/04/08"), ("S003", "2023/04/08")]
+    writes = sheet.calls["batch_update"] + sheet.calls["append_rows"]
+
+    report = mirror.sync()
+    assert report == ([], [], [])
+    assert sheet.calls["batch_update"] + sheet.calls["append_rows"] == writes
+    assert sheet.calls["get_all_values"] == 2
+
+
+def test_first_recorded_answer_is_kept(mirror):
+    mirror.pull()
+    assert mirror.record_results(results({"S001": 5}), "2023/04/08") == 1
+    assert mirror.record_results(results({"S001": 1}), "2023/04/08") == 0
+    assert mirror.get_grades().loc["S001", "2023/04/08"] == 5
+
+
+def test_sheet_edits_are_pulled(sheet, mirror):
+    mirror.sync()
+    # A teacher corrects a grade and clears another in the sheet
+    sheet.update_cell(2, 2, 4)
+    sheet.update_cell(3, 2, "")
+
+    report = mirror.sync()
+    assert report.pulled == [("S001", "2023/04/07"), ("S002", "2023/04/07")]
+    assert report.pushed == []
+    grades = mirror.get_grades()
+    assert grades.loc["S001", "2023/04/07"] == 4
+    assert "S002" not in grades.index
+
+
+def test_mirror_changes_are_pushed(sheet, mirror):
+    mirror.sync()
+    with mirror.connection:
+        mirror.connection.execute(
+            "UPDATE grades SET points = '5' WHERE student_id = 'S002'"
+        )
+
+    report = mirror.sync()
+    assert report.pushed == [("S002", "2023/04/07")]
+    assert sheet.values[2] == ["S002", "5"]
+
+
+def test_conflicts_keep_the_mirror_value(sheet, mirror):
+    mirror.sync()
+    sheet.update_cell(2, 2, 1)  # Changed in the sheet
+    with mirror.connection:  # and in the mirror since the last sync
+        mirror.connection.execute(
+            "UPDATE grades SET points = '5' WHERE student_id = 'S001'"
+        )
+
+    report = mirror.sync()
+    assert report.conflicts == [("S001", "2023/04/07")]
+    assert report.pushed == [("S001", "2023/04/07")]
+    assert sheet.values[1] == ["S001", "5"]
+
+
+def test_reports_averages_and_missing_submissions(mirror):
+    mirror.pull()
+    mirror.record_results(results({"S001": 5}), "2023/04/08")
+
+    averages = mirror.student_averages()
+    assert averages.loc["S001", "submissions"] == 2
+    assert averages.loc["S001", "average"] == 4.0
+    assert mirror.missing_submissions().values.tolist() == [["S002", "2023/04/08"]]
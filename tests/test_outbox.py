@@ -0,0 +1,127 @@
+# Third-party imports
+import pytest
+
+# Local imports
+from outbox import FAILED, MAX_ATTEMPTS, PENDING, SENT, Outbox, get_retry_key
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class LineError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class FakeSender:
+    """send_request that raises the queued errors first, then succeeds
+
+    Requests from crash_at on raise ConnectionError, as if the app was closed.
+    """
+
+    def __init__(self, errors=(), request_count: int = 1, crash_at=None) -> None:
+        self.errors = list(errors)
+        self.request_count = request_count
+        self.crash_at = crash_at
+        self.calls = []
+
+    def __call__(self, texts, sticker, broadcasting, request_index, retry_key) -> int:
+        self.calls.append((request_index, retry_key))
+        if self.crash_at is not None and request_index >= self.crash_at:
+            raise ConnectionError("app closed")
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.request_count
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_outbox(tmp_path, sender, clock) -> Outbox:
+    # rng() = 1.0: the backoff is its upper bound, BASE_BACKOFF * 2**attempts
+    return Outbox(str(tmp_path / "outbox.json"), sender, clock, rng=lambda: 1.0)
+
+
+def test_retries_with_exponential_backoff(tmp_path, clock):
+    sender = FakeSender([ConnectionError("down"), LineError(503)])
+    outbox = make_outbox(tmp_path, sender, clock)
+    statuses = []
+    outbox.add_listener(lambda entry, status, message: statuses.append(status))
+    entry_id = outbox.enqueue(["クイズ"])
+
+    assert outbox.process_due_entries() == pytest.approx(4.0)
+    assert outbox.get(entry_id)["status"] == PENDING
+    clock.now += 3.9
+    assert outbox.process_due_entries() == pytest.approx(0.1)
+    assert len(sender.calls) == 1
+
+    clock.now += 0.1
+    assert outbox.process_due_entries() == pytest.approx(8.0)
+    clock.now += 8.0
+    assert outbox.process_due_entries() == float("inf")
+
+    assert outbox.get(entry_id)["status"] == SENT
+    assert statuses == [PENDING, PENDING, SENT]
+    # Every attempt of the same request carries the same retry key
+    assert {retry_key for _, retry_key in sender.calls} == {get_retry_key(entry_id, 0)}
+
+
+def test_gives_up_after_max_attempts(tmp_path, clock):
+    sender = FakeSender([LineError(500)] * MAX_ATTEMPTS)
+    outbox = make_outbox(tmp_path, sender, clock)
+    entry_id = outbox.enqueue(["クイズ"])
+    for _ in range(MAX_ATTEMPTS):
+        clock.now += outbox.process_due_entries()
+
+    entry = outbox.get(entry_id)
+    assert entry["status"] == FAILED
+    assert entry["attempts"] == MAX_ATTEMPTS
+
+
+@pytest.mark.parametrize("status_code", [400, 401, 403])
+def test_client_errors_are_not_retried(tmp_path, clock, status_code):
+    outbox = make_outbox(tmp_path, FakeSender([LineError(status_code)]), clock)
+    entry_id = outbox.enqueue(["クイズ"])
+    assert outbox.process_due_entries() == float("inf")
+
+    entry = outbox.get(entry_id)
+    assert entry["status"] == FAILED
+    assert entry["status_code"] == status_code
+
+
+def test_restores_pending_entries_after_restart(tmp_path, clock):
+    # Two requests: the first is sent, then the app dies while sending the second
+    outbox = make_outbox(tmp_path, FakeSender(request_count=2, crash_at=1), clock)
+    entry_id = outbox.enqueue(["問題1", "問題2"])
+    outbox.process_due_entries()
+    assert outbox.get(entry_id)["sent_requests"] == 1
+
+    restarted_sender = FakeSender(request_count=2)
+    restarted = make_outbox(tmp_path, restarted_sender, clock)
+    assert restarted.get(entry_id)["status"] == PENDING
+    clock.now += 60
+    restarted.process_due_entries()
+
+    assert restarted.get(entry_id)["status"] == SENT
+    # Only the request that was not sent yet is sent again
+    assert restarted_sender.calls == [(1, get_retry_key(entry_id, 1))]
+
+
+def test_already_accepted_request_counts_as_sent(tmp_path, clock, line_stub):
+    outbox = Outbox(str(tmp_path / "outbox.json"), clock=clock)
+    entry_id = outbox.enqueue(["クイズ"])
+    # LINE accepted the request, but the response was lost before the app saw it
+    line_stub.retry_keys.add(get_retry_key(entry_id, 0))
+    outbox.process_due_entries()
+
+    assert outbox.get(entry_id)["status"] == SENT
+    assert line_stub.stats["conflicts"] == 1
+    assert line_stub.stats["push"] == 0
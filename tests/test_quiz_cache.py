@@ -0,0 +1,13 @@
+# Local imports
+from quiz_cache import get_quiz_cache_key
+
+
+def test_cache_key_depends_on_recent_words():
+    key = get_quiz_cache_key("k10014034771000", 42, "読み方クイズ", 4)
+
+    assert get_quiz_cache_key("k10014034771000", 42, "読み方クイズ", 4, ()) == key
+    assert get_quiz_cache_key("k10014034771000", 42, "読み方クイズ", 4, {"政府"}) != key
+    # The order of the recent words does not matter
+    assert get_quiz_cache_key(
+        "k10014034771000", 42, "読み方クイズ", 4, ["政府", "人々"]
+    ) == get_quiz_cache_key("k10014034771000", 42, "読み方クイズ", 4, ["人々", "政府"])
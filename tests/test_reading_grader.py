@@ -0,0 +1,63 @@
+# Third-party imports
+import pandas as pd
+import pytest
+
+# Local imports
+from reading_grader import (
+    build_reading_lookup,
+    grade_reading_answers,
+    parse_reading_answers,
+    total_reading_points,
+)
+
+QUIZZES = pd.DataFrame(
+    {
+        "quiz_id": ["q1"],
+        "words": [
+            [["A", "話(はな)し合(あ)う"], ["B", "政府(せいふ)"], ["C", "ワクチン"]]
+        ],
+    }
+)
+
+
+def grade(messages):
+    messages = pd.Series(messages)
+    lookup = build_reading_lookup(QUIZZES)
+    answers = parse_reading_answers(messages)
+    quiz_ids = pd.Series("q1", index=messages.index)
+    return total_reading_points(grade_reading_answers(answers, quiz_ids, lookup))
+
+
+@pytest.mark.parametrize(
+    "message, points, manual",
+    [
+        ("A10001\nA. はなしあう\nB. せいふ\nC. vaccine", 2.0, 1),
+        ("学生番号：A10001\nａ．ハナシアウ\nB: ｾｲﾌ", 2.0, 0),
+        ("A10001\nA. 話し合う: は なし あう\nB. せいぶ", 1.0, 0),
+        ("A10001\nA. はなしあい", 0.5, 0),
+    ],
+)
+def test_reading_points(message, points, manual):
+    totals = grade([message])
+    assert totals["points"].tolist() == [points]
+    assert totals["manual"].tolist() == [manual]
+
+
+def test_repeated_letters_count_once():
+    message = (
+        "A10002\nA. はなしあう\nA. はなしあう\nA. はなしあう\nB. せいふ\nB. せいふ"
+    )
+    assert grade([message])["points"].tolist() == [2.0]
+
+
+def test_total_is_never_above_question_count():
+    messages = [
+        "A10001\n" + "\n".join(f"{letter}. {reading}" for letter, reading in answers)
+        for answers in [
+            [("A", "はなしあう")] * 5 + [("B", "せいふ")] * 5,
+            [("a", "はなしあう"), ("A", "はなしあう"), ("C", "わくちん")],
+            [("B", "せいふ"), ("b", "せいふ"), ("B", "せいぶ")],
+        ]
+    ]
+    totals = grade(messages)
+    assert (totals["points"] + totals["manual"] <= len(QUIZZES["words"][0])).all()
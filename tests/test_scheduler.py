@@ -0,0 +1,139 @@
+# Standard library imports
+from datetime import datetime, timedelta
+
+# Third-party imports
+import pytest
+
+# Local imports
+from scheduler import (
+    FAILED,
+    MISSED,
+    RETRY_INTERVAL,
+    SCHEDULED,
+    SENT,
+    Scheduler,
+    parse_send_time,
+)
+
+SEND_AT = datetime(2023, 4, 10, 8, 0)
+
+
+class FakeClock:
+    def __init__(self, now: datetime) -> None:
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+class LineError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class FakeSender:
+    def __init__(self, errors=()) -> None:
+        self.errors = list(errors)
+        self.sent = []
+
+    def __call__(self, messages, broadcasting, channel, retry_key) -> None:
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((messages, retry_key))
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(SEND_AT - timedelta(hours=1))
+
+
+@pytest.fixture
+def sender():
+    return FakeSender()
+
+
+@pytest.fixture
+def scheduler(tmp_path, sender, clock):
+    return Scheduler(str(tmp_path / "schedule.json"), sender, clock)
+
+
+def get_status(scheduler: Scheduler, entry_id: str) -> str:
+    return next(e["status"] for e in scheduler.entries if e["id"] == entry_id)
+
+
+def test_sends_on_time(scheduler, sender, clock):
+    entry_id = scheduler.schedule(["おはようございます"], SEND_AT, name="朝の案内")
+
+    assert scheduler.run_pending() == pytest.approx(3600)
+    assert sender.sent == []
+
+    clock.now = SEND_AT
+    assert scheduler.run_pending() == float("inf")
+    assert get_status(scheduler, entry_id) == SENT
+    assert len(sender.sent) == 1
+    messages, retry_key = sender.sent[0]
+    assert messages[0]["text"] == "おはようございます"
+    assert retry_key == entry_id
+
+
+def test_catches_up_within_the_window(scheduler, sender, clock):
+    entry_id = scheduler.schedule(["案内"], SEND_AT, catch_up_minutes=120)
+    # Nothing was running at 08:00; the app starts at 09:30
+    clock.now = SEND_AT + timedelta(minutes=90)
+    scheduler.run_pending()
+
+    assert get_status(scheduler, entry_id) == SENT
+    assert len(sender.sent) == 1
+
+
+def test_marks_late_entries_as_missed(scheduler, sender, clock):
+    entry_id = scheduler.schedule(["案内"], SEND_AT, catch_up_minutes=120)
+    clock.now = SEND_AT + timedelta(minutes=121)
+    scheduler.run_pending()
+
+    assert get_status(scheduler, entry_id) == MISSED
+    assert sender.sent == []
+
+
+def test_retries_network_errors_until_sent(tmp_path, clock):
+    sender = FakeSender([ConnectionError("down")])
+    scheduler = Scheduler(str(tmp_path / "schedule.json"), sender, clock)
+    entry_id = scheduler.schedule(["案内"], SEND_AT)
+
+    clock.now = SEND_AT
+    assert scheduler.run_pending() == pytest.approx(RETRY_INTERVAL)
+    assert get_status(scheduler, entry_id) == SCHEDULED
+
+    clock.now += timedelta(seconds=RETRY_INTERVAL)
+    scheduler.run_pending()
+    assert get_status(scheduler, entry_id) == SENT
+
+
+def test_does_not_retry_client_errors(tmp_path, clock):
+    sender = FakeSender([LineError(401)])
+    scheduler = Scheduler(str(tmp_path / "schedule.json"), sender, clock)
+    entry_id = scheduler.schedule(["案内"], SEND_AT)
+    clock.now = SEND_AT
+    scheduler.run_pending()
+
+    assert get_status(scheduler, entry_id) == FAILED
+
+
+def test_picks_up_entries_scheduled_by_another_process(scheduler, sender, clock):
+    # e.g. send_line_message.py --at 08:00 while the GUI is running
+    other = Scheduler(scheduler.location, sender, clock)
+    entry_id = other.schedule(["案内"], SEND_AT)
+
+    clock.now = SEND_AT
+    scheduler.run_pending()
+    assert get_status(scheduler, entry_id) == SENT
+
+
+def test_parse_send_time():
+    now = datetime(2023, 4, 10, 9, 0)
+    assert parse_send_time("08:00", now) == datetime(2023, 4, 11, 8, 0)
+    assert parse_send_time("10:30", now) == datetime(2023, 4, 10, 10, 30)
+    assert parse_send_time("2023-04-12 07:45", now) == datetime(2023, 4, 12, 7, 45)
+    with pytest.raises(ValueError):
+        parse_send_time("8時", now)
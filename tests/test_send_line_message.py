@@ -0,0 +1,84 @@
+# Standard library imports
+import json
+
+# Third-party imports
+import pytest
+
+"""
+send_line_message creates json_files/secrets.json in the working folder when it is
+imported, so it is imported inside the tests, which run in a temporary folder.
+"""
+
+USER_IDS = [f"U{index:032x}" for index in range(1200)]
+TEXTS = ["語彙力クイズ", "1. 話し合う\n2. 政府"]
+
+
+def test_build_messages_fit_in_requests():
+    from send_line_message import build_messages
+
+    messages = build_messages(["あ" * 6000, "い"], sticker=("6359", "11069859"))
+    assert [message.type for message in messages] == ["text", "text", "text", "sticker"]
+    assert len(messages[0].text) == 5000
+
+
+def test_load_roster_removes_duplicates(tmp_path):
+    from send_line_message import load_roster
+
+    roster_file = tmp_path / "roster.json"
+    roster = {"1年A組": ["U1", "U2"], "1年B組": ["U2", "U3"]}
+    roster_file.write_text(json.dumps(roster), encoding="utf-8")
+
+    assert load_roster(roster_file=str(roster_file)) == ["U1", "U2", "U3"]
+    with pytest.raises(KeyError):
+        load_roster(["2年A組"], str(roster_file))
+
+
+def test_multicast_in_batches_of_500(line_stub):
+    from send_line_message import multicast_messages
+
+    results = multicast_messages(TEXTS, USER_IDS, sticker=("6359", "11069859"))
+
+    assert [result.recipients for result in results] == [500, 500, 200]
+    assert all(result.success for result in results)
+    assert all(result.requests == 1 for result in results)
+    # The stub rejects multicasts to more than 500 users, like LINE
+    assert line_stub.stats["multicast"] == 3
+    assert line_stub.stats["messages"] == 3 * len(USER_IDS)
+
+
+def test_multicast_reports_failed_batches(line_stub):
+    from send_line_message import multicast_messages
+
+    line_stub.error_rate = 1.0
+    results = multicast_messages(TEXTS, USER_IDS[:600])
+
+    assert [result.success for result in results] == [False, False]
+    assert all("500" in result.error for result in results)
+
+
+def test_send_to_channels_batches_recipients(line_stub):
+    from send_line_message import MAX_MULTICAST_RECIPIENTS, send_to_channels
+
+    stats = send_to_channels(
+        {"初級": TEXTS, "上級": ["上級クイズ"]},
+        channel_recipients={"初級": USER_IDS},
+    )
+
+    assert stats["初級"].success and stats["上級"].success
+    assert stats["初級"].requests == -(-len(USER_IDS) // MAX_MULTICAST_RECIPIENTS)
+    assert stats["上級"].requests == 1
+    assert line_stub.stats["multicast"] == 3
+    assert line_stub.stats["push"] == 1
+
+
+def test_send_to_channels_keeps_errors_per_channel(line_stub):
+    from send_line_message import send_to_channels
+
+    # 未設定 has the template's empty access token
+    stats = send_to_channels({"初級": TEXTS, "未設定": TEXTS})
+
+    assert stats["初級"].success
+    assert stats["初級"].requests == 1
+    assert not stats["未設定"].success
+    assert "401" in stats["未設定"].error
+    assert stats["未設定"].requests == 0